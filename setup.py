@@ -127,8 +127,13 @@ setup(
     yith_users_report = yithlibraryserver.scripts.reports:users
     yith_apps_report = yithlibraryserver.scripts.reports:applications
     yith_stats_report = yithlibraryserver.scripts.reports:statistics
+    yith_compression_report = yithlibraryserver.scripts.reports:compression
     yith_migrate = yithlibraryserver.scripts.migrations:migrate
     yith_send_backups_via_email = yithlibraryserver.scripts.backups:send_backups_via_email
     yith_announce = yithlibraryserver.scripts.announce:announce
+    yith_expiring_passwords = yithlibraryserver.scripts.expiring:expiring_passwords
+    yith_worker = yithlibraryserver.scripts.worker:worker
+    yith_gc_orphans = yithlibraryserver.scripts.orphans:gc_orphans
+    yith_fsck = yithlibraryserver.scripts.fsck:fsck
     yith_build_assets = yithlibraryserver.scripts.buildassets:buildassets""",
 )
@@ -30,10 +30,20 @@ from pyramid.exceptions import ConfigurationError
 from pyramid.path import AssetResolver
 from pyramid.settings import asbool
 
+from yithlibraryserver.api import APIDispatcher, make_api_app
+from yithlibraryserver.bodylimits import BodyLimits
 from yithlibraryserver.config import read_setting_from_env
 from yithlibraryserver.cors import CORSManager
 from yithlibraryserver.db import MongoDB
+from yithlibraryserver.httpclient import HTTPClient
+from yithlibraryserver.pagecache import PageCache
+from yithlibraryserver.password.idempotency import IdempotencyStore
+from yithlibraryserver.password.models import PasswordsManager
+from yithlibraryserver.password.quota import Quota
+from yithlibraryserver.session import SessionStore
+from yithlibraryserver.user.cleanup import ensure_reference_indexes
 from yithlibraryserver.jsonrenderer import json_renderer
+from yithlibraryserver.msgpackrenderer import api_renderer
 from yithlibraryserver.i18n import deform_translator, locale_negotiator
 from yithlibraryserver.security import RootFactory
 
@@ -52,6 +62,11 @@ def main(global_config, **settings):
         option = 'mail_' + key
         settings[option] = read_setting_from_env(settings, option, default)
 
+    # read the mail queue option. If enabled, emails are stored in the
+    # outbox collection and the yith_worker command delivers them
+    settings['mail_queue'] = asbool(read_setting_from_env(
+        settings, 'mail_queue', 'false'))
+
     # read admin_emails option
     settings['admin_emails'] = read_setting_from_env(settings, 'admin_emails', '').split()
 
@@ -111,14 +126,12 @@ def main(global_config, **settings):
         locale_negotiator=locale_negotiator,
     )
     config.add_renderer('json', json_renderer)
+    config.add_renderer('api', api_renderer)
     config.add_static_view('static', 'static', cache_max_age=3600)
 
     # Chameleon setup
     config.include('pyramid_chameleon')
 
-    # Beaker (sessions) setup
-    config.include('pyramid_beaker')
-
     # Webassets
     config.include('pyramid_webassets')
 
@@ -151,10 +164,42 @@ def main(global_config, **settings):
     config.registry.settings['mongodb'] = mongodb
     config.registry.settings['db_conn'] = mongodb.get_connection()
 
+    # Sessions are stored in MongoDB
+    session_store = SessionStore.from_settings(mongodb, settings)
+    session_store.ensure_indexes()
+    config.set_session_factory(session_store)
+
+    # Indexes for the password searches
+    PasswordsManager(mongodb.get_database()).ensure_indexes()
+
+    # Indexes for the removal of the data of the deleted users
+    ensure_reference_indexes(mongodb.get_database())
+
+    # Limits of the passwords every user can store
+    config.registry.settings['password_quota'] = Quota.from_settings(
+        settings)
+
+    # Responses of the password writes sent with an Idempotency-Key
+    idempotency_store = IdempotencyStore.from_settings(mongodb, settings)
+    idempotency_store.ensure_indexes()
+    config.registry.settings['idempotency_store'] = idempotency_store
+
+    # Limits of the REST API request bodies
+    config.registry.settings['body_limits'] = BodyLimits.from_settings(
+        settings)
+
     # CORS support setup
     config.registry.settings['cors_manager'] = CORSManager(
         read_setting_from_env(settings, 'cors_allowed_origins', ''))
 
+    # Shared client for the requests to identity providers and PayPal
+    config.registry.settings['http_client'] = HTTPClient.from_settings(
+        settings)
+
+    # Cache of the pages seen by anonymous visitors
+    config.registry.settings['page_cache'] = PageCache.from_settings(
+        settings)
+
     # Routes
     config.include('yithlibraryserver.backups')
     config.include('yithlibraryserver.contributions')
@@ -191,7 +236,10 @@ def main(global_config, **settings):
 
     config.scan(ignore=[re.compile('.*tests.*').search,
                         re.compile('.*testing.*').search])
-    return config.make_wsgi_app()
+    app = config.make_wsgi_app()
+
+    # The REST API requests skip the html machinery
+    return APIDispatcher(app, make_api_app(app.registry.settings))
 
 
 def includeme(config):
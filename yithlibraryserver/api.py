@@ -0,0 +1,92 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from pyramid.config import Configurator
+from pyramid.events import ContextFound, NewRequest
+
+from yithlibraryserver.db import get_db
+from yithlibraryserver.jsonrenderer import json_renderer
+from yithlibraryserver.msgpackrenderer import api_renderer
+from yithlibraryserver.subscribers import add_compress_response_callback
+from yithlibraryserver.subscribers import add_cors_headers_response
+from yithlibraryserver.subscribers import limit_request_body
+
+API_PATHS = ('/passwords', '/tags', '/user')
+
+# the debug toolbar and other extra packages are only for the html pages
+IGNORED_SETTINGS = ('pyramid.includes', 'pyramid.tweens')
+
+
+def is_api_path(path):
+    for api_path in API_PATHS:
+        if path == api_path or path.startswith(api_path + '/'):
+            return True
+    return False
+
+
+def make_api_app(settings):
+    """Build a lean Pyramid application for the REST API.
+
+    The JSON API does not need sessions, templates, translations, the
+    authentication ticket policy or transactions. This application
+    only has the API routes and views, which verify the Bearer token
+    themselves, CORS, compression, the body limits and the JSON
+    renderer.
+    """
+    settings = dict([(key, value) for key, value in settings.items()
+                     if key not in IGNORED_SETTINGS])
+    config = Configurator(settings=settings)
+    config.add_renderer('json', json_renderer)
+    config.add_renderer('api', api_renderer)
+
+    config.set_request_property(get_db, 'db', reify=True)
+    config.add_subscriber(add_cors_headers_response, NewRequest)
+    config.add_subscriber(add_compress_response_callback, NewRequest)
+    # the routes are known, but nothing has read the body yet
+    config.add_subscriber(limit_request_body, ContextFound)
+
+    config.include('yithlibraryserver.password')
+    config.scan('yithlibraryserver.password.views')
+
+    from yithlibraryserver.user.views import UserRESTView
+    config.add_route('user_view', '/user')
+    config.add_view(UserRESTView, attr='options', route_name='user_view',
+                    request_method='OPTIONS', renderer='string')
+    config.add_view(UserRESTView, attr='get', route_name='user_view',
+                    request_method='GET', renderer='json')
+
+    return config.make_wsgi_app()
+
+
+class APIDispatcher(object):
+    """Send the API requests to the API application.
+
+    Every other request goes to the main application, whose registry
+    is exposed so this object can be used in place of it.
+    """
+
+    def __init__(self, app, api_app):
+        self.app = app
+        self.api_app = api_app
+        self.registry = app.registry
+
+    def __call__(self, environ, start_response):
+        if is_api_path(environ.get('PATH_INFO', '')):
+            return self.api_app(environ, start_response)
+        return self.app(environ, start_response)
@@ -25,7 +25,11 @@ from yithlibraryserver.backups.utils import get_user_passwords, compress
 from yithlibraryserver.email import send_email
 
 
-def send_passwords(request, user, preferences_link, backups_link):
+TEMPLATE = 'yithlibraryserver.backups:templates/email_passwords'
+
+
+def send_passwords(request, user, preferences_link, backups_link,
+                   template=TEMPLATE):
     passwords = get_user_passwords(request.db, user)
     if not passwords:
         return False
@@ -43,7 +47,7 @@ def send_passwords(request, user, preferences_link, backups_link):
 
     send_email(
         request,
-        'yithlibraryserver.backups:templates/email_passwords',
+        template,
         context,
         "Your Yith Library's passwords",
         [user['email']],
@@ -193,3 +193,42 @@ class ViewTests(TestCase):
         self.assertEqual(res.location, 'http://localhost/backup')
 
         self.assertEqual(2, self.db.passwords.count())
+
+    def test_backups_import_quota(self):
+        user_id = self.db.users.insert({
+            'twitter_id': 'twitter1',
+            'screen_name': 'John Doe',
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'email': '',
+        })
+        self.db.passwords.insert({'owner': user_id, 'secret': 'old1'})
+        self.db.passwords.insert({'owner': user_id, 'secret': 'old2'})
+        self.testapp.get('/__login/' + str(user_id))
+
+        quota = self.testapp.app.registry.settings['password_quota']
+        quota.soft_passwords = 1
+        quota.hard_passwords = 2
+
+        # too many passwords, the old ones are kept
+        content = get_gzip_data(text_type(
+            '[{"secret": "new1"}, {"secret": "new2"}, {"secret": "new3"}]'))
+        res = self.testapp.post(
+            '/backup/import', {},
+            upload_files=[('passwords-file', 'big.json', content)],
+            status=302)
+        self.assertEqual(res.status, '302 Found')
+        self.assertEqual(res.location, 'http://localhost/backup')
+        self.assertEqual(sorted([p['secret'] for p in self.db.passwords.find()]),
+                         ['old1', 'old2'])
+
+        # the old passwords do not count since they are replaced
+        content = get_gzip_data(text_type(
+            '[{"secret": "new1"}, {"secret": "new2"}]'))
+        res = self.testapp.post(
+            '/backup/import', {},
+            upload_files=[('passwords-file', 'good.json', content)],
+            status=302)
+        self.assertEqual(res.status, '302 Found')
+        self.assertEqual(sorted([p['secret'] for p in self.db.passwords.find()]),
+                         ['new1', 'new2'])
@@ -26,7 +26,7 @@ from yithlibraryserver.utils import remove_attrs
 
 def get_user_passwords(db, user):
     passwords_manager = PasswordsManager(db)
-    return [remove_attrs(password, 'owner', '_id')
+    return [remove_attrs(password, 'owner', '_id', 'revision')
             for password in passwords_manager.retrieve(user)]
 
 
@@ -29,6 +29,7 @@ from yithlibraryserver.backups.utils import compress, uncompress
 from yithlibraryserver.i18n import translation_domain
 from yithlibraryserver.i18n import TranslationString as _
 from yithlibraryserver.password.models import PasswordsManager
+from yithlibraryserver.password.quota import SOFT_QUOTA, QuotaExceeded
 
 
 @view_config(route_name='backups_index',
@@ -61,14 +62,22 @@ def backups_import(request):
         if passwords_field != '':
             try:
                 json_data = uncompress(passwords_field.file.read())
-                passwords_manager = PasswordsManager(request.db)
-                passwords_manager.delete(request.user)
-                passwords_manager.create(request.user, json_data)
+                passwords_manager = PasswordsManager(
+                    request.db,
+                    quota=request.registry.settings['password_quota'])
+                passwords_manager.create(request.user, json_data,
+                                         replace=True)
             except (IOError, ValueError):
                 request.session.flash(
                     _('There was a problem reading your passwords file'),
                     'error')
                 return response
+            except QuotaExceeded:
+                request.session.flash(
+                    _('Your passwords file is bigger than your quota '
+                      'allows. Your passwords were not changed'),
+                    'error')
+                return response
 
             n_passwords = len(json_data)
             localizer = get_localizer(request)
@@ -80,6 +89,12 @@ def backups_import(request):
                 mapping={'n_passwords': n_passwords},
             )
             request.session.flash(msg, 'success')
+
+            level = passwords_manager.get_quota_level(request.user)
+            if level == SOFT_QUOTA:
+                request.session.flash(
+                    _('You are close to the limit of your password quota'),
+                    'warning')
         else:
             request.session.flash(
                 _('The passwords file is required to upload the passwords'),
@@ -0,0 +1,82 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+from yithlibraryserver.config import read_setting_from_env
+
+DEFAULT_MAX_BODY_SIZE = 1024 * 1024
+
+DEFAULT_MAX_FIELD_SIZE = 256 * 1024
+
+
+class BodyLimits(object):
+    """Maximum sizes of the API request bodies.
+
+    Every route can have its own limit with an api_max_body_size_<route>
+    setting. The rest use api_max_body_size. A limit of 0 means there
+    is no limit.
+    """
+
+    def __init__(self, settings, max_body_size=DEFAULT_MAX_BODY_SIZE,
+                 max_field_size=DEFAULT_MAX_FIELD_SIZE):
+        self.settings = settings
+        self.max_body_size = max_body_size
+        self.max_field_size = max_field_size
+        self.routes = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        max_body_size = read_setting_from_env(settings, 'api_max_body_size',
+                                              DEFAULT_MAX_BODY_SIZE)
+        max_field_size = read_setting_from_env(settings, 'api_max_field_size',
+                                               DEFAULT_MAX_FIELD_SIZE)
+        return cls(settings, int(max_body_size), int(max_field_size))
+
+    def get_limit(self, route_name):
+        if route_name is None:
+            return self.max_body_size
+
+        if route_name not in self.routes:
+            limit = read_setting_from_env(self.settings,
+                                          'api_max_body_size_' + route_name,
+                                          self.max_body_size)
+            self.routes[route_name] = int(limit)
+        return self.routes[route_name]
+
+    def accepts(self, request):
+        """Return False if the body of the request is too big.
+
+        The body is not read if the request has a Content-Length.
+        Otherwise no more than the limit plus one byte is read.
+        """
+        route = getattr(request, 'matched_route', None)
+        limit = self.get_limit(route.name if route is not None else None)
+        if limit <= 0:
+            return True
+
+        if request.content_length is not None:
+            return request.content_length <= limit
+
+        if not request.is_body_readable:
+            return True
+
+        body = request.body_file_raw.read(limit + 1)
+        if len(body) > limit:
+            return False
+
+        request.body = body
+        return True
@@ -67,3 +67,8 @@ if PY3:  # pragma: no cover
 else:  # pragma: no cover
     from StringIO import StringIO
     BytesIO = StringIO
+
+if PY3:  # pragma: no cover
+    import queue
+else:  # pragma: no cover
+    import Queue as queue
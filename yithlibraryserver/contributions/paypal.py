@@ -17,9 +17,8 @@
 # along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
 
 
-import requests
-
 from yithlibraryserver.compat import urlparse
+from yithlibraryserver.httpclient import get_http_client
 
 
 class PayPalPayload(dict):
@@ -57,6 +56,7 @@ class PayPalExpressCheckout(object):
         self.request = request
         self.nvp_url = request.registry.settings['paypal_nvp_url']
         self.express_checkout_url = request.registry.settings['paypal_express_checkout_url']
+        self.http_client = get_http_client(request.registry.settings)
 
     def get_express_checkout_token(self, amount):
         return_url = self.request.route_url('contributions_paypal_success_callback')
@@ -65,7 +65,7 @@ class PayPalExpressCheckout(object):
         payload.add_payment_info(amount)
         payload.add_callbacks(return_url, cancel_url)
 
-        response = requests.post(self.nvp_url, data=payload)
+        response = self.http_client.post('paypal', self.nvp_url, data=payload)
         if response.ok:
             data = urlparse.parse_qs(response.text)
             ack = data['ACK'][0]
@@ -80,7 +80,7 @@ class PayPalExpressCheckout(object):
         payload = PayPalPayload(self.request, 'GetExpressCheckoutDetails')
         payload.add_token(token, payerid)
 
-        response = requests.post(self.nvp_url, data=payload)
+        response = self.http_client.post('paypal', self.nvp_url, data=payload)
 
         if response.ok:
             data = urlparse.parse_qs(response.text)
@@ -105,7 +105,7 @@ class PayPalExpressCheckout(object):
         payload.add_payment_info(amount)
         payload.add_token(token, payerid)
 
-        response = requests.post(self.nvp_url, data=payload)
+        response = self.http_client.post('paypal', self.nvp_url, data=payload)
 
         if response.ok:
             data = urlparse.parse_qs(response.text)
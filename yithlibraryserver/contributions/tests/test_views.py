@@ -48,7 +48,7 @@ class TestViews(TestCase):
         self.assertEqual(res.status, '400 Bad Request')
 
     def test_contributions_donate(self):
-        with patch('requests.post') as fake:
+        with patch('requests.Session.post') as fake:
             fake.return_value.ok = True
             fake.return_value.text = 'ACK=Success&TOKEN=123'
             res = self.testapp.post('/contribute/donate', {
@@ -89,7 +89,7 @@ class TestViews(TestCase):
         self.assertEqual(session['_f_error'], ['There was a problem in the confirmation process. Please start the checkout again'])
 
     def test_contributions_confirm_details(self):
-        with patch('requests.post') as fake:
+        with patch('requests.Session.post') as fake:
             fake.return_value.ok = True
             fake.return_value.text = 'ACK=Success&AMT=5.00&FIRSTNAME=John&LASTNAME=Doe&SHIPTOCITY=ExampleCity&SHIPTOCOUNTRYNAME=ExampleCountry&SHIPTOSTATE=ExampleState&SHIPTOSTREET=ExampleStreet&SHIPTOZIP=123456&EMAIL=john@example.com'
             res = self.testapp.get('/contribute/paypal-success-callback?token=123&PayerID=456')
@@ -139,7 +139,7 @@ class TestViews(TestCase):
 
     @freeze_time('2013-01-02 10:11:02')
     def test_contributions_confirm_success(self):
-        with patch('requests.post') as fake:
+        with patch('requests.Session.post') as fake:
             fake.return_value.ok = True
             fake.return_value.text = 'ACK=Success'
 
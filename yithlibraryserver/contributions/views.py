@@ -30,6 +30,7 @@ from yithlibraryserver.contributions.paypal import PayPalExpressCheckout
 from yithlibraryserver.i18n import TranslationString as _
 
 
+# not cached since the stickers are placed randomly on every render
 @view_config(route_name='contributions_index',
              renderer='templates/contributions_index.pt')
 def contributions_index(request):
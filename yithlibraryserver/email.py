@@ -16,20 +16,79 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
 
-from pyramid.renderers import render
+from pyramid.renderers import get_renderer, render
 
 from pyramid_mailer import get_mailer
 from pyramid_mailer.message import Message
 
+from yithlibraryserver.compat import binary_type
+from yithlibraryserver.outbox import Outbox
 
-def create_message(request, template, context, subject, recipients,
-                   attachments=None, extra_headers=None):
+
+class MessageRenderer(object):
+    """Render the bodies of an email template for many recipients.
+
+    pyramid.renderers.render looks up the template on every call.
+    This is done once here, so rendering a message only costs the
+    execution of the compiled Chameleon templates. Useful for bulk
+    jobs that send the same template to every user.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self._templates = None
+
+    def _get_templates(self):
+        if self._templates is None:
+            self._templates = (
+                get_renderer(self.template + '.txt').implementation(),
+                get_renderer(self.template + '.pt').implementation(),
+            )
+        return self._templates
+
+    def _get_system(self, request):
+        return {
+            'view': None,
+            'renderer_name': self.template,
+            'context': getattr(request, 'context', None),
+            'request': request,
+            'req': request,
+        }
+
+    def render(self, request, context):
+        """Return the text and html bodies"""
+        text_template, html_template = self._get_templates()
+        values = self._get_system(request)
+        values.update(context)
+
+        text_body = text_template(**values)
+        if isinstance(text_body, binary_type):
+            text_body = text_body.decode('utf-8')
+
+        return text_body, html_template(**values)
+
+
+def render_bodies(request, template, context):
     text_body = render(template + '.txt', context, request=request)
     # chamaleon txt templates are rendered as utf-8 bytestrings
     text_body = text_body.decode('utf-8')
 
     html_body = render(template + '.pt', context, request=request)
 
+    return text_body, html_body
+
+
+def create_message(request, template, context, subject, recipients,
+                   attachments=None, extra_headers=None):
+    """Create a message rendering the .txt and .pt versions of template.
+
+    template can also be a MessageRenderer for that template.
+    """
+    if isinstance(template, MessageRenderer):
+        text_body, html_body = template.render(request, context)
+    else:
+        text_body, html_body = render_bodies(request, template, context)
+
     extra_headers = extra_headers or {}
 
     message = Message(
@@ -49,9 +108,17 @@ def create_message(request, template, context, subject, recipients,
 
 def send_email(request, template, context, subject, recipients,
                attachments=None, extra_headers=None):
+    """Create a message and send it or queue it if mail_queue is set.
+
+    See create_message for the meaning of the arguments.
+    """
     message = create_message(request, template, context, subject, recipients,
                              attachments, extra_headers)
-    return get_mailer(request).send(message)
+    if request.registry.settings.get('mail_queue', False):
+        # the yith_worker command will deliver it later
+        return Outbox(request.db).enqueue(message)
+    else:
+        return get_mailer(request).send(message)
 
 
 def send_email_to_admins(request, template, context, subject,
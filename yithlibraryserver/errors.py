@@ -20,7 +20,11 @@
 
 import json
 
-from pyramid.httpexceptions import HTTPBadRequest, HTTPNotFound
+from pyramid.httpexceptions import HTTPBadRequest, HTTPConflict, HTTPNotFound
+from pyramid.httpexceptions import HTTPInsufficientStorage
+from pyramid.httpexceptions import HTTPPreconditionFailed
+from pyramid.httpexceptions import HTTPRequestEntityTooLarge
+from pyramid.httpexceptions import HTTPUnprocessableEntity
 
 
 def password_not_found(msg='Password not found'):
@@ -31,3 +35,35 @@ def password_not_found(msg='Password not found'):
 def invalid_password_id(msg='Invalid password id'):
     return HTTPBadRequest(body=json.dumps({'message': msg}),
                           content_type='application/json')
+
+
+def password_modified(msg='The password was modified by another request'):
+    return HTTPPreconditionFailed(body=json.dumps({'message': msg}),
+                                  content_type='application/json')
+
+
+def request_too_large(msg='The request body is too large'):
+    return HTTPRequestEntityTooLarge(body=json.dumps({'message': msg}),
+                                     content_type='application/json')
+
+
+def quota_exceeded(msg='Your password quota is exceeded'):
+    return HTTPInsufficientStorage(body=json.dumps({'message': msg}),
+                                   content_type='application/json')
+
+
+def invalid_idempotency_key(msg='Invalid Idempotency-Key header'):
+    return HTTPBadRequest(body=json.dumps({'message': msg}),
+                          content_type='application/json')
+
+
+def idempotency_key_in_use(msg='A request with this Idempotency-Key '
+                                'is still in progress'):
+    return HTTPConflict(body=json.dumps({'message': msg}),
+                        content_type='application/json')
+
+
+def idempotency_key_reused(msg='This Idempotency-Key was used for '
+                                'a different request'):
+    return HTTPUnprocessableEntity(body=json.dumps({'message': msg}),
+                                   content_type='application/json')
@@ -0,0 +1,65 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import colander
+
+from deform import Button, Form
+
+from pyramid.i18n import get_locale_name
+
+
+class FormFactory(object):
+    """Build the deform forms of a schema.
+
+    The schema and the form are built once and kept as a prototype.
+    deform stores the rendered values in the fields of the form, so
+    every render with data uses a clone of the prototype and no data is
+    shared between requests. The html of the empty form, rendered
+    without an appstruct or with an empty one, is cached per locale
+    since it is the same for every visitor.
+
+    buttons is a sequence of (name, title, css_class) tuples.
+    """
+
+    def __init__(self, schema_class, buttons):
+        self.schema_class = schema_class
+        self.buttons = buttons
+        self._prototype = None
+        self._empty_forms = {}
+
+    def __call__(self):
+        buttons = []
+        for name, title, css_class in self.buttons:
+            button = Button(name, title)
+            button.css_class = css_class
+            buttons.append(button)
+        return Form(self.schema_class(), buttons=buttons)
+
+    def render(self, request, appstruct=colander.null):
+        if appstruct:
+            if self._prototype is None:
+                self._prototype = self()
+            return self._prototype.clone().render(appstruct)
+
+        locale_name = get_locale_name(request)
+        html = self._empty_forms.get(locale_name, None)
+        if html is None:
+            html = self().render(colander.null)
+            self._empty_forms[locale_name] = html
+        return html
@@ -0,0 +1,332 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from yithlibraryserver.compat import urlparse
+from yithlibraryserver.config import read_setting_from_env
+
+log = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """Adapter that applies a default timeout to every request"""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super(TimeoutHTTPAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super(TimeoutHTTPAdapter, self).send(request, **kwargs)
+
+
+class ProviderUnavailable(Exception):
+    """The circuit breaker of a provider is open"""
+
+    def __init__(self, provider, retry_after):
+        super(ProviderUnavailable, self).__init__(
+            '%s is not available' % provider)
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class CircuitBreaker(object):
+    """Stop calling a provider that keeps failing or answering slowly.
+
+    After failure_threshold consecutive failures the breaker opens and
+    the calls fail immediately. Once reset_timeout seconds have passed
+    a single probe call is allowed (half open state): if it succeeds
+    the breaker closes again, otherwise it stays open for another
+    reset_timeout seconds. If the result of the probe is never
+    recorded another probe is allowed after reset_timeout seconds. A
+    call slower than slow_call_threshold seconds counts as a failure.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, slow_call_threshold=5.0,
+                 reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            elif self.retry_after() == 0:
+                # start a probe, either because the breaker was open
+                # long enough or because the last probe got lost
+                self.state = self.HALF_OPEN
+                self.opened_at = time.time()
+                return True
+            # in the half open state only the probe call is allowed
+            return False
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0
+        elapsed = time.time() - self.opened_at
+        return max(0, int(self.reset_timeout - elapsed + 0.5))
+
+    def record(self, elapsed, error=False):
+        with self.lock:
+            if error or elapsed >= self.slow_call_threshold:
+                self.failures += 1
+                if (self.state == self.HALF_OPEN or
+                        self.failures >= self.failure_threshold):
+                    self.state = self.OPEN
+                    self.opened_at = time.time()
+            else:
+                self.state = self.CLOSED
+                self.failures = 0
+                self.opened_at = None
+
+
+class RetryBudget(object):
+    """Allow retries only for a fraction of the requests.
+
+    Every request deposits ratio tokens in the budget, up to
+    max_tokens, and every retry spends one token. This way retries
+    can not multiply the load on a provider that is already failing.
+    """
+
+    def __init__(self, ratio=0.1, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self):
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            else:
+                return False
+
+
+class LatencyMetrics(object):
+    """Number of requests, errors and response times per provider.
+
+    The summary is meant to be logged every log_interval seconds. A
+    log_interval of 0 disables it.
+    """
+
+    def __init__(self, log_interval=300):
+        self.providers = {}
+        self.lock = threading.Lock()
+        self.log_interval = log_interval
+        self.last_log = time.time()
+
+    def record(self, provider, elapsed, error=False):
+        with self.lock:
+            metrics = self.providers.setdefault(provider, {
+                'requests': 0,
+                'errors': 0,
+                'total_time': 0.0,
+                'max_time': 0.0,
+            })
+            metrics['requests'] += 1
+            if error:
+                metrics['errors'] += 1
+            metrics['total_time'] += elapsed
+            metrics['max_time'] = max(metrics['max_time'], elapsed)
+
+    def snapshot(self):
+        with self.lock:
+            return dict([(provider, dict(metrics))
+                         for provider, metrics in self.providers.items()])
+
+    def should_log(self):
+        """Return True once every log_interval seconds"""
+        if not self.log_interval:
+            return False
+
+        with self.lock:
+            now = time.time()
+            if now - self.last_log < self.log_interval:
+                return False
+            self.last_log = now
+            return True
+
+    def summary(self):
+        lines = []
+        for provider, metrics in sorted(self.snapshot().items()):
+            lines.append(
+                '%s: %d requests, %d errors, avg %d ms, max %d ms' % (
+                    provider,
+                    metrics['requests'],
+                    metrics['errors'],
+                    metrics['total_time'] * 1000 / metrics['requests'],
+                    metrics['max_time'] * 1000,
+                ))
+        return '; '.join(lines)
+
+
+def is_server_error(response):
+    return response.status_code // 100 == 5
+
+
+class HTTPClient(object):
+    """Client for the requests made to external services.
+
+    It keeps a pool of keep-alive connections per host, applies
+    connect and read timeouts, retries the idempotent requests that
+    fail because of connection problems and records the latency of
+    each provider. Every provider has its own circuit breaker.
+    """
+
+    def __init__(self, connect_timeout=3.05, read_timeout=10, pool_size=10,
+                 retry_ratio=0.1, breaker_failures=5, breaker_slow_call=5.0,
+                 breaker_reset_timeout=30, metrics_log_interval=300):
+        self.session = requests.Session()
+        adapter = TimeoutHTTPAdapter(
+            (connect_timeout, read_timeout),
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.retry_budget = RetryBudget(retry_ratio)
+        self.metrics = LatencyMetrics(metrics_log_interval)
+        self.breaker_options = {
+            'failure_threshold': breaker_failures,
+            'slow_call_threshold': breaker_slow_call,
+            'reset_timeout': breaker_reset_timeout,
+        }
+        self.breakers = {}
+        self.breakers_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        def read(key, default):
+            return read_setting_from_env(settings, 'http_' + key, default)
+
+        return cls(
+            connect_timeout=float(read('connect_timeout', 3.05)),
+            read_timeout=float(read('read_timeout', 10)),
+            pool_size=int(read('pool_size', 10)),
+            retry_ratio=float(read('retry_ratio', 0.1)),
+            breaker_failures=int(read('breaker_failures', 5)),
+            breaker_slow_call=float(read('breaker_slow_call', 5.0)),
+            breaker_reset_timeout=int(read('breaker_reset_timeout', 30)),
+            metrics_log_interval=int(read('metrics_log_interval', 300)),
+        )
+
+    def get_breaker(self, provider):
+        with self.breakers_lock:
+            breaker = self.breakers.get(provider, None)
+            if breaker is None:
+                breaker = CircuitBreaker(**self.breaker_options)
+                self.breakers[provider] = breaker
+            return breaker
+
+    def request(self, provider, method, url, **kwargs):
+        breaker = self.get_breaker(provider)
+        self.retry_budget.deposit()
+        send = getattr(self.session, method.lower())
+        while True:
+            if not breaker.allow():
+                log.warning('Not calling %s %s: %s is not available' % (
+                    method, url, provider))
+                raise ProviderUnavailable(provider, breaker.retry_after())
+
+            start = time.time()
+            try:
+                response = send(url, **kwargs)
+            except requests.RequestException as e:
+                self._record(provider, breaker, method, url, start,
+                             error=True)
+                if (isinstance(e, (requests.ConnectionError,
+                                   requests.Timeout)) and
+                        method.upper() in IDEMPOTENT_METHODS and
+                        self.retry_budget.withdraw()):
+                    log.warning('Retrying %s %s after error: %s' % (
+                        method, url, e))
+                    continue
+                raise
+            except Exception:
+                # the probe of a half open breaker must be recorded too
+                self._record(provider, breaker, method, url, start,
+                             error=True)
+                raise
+            else:
+                self._record(provider, breaker, method, url, start,
+                             error=is_server_error(response))
+                return response
+
+    def _record(self, provider, breaker, method, url, start, error):
+        elapsed = time.time() - start
+        self.metrics.record(provider, elapsed, error)
+        breaker.record(elapsed, error)
+        log.debug('%s %s %s took %.3f seconds' % (
+            provider, method, url, elapsed))
+        if self.metrics.should_log():
+            log.info('HTTP client metrics: %s' % self.metrics.summary())
+
+    def get(self, provider, url, **kwargs):
+        return self.request(provider, 'GET', url, **kwargs)
+
+    def post(self, provider, url, **kwargs):
+        return self.request(provider, 'POST', url, **kwargs)
+
+
+_default_client = None
+
+
+def get_http_client(settings):
+    """Return the HTTPClient shared by the application.
+
+    It is created the first time it is needed. Without settings a
+    client with the default options is used.
+    """
+    global _default_client
+
+    if settings is None:
+        if _default_client is None:
+            _default_client = HTTPClient()
+        return _default_client
+
+    client = settings.get('http_client', None)
+    if client is None:
+        client = settings['http_client'] = HTTPClient.from_settings(settings)
+    return client
+
+
+def get_provider_from_url(url):
+    return urlparse.urlparse(url).netloc
@@ -23,8 +23,22 @@ translation_domain = 'yithlibraryserver'
 TranslationString = TranslationStringFactory(translation_domain)
 
 
+# translations of the terms without mapping, by locale
+_deform_translations = {}
+
+
 def deform_translator(term):
-    return get_localizer(get_current_request()).translate(term)
+    localizer = get_localizer(get_current_request())
+    if getattr(term, 'mapping', None):
+        return localizer.translate(term)
+
+    key = (localizer.locale_name, getattr(term, 'domain', None),
+           getattr(term, 'default', None), term)
+    translation = _deform_translations.get(key, None)
+    if translation is None:
+        translation = localizer.translate(term)
+        _deform_translations[key] = translation
+    return translation
 
 
 def locale_negotiator(request):
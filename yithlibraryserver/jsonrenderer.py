@@ -1,5 +1,5 @@
 # Yith Library Server is a password storage server.
-# Copyright (C) 2012-2013 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+# Copyright (C) 2012-2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
 #
 # This file is part of Yith Library Server.
 #
@@ -21,7 +21,104 @@ import bson
 
 from pyramid.renderers import JSON
 
-json_renderer = JSON()
+try:  # pragma: no cover
+    import simplejson as json
+except ImportError:  # pragma: no cover
+    import json
+
+
+class Document(object):
+    """A MongoDB document rendered with an extra id key.
+
+    The id is written next to the encoded document so the document
+    itself is neither modified nor copied.
+    """
+
+    __slots__ = ('document', )
+
+    def __init__(self, document):
+        self.document = document
+
+    def encode(self, default):
+        return encode_document(self.document, default)
+
+
+class Documents(object):
+    """A sequence of MongoDB documents rendered with an extra id key.
+
+    The sequence can be a cursor and it is consumed while encoding.
+    """
+
+    __slots__ = ('documents', )
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def encode(self, default):
+        return '[%s]' % ', '.join([encode_document(document, default)
+                                   for document in self.documents])
+
+
+def encode_document(document, default):
+    text = json.dumps(document, default=default)
+    _id = document.get('_id')
+    if _id is None:
+        return text
+    elif isinstance(_id, bson.ObjectId):
+        id_text = '"id": "%s"' % _id
+    else:
+        id_text = '"id": %s' % json.dumps(_id, default=default)
+
+    if text == '{}':
+        return '{%s}' % id_text
+    else:
+        return '%s, %s}' % (text[:-1], id_text)
+
+
+def serialize(value, default=None, **kw):
+    """Encode value with the fastest JSON backend available.
+
+    A dictionary with Document or Documents values is written piece
+    by piece so these values can add their id keys.
+    """
+    if isinstance(value, dict) and any(
+            isinstance(item, (Document, Documents))
+            for item in value.values()):
+        return '{%s}' % ', '.join([
+            '%s: %s' % (json.dumps(key), encode_item(item, default, **kw))
+            for key, item in value.items()
+        ])
+    return json.dumps(value, default=default, **kw)
+
+
+def encode_item(item, default, **kw):
+    if isinstance(item, (Document, Documents)):
+        return item.encode(default)
+    return json.dumps(item, default=default, **kw)
+
+
+class DocumentsJSON(JSON):
+    """JSON renderer that knows about MongoDB documents.
+
+    ObjectId and datetime objects are converted before looking up
+    the registered adapters, which is what the password and user
+    documents are made of.
+    """
+
+    def _make_default(self, request):
+        adapt = super(DocumentsJSON, self)._make_default(request)
+
+        def default(obj):
+            if isinstance(obj, bson.ObjectId):
+                return str(obj)
+            elif isinstance(obj, datetime.datetime):
+                return obj.isoformat()
+            return adapt(obj)
+
+        return default
+
+
+json_renderer = DocumentsJSON(serializer=serialize)
 
 
 def bson_adapter(obj, request):
@@ -0,0 +1,113 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import datetime
+
+import bson
+import msgpack
+
+from yithlibraryserver.jsonrenderer import Document, Documents
+from yithlibraryserver.jsonrenderer import json_renderer
+
+JSON_CONTENT_TYPE = 'application/json'
+MSGPACK_CONTENT_TYPE = 'application/x-msgpack'
+
+
+def wants_msgpack(request):
+    offers = (JSON_CONTENT_TYPE, MSGPACK_CONTENT_TYPE)
+    return request.accept.best_match(offers) == MSGPACK_CONTENT_TYPE
+
+
+def is_msgpack_request(request):
+    return request.content_type == MSGPACK_CONTENT_TYPE
+
+
+def add_document_id(document):
+    if '_id' in document:
+        document = dict(document, id=document['_id'])
+    return document
+
+
+def default(obj):
+    if isinstance(obj, bson.ObjectId):
+        return str(obj)
+    elif isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    elif isinstance(obj, Document):
+        return add_document_id(obj.document)
+    elif isinstance(obj, Documents):
+        return [add_document_id(document) for document in obj.documents]
+    raise TypeError('%r is not MessagePack serializable' % (obj, ))
+
+
+def dumps(value):
+    return msgpack.packb(value, default=default)
+
+
+def loads(data, object_hook=None):
+    return msgpack.unpackb(data, encoding='utf-8', object_hook=object_hook)
+
+
+class MessagePack(object):
+    """MessagePack renderer with the same output shape as the JSON one"""
+
+    def __call__(self, info):
+        def _render(value, system):
+            request = system.get('request')
+            if request is not None:
+                request.response.content_type = MSGPACK_CONTENT_TYPE
+            return dumps(value)
+        return _render
+
+
+class Negotiated(object):
+    """Choose between two renderers using the Accept header.
+
+    JSON is used unless the client prefers MessagePack.
+    """
+
+    def __init__(self, json_renderer, msgpack_renderer):
+        self.json_renderer = json_renderer
+        self.msgpack_renderer = msgpack_renderer
+
+    def __call__(self, info):
+        render_json = self.json_renderer(info)
+        render_msgpack = self.msgpack_renderer(info)
+
+        def _render(value, system):
+            request = system.get('request')
+            if request is None:
+                return render_json(value, system)
+
+            response = request.response
+            vary = tuple(response.vary or ())
+            if 'Accept' not in vary:
+                response.vary = vary + ('Accept', )
+
+            if wants_msgpack(request):
+                return render_msgpack(value, system)
+            else:
+                return render_json(value, system)
+
+        return _render
+
+
+msgpack_renderer = MessagePack()
+
+api_renderer = Negotiated(json_renderer, msgpack_renderer)
@@ -20,11 +20,11 @@
 
 import uuid
 
-import requests
-
 from pyramid.httpexceptions import HTTPBadRequest, HTTPFound, HTTPUnauthorized
 
 from yithlibraryserver.compat import urlparse, url_encode
+from yithlibraryserver.httpclient import get_http_client
+from yithlibraryserver.httpclient import get_provider_from_url
 
 
 def oauth2_step1(request, auth_uri, client_id, redirect_url, scope):
@@ -77,7 +77,9 @@ def oauth2_step2(request, token_uri, client_id, client_secret, redirect_url,
         'scope': scope,
     }
 
-    response = requests.post(token_uri, data=params)
+    http_client = get_http_client(request.registry.settings)
+    response = http_client.post(get_provider_from_url(token_uri),
+                                token_uri, data=params)
 
     if response.status_code != 200:
         return HTTPUnauthorized(response.text)
@@ -89,12 +91,14 @@ def oauth2_step2(request, token_uri, client_id, client_secret, redirect_url,
     return response_json['access_token']
 
 
-def get_user_info(info_uri, access_token):
+def get_user_info(info_uri, access_token, settings=None):
     headers = {
         'Authorization': 'Bearer %s' % access_token,
     }
 
-    response = requests.get(info_uri, headers=headers)
+    http_client = get_http_client(settings)
+    response = http_client.get(get_provider_from_url(info_uri),
+                               info_uri, headers=headers)
 
     if response.status_code != 200:
         return HTTPUnauthorized(response.text)
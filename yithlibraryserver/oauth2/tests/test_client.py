@@ -87,7 +87,7 @@ class Oauth2ClientTests(unittest.TestCase):
         self.assertEqual(response.status, '401 Unauthorized')
         self.assertEqual(response.message, 'State parameter does not match internal state. You may be a victim of CSRF')
 
-        with patch('requests.post') as fake:
+        with patch('requests.Session.post') as fake:
             fake.return_value.status_code = 401
             fake.return_value.text = 'Unauthorized request'
             request.session['state'] = 'random-string'
@@ -97,7 +97,7 @@ class Oauth2ClientTests(unittest.TestCase):
             self.assertEqual(response.status, '401 Unauthorized')
             self.assertEqual(response.message, 'Unauthorized request')
 
-        with patch('requests.post') as fake:
+        with patch('requests.Session.post') as fake:
             fake.return_value.status_code = 200
             fake.return_value.json = lambda: {
                 'access_token': 'qwerty'
@@ -108,7 +108,7 @@ class Oauth2ClientTests(unittest.TestCase):
                                     redirect_url, scope)
             self.assertEqual(response, 'qwerty')
 
-        with patch('requests.post') as fake:
+        with patch('requests.Session.post') as fake:
             fake.return_value.status_code = 200
             fake.return_value.json = lambda: None
             fake.return_value.text = 'access_token=qwerty'
@@ -119,7 +119,7 @@ class Oauth2ClientTests(unittest.TestCase):
             self.assertEqual(response, 'qwerty')
 
     def test_get_user_info(self):
-        with patch('requests.get') as fake:
+        with patch('requests.Session.get') as fake:
             fake.return_value.status_code = 401
             fake.return_value.text = 'Unauthorized request'
 
@@ -127,7 +127,7 @@ class Oauth2ClientTests(unittest.TestCase):
             self.assertEqual(response.status, '401 Unauthorized')
             self.assertEqual(response.message, 'Unauthorized request')
 
-        with patch('requests.get') as fake:
+        with patch('requests.Session.get') as fake:
             fake.return_value.status_code = 200
             fake.return_value.json = lambda: {
                 'name': 'John',
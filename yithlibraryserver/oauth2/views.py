@@ -19,7 +19,7 @@
 # along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
 
 import bson
-from deform import Button, Form, ValidationFailure
+from deform import ValidationFailure
 
 from pyramid.httpexceptions import (
     HTTPBadRequest,
@@ -36,6 +36,7 @@ from oauthlib.oauth2 import (
     Server,
 )
 
+from yithlibraryserver.forms import FormFactory
 from yithlibraryserver.i18n import TranslationString as _
 from yithlibraryserver.oauth2.application import create_client_id_and_secret
 from yithlibraryserver.oauth2.authorization import Authorizator
@@ -47,9 +48,22 @@ from yithlibraryserver.oauth2.utils import (
     response_from_error,
 )
 from yithlibraryserver.oauth2.validator import RequestValidator
+from yithlibraryserver.pagecache import cache_page, invalidate_page
 from yithlibraryserver.user.security import assert_authenticated_user_is_registered
 
 
+application_form = FormFactory(ApplicationSchema, (
+    ('submit', _('Save application'), 'btn-primary'),
+    ('cancel', _('Cancel'), 'btn-default'),
+))
+
+full_application_form = FormFactory(FullApplicationSchema, (
+    ('submit', _('Save application'), 'btn-primary'),
+    ('delete', _('Delete application'), 'btn-danger'),
+    ('cancel', _('Cancel'), 'btn-default'),
+))
+
+
 @view_config(route_name='oauth2_developer_applications',
              renderer='templates/developer_applications.pt',
              permission='view-applications')
@@ -66,14 +80,9 @@ def developer_applications(request):
              permission='add-application')
 def developer_application_new(request):
     assert_authenticated_user_is_registered(request)
-    schema = ApplicationSchema()
-    button1 = Button('submit', _('Save application'))
-    button1.css_class = 'btn-primary'
-    button2 = Button('cancel', _('Cancel'))
-    button2.css_class = 'btn-default'
-    form = Form(schema, buttons=(button1, button2))
 
     if 'submit' in request.POST:
+        form = application_form()
         controls = request.POST.items()
         try:
             appstruct = form.validate(controls)
@@ -99,6 +108,7 @@ def developer_application_new(request):
             'success')
 
         request.db.applications.insert(application)
+        invalidate_page(request, 'oauth2_clients')
         return HTTPFound(
             location=request.route_path('oauth2_developer_applications'))
     elif 'cancel' in request.POST:
@@ -106,7 +116,7 @@ def developer_application_new(request):
             location=request.route_path('oauth2_developer_applications'))
 
     # this is a GET
-    return {'form': form.render()}
+    return {'form': application_form.render(request)}
 
 
 @view_config(route_name='oauth2_developer_application_edit',
@@ -127,16 +137,8 @@ def developer_application_edit(request):
     if app['owner'] != request.user['_id']:
         return HTTPUnauthorized()
 
-    schema = FullApplicationSchema()
-    button1 = Button('submit', _('Save application'))
-    button1.css_class = 'btn-primary'
-    button2 = Button('delete', _('Delete application'))
-    button2.css_class = 'btn-danger'
-    button3 = Button('cancel', _('Cancel'))
-    button3.css_class = 'btn-default'
-    form = Form(schema, buttons=(button1, button2, button3))
-
     if 'submit' in request.POST:
+        form = full_application_form()
         controls = request.POST.items()
         try:
             appstruct = form.validate(controls)
@@ -159,6 +161,7 @@ def developer_application_edit(request):
 
         request.db.applications.update({'_id': app['_id']},
                                        application)
+        invalidate_page(request, 'oauth2_clients')
 
         request.session.flash(_('The changes were saved successfully'),
                               'success')
@@ -174,7 +177,7 @@ def developer_application_edit(request):
             location=request.route_path('oauth2_developer_applications'))
 
     # this is a GET
-    return {'form': form.render(app), 'app': app}
+    return {'form': full_application_form.render(request, app), 'app': app}
 
 
 @view_config(route_name='oauth2_developer_application_delete',
@@ -196,6 +199,7 @@ def developer_application_delete(request):
 
     if 'submit' in request.POST:
         request.db.applications.remove(app_id)
+        invalidate_page(request, 'oauth2_clients')
         request.session.flash(
             _('The application ${app} was deleted successfully',
               mapping={'app': app['name']}),
@@ -353,6 +357,7 @@ def revoke_application(request):
 
 
 @view_config(route_name='oauth2_clients',
-             renderer='templates/clients.pt')
+             renderer='templates/clients.pt',
+             decorator=cache_page)
 def clients(request):
     return {'apps': request.db.applications.find({'production_ready': True})}
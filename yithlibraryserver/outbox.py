@@ -0,0 +1,151 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+
+import bson
+import transaction
+
+from bson.tz_util import utc
+from pyramid_mailer.message import Attachment, Message
+
+PENDING = 'pending'
+SENDING = 'sending'
+FAILED = 'failed'
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF = 60  # seconds
+DEFAULT_LOCK_TIMEOUT = 600  # seconds
+
+
+def message_to_document(message):
+    return {
+        'subject': message.subject,
+        'sender': message.sender,
+        'recipients': list(message.recipients),
+        'body': message.body,
+        'html': message.html,
+        'extra_headers': dict(message.extra_headers),
+        'attachments': [{
+            'filename': attachment.filename,
+            'content_type': attachment.content_type,
+            'data': bson.Binary(attachment.data),
+        } for attachment in message.attachments],
+    }
+
+
+def document_to_message(document):
+    return Message(
+        subject=document['subject'],
+        sender=document['sender'],
+        recipients=document['recipients'],
+        body=document['body'],
+        html=document['html'],
+        extra_headers=document['extra_headers'],
+        attachments=[Attachment(attachment['filename'],
+                                attachment['content_type'],
+                                bytes(attachment['data']))
+                     for attachment in document['attachments']],
+    )
+
+
+class Outbox(object):
+    """Durable queue of email messages stored in the outbox collection.
+
+    Messages are added by the web application and delivered by the
+    yith_worker command, which retries the failed ones with an
+    exponential backoff.
+    """
+
+    def __init__(self, db, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 backoff=DEFAULT_BACKOFF, lock_timeout=DEFAULT_LOCK_TIMEOUT):
+        self.db = db
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lock_timeout = lock_timeout
+
+    def ensure_indexes(self):
+        self.db.outbox.ensure_index([('status', 1), ('next_attempt', 1)])
+
+    def enqueue(self, message):
+        """Add the message to the queue when the current transaction
+        commits, just like pyramid_mailer does with its send method.
+        """
+        document = message_to_document(message)
+        document.update({
+            'status': PENDING,
+            'attempts': 0,
+            'next_attempt': datetime.datetime.now(tz=utc),
+        })
+
+        def insert_document(success):
+            if success:
+                self.db.outbox.insert(document)
+
+        transaction.get().addAfterCommitHook(insert_document)
+
+    def claim(self):
+        """Lock and return the next message that should be delivered.
+
+        Messages locked by a worker that died are claimed again after
+        lock_timeout seconds, unless they already used all their
+        attempts. Returns None if there is nothing to do.
+        """
+        now = datetime.datetime.now(tz=utc)
+        expired = now - datetime.timedelta(seconds=self.lock_timeout)
+        self.db.outbox.update({
+            'status': SENDING,
+            'locked_at': {'$lte': expired},
+            'attempts': {'$gte': self.max_attempts},
+        }, {
+            '$set': {
+                'status': FAILED,
+                'last_error': 'The delivery did not finish',
+            },
+            '$unset': {'locked_at': 1},
+        }, multi=True)
+        return self.db.outbox.find_and_modify({
+            '$or': [
+                {'status': PENDING, 'next_attempt': {'$lte': now}},
+                {'status': SENDING, 'locked_at': {'$lte': expired}},
+            ],
+        }, {
+            '$set': {'status': SENDING, 'locked_at': now},
+            '$inc': {'attempts': 1},
+        }, sort=[('next_attempt', 1)], new=True)
+
+    def delivered(self, document):
+        self.db.outbox.remove(document['_id'])
+
+    def failed(self, document, error):
+        """Schedule a new attempt or give up if there were too many"""
+        attempts = document['attempts']
+        if attempts >= self.max_attempts:
+            changes = {'status': FAILED}
+        else:
+            delay = self.backoff * (2 ** (attempts - 1))
+            changes = {
+                'status': PENDING,
+                'next_attempt': (datetime.datetime.now(tz=utc) +
+                                 datetime.timedelta(seconds=delay)),
+            }
+        changes['last_error'] = error
+        self.db.outbox.update({'_id': document['_id']}, {
+            '$set': changes,
+            '$unset': {'locked_at': 1},
+        })
@@ -0,0 +1,174 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import hashlib
+import threading
+import time
+
+from pyramid.response import Response
+
+from yithlibraryserver.config import read_setting_from_env
+from yithlibraryserver.session import SESSION_COOKIE
+
+AUTH_COOKIE = 'auth_tkt'
+
+
+class PageCache(object):
+    """Cache of the pages rendered for anonymous visitors.
+
+    The pages are stored in memory by route and locale for ttl
+    seconds. Only the body and content type are kept, so the
+    cookies of a response are never served to other visitors.
+
+    Every entry remembers the version of its route when it was
+    rendered. The versions are shared by all the processes in the
+    database, so a page invalidated by any of them is rendered again.
+    """
+
+    def __init__(self, ttl=0, session_cookie=SESSION_COOKIE):
+        self.ttl = ttl
+        self.session_cookie = session_cookie
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        ttl = int(read_setting_from_env(settings, 'page_cache_ttl', 0))
+        return cls(ttl)
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def is_cacheable(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+
+        # _LOCALE_ is part of the key thanks to the locale negotiation
+        if [key for key in request.GET if key != '_LOCALE_']:
+            return False
+
+        # the pages of logged in users and the ones that show flash
+        # messages or other session data depend on the visitor
+        if AUTH_COOKIE in request.cookies:
+            return False
+
+        if self.session_cookie not in request.cookies:
+            return True
+
+        return len(request.session) == 0
+
+    def get_key(self, request):
+        return (request.matched_route.name, request.locale_name)
+
+    def get(self, key, version=0):
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry is not None and (entry['expires'] < time.time() or
+                                      entry['version'] != version):
+                del self.entries[key]
+                entry = None
+            return entry
+
+    def set(self, key, response, version=0):
+        body = response.body
+        entry = {
+            'body': body,
+            'content_type': response.content_type,
+            'charset': response.charset,
+            'etag': hashlib.md5(body).hexdigest(),
+            'expires': time.time() + self.ttl,
+            'version': version,
+        }
+        with self.lock:
+            self.entries[key] = entry
+        return entry
+
+    def invalidate(self, route_name):
+        with self.lock:
+            for key in list(self.entries.keys()):
+                if key[0] == route_name:
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def get_page_version(db, route_name):
+    document = db.page_versions.find_one({'_id': route_name})
+    if document is None:
+        return 0
+    return document['version']
+
+
+def invalidate_pages(db, route_name):
+    """Stop serving the cached pages of a route in every process.
+
+    It can be used without a request, for example by the scripts that
+    remove data.
+    """
+    db.page_versions.update({'_id': route_name},
+                            {'$inc': {'version': 1}}, upsert=True)
+
+
+def make_response(entry):
+    response = Response(
+        body=entry['body'],
+        content_type=entry['content_type'],
+        charset=entry['charset'],
+        conditional_response=True,
+    )
+    response.etag = entry['etag']
+    response.vary = ('Accept-Language', 'Cookie')
+    return response
+
+
+def cache_page(view):
+    """View decorator that serves the anonymous pages from the cache.
+
+    The responses have an ETag so browsers and proxies can revalidate
+    them and get a 304 Not Modified response.
+    """
+
+    def wrapper(context, request):
+        page_cache = request.registry.settings.get('page_cache', None)
+        if (page_cache is None or not page_cache.enabled or
+                not page_cache.is_cacheable(request)):
+            return view(context, request)
+
+        key = page_cache.get_key(request)
+        version = get_page_version(request.db, key[0])
+        entry = page_cache.get(key, version)
+        if entry is None:
+            response = view(context, request)
+            if response.status_int != 200:
+                return response
+            entry = page_cache.set(key, response, version)
+
+        return make_response(entry)
+
+    return wrapper
+
+
+def invalidate_page(request, route_name):
+    page_cache = request.registry.settings.get('page_cache', None)
+    if page_cache is not None:
+        page_cache.invalidate(route_name)
+    invalidate_pages(request.db, route_name)
@@ -22,3 +22,4 @@
 def includeme(config):
     config.add_route('password_collection_view', '/passwords')
     config.add_route('password_view', '/passwords/{password}')
+    config.add_route('tag_collection_view', '/tags')
@@ -0,0 +1,130 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import zlib
+
+from bson.binary import Binary
+
+from yithlibraryserver.compat import text_type
+
+# BSON binary subtypes from 0x80 are free for user defined data
+COMPRESSED_SUBTYPE = 0x80
+
+COMPRESSED_FIELDS = ('notes', 'secret')
+
+# values shorter than this, in UTF-8 bytes, are not worth compressing
+COMPRESSION_THRESHOLD = 1024
+
+
+def is_compressed(value):
+    return isinstance(value, Binary) and value.subtype == COMPRESSED_SUBTYPE
+
+
+def compress_value(value):
+    data = value.encode('utf-8')
+    compressed = zlib.compress(data)
+    if len(compressed) < len(data):
+        return Binary(compressed, COMPRESSED_SUBTYPE)
+    else:
+        return value
+
+
+def decompress_value(value):
+    return zlib.decompress(bytes(value)).decode('utf-8')
+
+
+class PasswordCodec(object):
+    """Compress the big text fields of the passwords in the database.
+
+    The compressed values are stored as binary data with a user
+    defined subtype, so the documents written before keep working and
+    nothing else in the document changes.
+    """
+
+    def __init__(self, fields=COMPRESSED_FIELDS,
+                 threshold=COMPRESSION_THRESHOLD):
+        self.fields = fields
+        self.threshold = threshold
+
+    def encode(self, password):
+        """Return the password as it should be stored.
+
+        A copy is made only if some field is compressed. The
+        argument can also be the $set part of an update.
+        """
+        encoded = password
+        for field in self.fields:
+            value = password.get(field)
+            # a character is never longer than 4 bytes in UTF-8
+            if (isinstance(value, text_type) and
+                    len(value) * 4 >= self.threshold and
+                    len(value.encode('utf-8')) >= self.threshold):
+                compressed = compress_value(value)
+                if compressed is not value:
+                    if encoded is password:
+                        encoded = dict(password)
+                    encoded[field] = compressed
+        return encoded
+
+    def decode(self, password):
+        """Decompress the fields of a stored password in place"""
+        if password is not None:
+            for field in self.fields:
+                if is_compressed(password.get(field)):
+                    password[field] = decompress_value(password[field])
+        return password
+
+    def decode_cursor(self, cursor):
+        return DecodingCursor(cursor, self)
+
+
+class DecodingCursor(object):
+    """Decode the passwords of a cursor as they are read.
+
+    Every other attribute, like count, comes from the real cursor.
+    """
+
+    def __init__(self, cursor, codec):
+        self.cursor = cursor
+        self.codec = codec
+
+    def __iter__(self):
+        for password in self.cursor:
+            yield self.codec.decode(password)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def get_compression_report(db, fields=COMPRESSED_FIELDS):
+    """Return the number of compressed values, their original size and
+    their stored size for every field.
+    """
+    report = []
+    for field in fields:
+        n_values = original_size = stored_size = 0
+        for password in db.passwords.find({field: {'$type': 5}},
+                                          fields={field: True}):
+            value = password[field]
+            if is_compressed(value):
+                n_values += 1
+                original_size += len(decompress_value(value).encode('utf-8'))
+                stored_size += len(value)
+        report.append((field, n_values, original_size, stored_size))
+    return report
@@ -0,0 +1,164 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import datetime
+import functools
+import hashlib
+
+from bson.binary import Binary
+from bson.tz_util import utc
+from pymongo.errors import DuplicateKeyError
+
+from pyramid.renderers import render_to_response
+from pyramid.response import Response
+
+from yithlibraryserver.config import read_setting_from_env
+from yithlibraryserver.errors import idempotency_key_in_use
+from yithlibraryserver.errors import idempotency_key_reused
+from yithlibraryserver.errors import invalid_idempotency_key
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def get_fingerprint(request):
+    body_hash = hashlib.sha1(request.body).hexdigest()
+    return '%s %s %s' % (request.method, request.path, body_hash)
+
+
+class IdempotencyStore(object):
+    """Responses of the password writes sent with an Idempotency-Key.
+
+    The key is reserved before running the view so a retry that
+    arrives while the first request is still running does not run it
+    again. Once the view finishes its response is stored and every
+    retry gets it back without touching the passwords collection.
+
+    The keys are scoped by user and removed by a TTL index on the
+    expires field.
+    """
+
+    def __init__(self, mongodb, ttl=86400):
+        self.mongodb = mongodb
+        self.ttl = ttl
+
+    @classmethod
+    def from_settings(cls, mongodb, settings):
+        ttl = read_setting_from_env(settings, 'idempotency_key_ttl', 86400)
+        return cls(mongodb, int(ttl))
+
+    @property
+    def collection(self):
+        return self.mongodb.get_database().idempotency_keys
+
+    def ensure_indexes(self):
+        self.collection.ensure_index([('user', 1), ('key', 1)], unique=True)
+        self.collection.ensure_index('expires', expireAfterSeconds=0)
+
+    def reserve(self, user_id, key, fingerprint):
+        """Reserve the key for a new request.
+
+        Return None if the key was free or the stored document if
+        another request already used it.
+        """
+        now = datetime.datetime.now(tz=utc)
+        try:
+            self.collection.insert({
+                'user': user_id,
+                'key': key,
+                'fingerprint': fingerprint,
+                'status': None,
+                'expires': now + datetime.timedelta(seconds=self.ttl),
+            })
+        except DuplicateKeyError:
+            document = self.collection.find_one({'user': user_id, 'key': key})
+            # the TTL monitor only runs once a minute
+            if document is not None and document['expires'] < now:
+                self.release(user_id, key)
+                return self.reserve(user_id, key, fingerprint)
+            return document
+        return None
+
+    def release(self, user_id, key):
+        self.collection.remove({'user': user_id, 'key': key})
+
+    def save(self, user_id, key, response):
+        self.collection.update({'user': user_id, 'key': key}, {'$set': {
+            'status': response.status,
+            'content_type': response.headers.get('Content-Type'),
+            'etag': response.headers.get('ETag'),
+            'body': Binary(response.body),
+        }})
+
+    def replay(self, document):
+        response = Response(status=document['status'],
+                            body=bytes(document['body']))
+        if document['content_type'] is not None:
+            response.headers['Content-Type'] = document['content_type']
+        if document.get('etag') is not None:
+            response.headers['ETag'] = document['etag']
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+
+def idempotent(method):
+    """Make a password write view safe to retry.
+
+    It must be applied after protected_method since the keys are
+    scoped by the authenticated user.
+    """
+    @functools.wraps(method)
+    def wrapper(self):
+        request = self.request
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return method(self)
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return invalid_idempotency_key()
+
+        store = request.registry.settings['idempotency_store']
+        user_id = request.user['_id']
+        fingerprint = get_fingerprint(request)
+
+        document = store.reserve(user_id, key, fingerprint)
+        if document is not None:
+            if document['fingerprint'] != fingerprint:
+                return idempotency_key_reused()
+            elif document['status'] is None:
+                return idempotency_key_in_use()
+            else:
+                return store.replay(document)
+
+        try:
+            response = method(self)
+            if not isinstance(response, Response):
+                response = render_to_response('api', response,
+                                              request=request)
+        except Exception:
+            store.release(user_id, key)
+            raise
+
+        if response.status_int >= 500:
+            store.release(user_id, key)
+        else:
+            store.save(user_id, key, response)
+        return response
+
+    return wrapper
@@ -18,13 +18,109 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
 
+import re
+
+from bson import BSON
+from bson.objectid import ObjectId
+
+from yithlibraryserver.compat import string_types
+from yithlibraryserver.password.codec import PasswordCodec
+from yithlibraryserver.password.quota import HARD_QUOTA, QuotaExceeded
+from yithlibraryserver.stats import increment_stats
+
+# every search filter has an index that starts with the owner
+SEARCH_INDEXES = (
+    [('owner', 1), ('tags', 1)],
+    [('owner', 1), ('service', 1)],
+    [('owner', 1), ('account', 1)],
+    [('owner', 1), ('expiration', 1)],
+)
+
+# used by the yith_expiring_passwords command to find the passwords
+# of every user that expire soon
+EXPIRATION_INDEX = [('expiration', 1), ('owner', 1)]
+
+
+def get_revision(password):
+    """Return the revision of a password.
+
+    The passwords created before the revisions were added have none,
+    which is the same as revision 0.
+    """
+    return password.get('revision', 0)
+
+
+def get_password_size(password):
+    """Return the number of bytes a password takes in the database.
+
+    The password must be encoded as it is stored, including its _id.
+    """
+    return len(BSON.encode(password))
+
+
+def get_passwords_size(db, user):
+    """Return the number of bytes the passwords of the user take"""
+    if 'passwords_size' in user:
+        return user['passwords_size']
+
+    passwords = db.passwords.find({'owner': user.get('_id', None)})
+    return sum([get_password_size(password) for password in passwords])
+
+
+def get_password_tags(password):
+    """Return the set of tags of a password, which may be None"""
+    tags = password.get('tags') if password else None
+    if not isinstance(tags, list):
+        return set()
+    return set([tag for tag in tags if isinstance(tag, string_types)])
+
+
+def count_tags(added=(), removed=()):
+    """Return how many times every tag changes.
+
+    added and removed are lists of passwords.
+    """
+    counts = {}
+    for passwords, amount in ((added, 1), (removed, -1)):
+        for password in passwords:
+            for tag in get_password_tags(password):
+                counts[tag] = counts.get(tag, 0) + amount
+    return counts
+
+
+def revision_query(user, _id, revision):
+    return {
+        '_id': _id,
+        'owner': user['_id'],
+        # None matches the documents without a revision field
+        'revision': revision or None,
+    }
+
+
+def apply_patch(password, changes, removals):
+    """Return a copy of password with the changes and removals applied"""
+    patched = dict(password)
+    patched.update(changes)
+    for field in removals:
+        patched.pop(field, None)
+    return patched
+
 
 class PasswordsManager(object):
 
-    def __init__(self, db):
+    def __init__(self, db, codec=None, quota=None):
         self.db = db
+        # big fields are compressed in the database
+        self.codec = codec or PasswordCodec()
+        self.quota = quota
+
+    def ensure_indexes(self):
+        for index in SEARCH_INDEXES:
+            self.db.passwords.ensure_index(index)
+        self.db.passwords.ensure_index(EXPIRATION_INDEX)
+        self.db.tags.ensure_index([('owner', 1), ('tag', 1)], unique=True)
 
-    def create(self, user, password):
+    def create(self, user, password, replace=False):
         """Creates and returns a new password or a set of passwords.
 
         Stores the password in the database for this specific user
@@ -33,30 +129,50 @@ class PasswordsManager(object):
 
         If password is a list, do the same with each password in
         this list.
+
+        If replace is True the passwords the user already has are
+        removed first.
+
+        QuotaExceeded is raised, before anything is changed, if the
+        new passwords would go over the user's hard quota.
         """
         if isinstance(password, dict):
-            if password:
-                new_password = dict(password)  # copy since we are changing this object
-                new_password['owner'] = user['_id']
-                _id = self.db.passwords.insert(new_password)
-                new_password['_id'] = _id
-                return new_password
+            new_passwords = [password] if password else []
         else:
-            new_passwords = []  # copy since we are changing this object
-            for p in password:
-                if p:
-                    p = dict(p)
-                    p['owner'] = user['_id']
-                    new_passwords.append(p)
+            new_passwords = [p for p in password if p]
+
+        # copy since we are changing these objects. The _id is set here
+        # so the sizes can be computed before inserting the passwords
+        new_passwords = [dict(p, owner=user['_id'], revision=1,
+                              _id=ObjectId())
+                         for p in new_passwords]
+        encoded = [self.codec.encode(p) for p in new_passwords]
+        size = sum([get_password_size(p) for p in encoded])
+
+        if self.quota is not None and self.quota.enabled:
+            if replace:
+                n_passwords, current_size = 0, 0
+            else:
+                n_passwords, current_size = self.get_usage(user)
+            level = self.quota.check(n_passwords + len(new_passwords),
+                                     current_size + size)
+            if level == HARD_QUOTA:
+                raise QuotaExceeded()
 
-            if new_passwords:
+        if replace:
+            self.delete(user)
 
-                _ids = self.db.passwords.insert(new_passwords)
+        if not new_passwords:
+            return None
 
-                for i in range(len(new_passwords)):
-                    new_passwords[i]['_id'] = _ids[i]
+        self.db.passwords.insert(encoded)
+        self.update_counter(user, len(new_passwords), size)
+        self.update_tags(user, count_tags(added=new_passwords))
 
-                return new_passwords
+        if isinstance(password, dict):
+            return new_passwords[0]
+        else:
+            return new_passwords
 
     def retrieve(self, user, _id=None):
         """Return the user's passwords or just one.
@@ -65,42 +181,286 @@ class PasswordsManager(object):
         user. Otherwise, it returns the password with that _id.
         """
         if _id is None:
-            return self.db.passwords.find({'owner': user['_id']})
+            return self.codec.decode_cursor(
+                self.db.passwords.find({'owner': user['_id']}))
         else:
-            return self.db.passwords.find_one({
+            return self.codec.decode(self.db.passwords.find_one({
                 '_id': _id,
                 'owner': user['_id'],
-            })
+            }))
+
+    def search(self, user, tags=None, service=None, account=None,
+               expires_after=None, expires_before=None):
+        """Return the user's passwords that match all the filters.
 
-    def update(self, user, _id, password):
+        The passwords must have every tag in tags and their service
+        and account must start with the given prefixes. The expiration
+        window includes both limits. Filters that are None are not
+        used.
+        """
+        query = {'owner': user['_id']}
+        if tags:
+            query['tags'] = {'$all': list(tags)}
+        if service is not None:
+            query['service'] = {'$regex': '^' + re.escape(service)}
+        if account is not None:
+            query['account'] = {'$regex': '^' + re.escape(account)}
+        if expires_after is not None or expires_before is not None:
+            query['expiration'] = {}
+            if expires_after is not None:
+                query['expiration']['$gte'] = expires_after
+            if expires_before is not None:
+                query['expiration']['$lte'] = expires_before
+        return self.codec.decode_cursor(self.db.passwords.find(query))
+
+    def update(self, user, _id, password, revision=None):
         """Update a password in the database.
 
         Return the updated password on success or None if the original
         password does not exist.
+
+        If revision is not None the password is only updated if it
+        still has that revision, otherwise None is returned too.
         """
         new_password = dict(password)  # copy since we are changing this object
         new_password['owner'] = user['_id']
-        result = self.db.passwords.update({
-            '_id': _id,
-            'owner': user['_id'],
-        }, new_password)
-        new_password['_id'] = _id
 
-        # result['n'] is the number of documents updated
-        # See <http://www.mongodb.org/display/DOCS/getLastError+Command#getLastErrorCommand-ReturnValue
-        if result['n'] == 1:
-            return new_password
+        while True:
+            expected = revision
+            if expected is None:
+                current = self.retrieve(user, _id)
+                if current is None:
+                    return None
+                expected = get_revision(current)
+
+            new_password['revision'] = expected + 1
+            encoded = self.codec.encode(new_password)
+            self.check_size_change(user, _id, lambda stored: encoded)
+            old_password = self.db.passwords.find_and_modify(
+                revision_query(user, _id, expected), encoded)
+
+            if old_password is not None:
+                new_password['_id'] = _id
+                self.update_counter(
+                    user, 0,
+                    get_password_size(dict(encoded, _id=_id)) -
+                    get_password_size(old_password))
+                self.update_tags(user, count_tags(added=[new_password],
+                                                  removed=[old_password]))
+                return new_password
+            elif revision is not None:
+                return None
+            # else somebody else changed it since we read it. Try again
+
+    def patch(self, user, _id, changes, removals=(), revision=None):
+        """Change some fields of a password in the database.
+
+        The fields in changes are set and the ones in removals are
+        removed without rewriting the rest of the document.
+
+        Return the updated password on success or None if the password
+        does not exist or, when revision is not None, if it does not
+        have that revision anymore.
+        """
+        if revision is None:
+            query = {'_id': _id, 'owner': user['_id']}
         else:
+            query = revision_query(user, _id, revision)
+
+        encoded = self.codec.encode(changes) if changes else {}
+        self.check_size_change(
+            user, _id,
+            lambda stored: apply_patch(stored, encoded, removals))
+        update = {'$inc': {'revision': 1}}
+        if encoded:
+            update['$set'] = encoded
+        if removals:
+            update['$unset'] = dict([(field, '') for field in removals])
+
+        old_password = self.db.passwords.find_and_modify(query, update)
+        if old_password is None:
             return None
 
-    def delete(self, user, _id=None):
+        # the stored document is computed too to know its size
+        stored = apply_patch(old_password, encoded, removals)
+        stored['revision'] = get_revision(old_password) + 1
+        self.update_counter(user, 0, (get_password_size(stored) -
+                                      get_password_size(old_password)))
+
+        # apply the same changes to get the new document without
+        # reading it again
+        new_password = apply_patch(self.codec.decode(dict(old_password)),
+                                   changes, removals)
+        new_password['revision'] = get_revision(old_password) + 1
+
+        self.update_tags(user, count_tags(added=[new_password],
+                                          removed=[old_password]))
+        return new_password
+
+    def delete(self, user, _id=None, revision=None):
         """Deletes a password from the database or the whole set for this user.
 
+        If revision is not None the password is only removed if it
+        still has that revision.
+
         Returns True if the delete is succesfull or False otherwise.
         """
-        query = {'owner': user['_id']}
-        if _id is not None:
-            query['_id'] = _id
+        size = 0
+        if _id is None:
+            result = self.db.passwords.remove({'owner': user['_id']})
+            self.db.tags.remove({'owner': user['_id']})
+            n_passwords = result['n']
+            self.db.users.update({
+                '_id': user['_id'],
+                'passwords_size': {'$exists': True},
+            }, {
+                '$set': {'passwords_size': 0},
+            })
+        else:
+            if revision is not None:
+                query = revision_query(user, _id, revision)
+            else:
+                query = {'_id': _id, 'owner': user['_id']}
+            old_password = self.db.passwords.find_and_modify(query,
+                                                             remove=True)
+            if old_password is None:
+                n_passwords = 0
+            else:
+                n_passwords = 1
+                size = get_password_size(old_password)
+                self.update_tags(user, count_tags(removed=[old_password]))
+
+        if n_passwords > 0:
+            self.update_counter(user, -n_passwords, -size)
+        return n_passwords > 0
+
+    def get_tags(self, user):
+        """Return the user's tags and how many passwords have them"""
+        return self.db.tags.find({'owner': user['_id']},
+                                 fields={'_id': False, 'owner': False},
+                                 sort=[('tag', 1)])
+
+    def update_tags(self, user, counts):
+        """Add the counts to the user's tags catalogue.
+
+        The tags that no password has anymore are removed.
+        """
+        removed = False
+        for tag, amount in counts.items():
+            if amount != 0:
+                self.db.tags.update({'owner': user['_id'], 'tag': tag},
+                                    {'$inc': {'count': amount}},
+                                    upsert=True)
+                removed = removed or amount < 0
+
+        if removed:
+            self.db.tags.remove({'owner': user['_id'],
+                                 'count': {'$lte': 0}})
+
+    def move_tags(self, from_user, to_user):
+        """Add the tags of from_user to the catalogue of to_user"""
+        counts = dict([(tag['tag'], tag['count'])
+                       for tag in self.get_tags(from_user)])
+        self.update_tags(to_user, counts)
+        self.db.tags.remove({'owner': from_user['_id']})
+
+    def rebuild_tags(self, user):
+        """Build the user's tags catalogue from the passwords"""
+        self.db.tags.remove({'owner': user['_id']})
+        self.update_tags(user, count_tags(added=self.retrieve(user)))
+
+    def get_usage(self, user):
+        """Return the number of passwords of the user and their size.
+
+        The counters are computed from the passwords if the user
+        does not have them yet.
+        """
+        counters = self.db.users.find_one(
+            {'_id': user['_id']},
+            fields={'n_passwords': True, 'passwords_size': True},
+        ) or {'_id': user['_id']}
+
+        if 'n_passwords' in counters:
+            n_passwords = counters['n_passwords']
+        else:
+            n_passwords = self.db.passwords.find({
+                'owner': user['_id'],
+            }).count()
+
+        return n_passwords, get_passwords_size(self.db, counters)
+
+    def get_quota_level(self, user):
+        """Return the quota the user is over, if any"""
+        if self.quota is None or not self.quota.enabled:
+            return None
+        return self.quota.check(*self.get_usage(user))
+
+    def check_size_change(self, user, _id, get_new_password):
+        """Raise QuotaExceeded if changing the password would put the
+        user over the hard quota.
+
+        get_new_password receives the stored password and returns
+        the document that would replace it. Changes that do not make
+        the password bigger are always allowed.
+        """
+        if self.quota is None or not self.quota.enabled:
+            return
+
+        old_password = self.db.passwords.find_one({
+            '_id': _id,
+            'owner': user['_id'],
+        })
+        if old_password is None:
+            return
+
+        new_password = dict(get_new_password(old_password), _id=_id)
+        new_password['revision'] = get_revision(old_password) + 1
+        size = get_password_size(new_password) - \
+            get_password_size(old_password)
+        if size <= 0:
+            return
+
+        n_passwords, current_size = self.get_usage(user)
+        if self.quota.check(n_passwords, current_size + size) == HARD_QUOTA:
+            raise QuotaExceeded()
+
+    def update_counter(self, user, amount, size=0):
+        """Add amount to the n_passwords counter of the user and
+        size to the passwords_size counter.
+
+        Users without the counters are left alone since an increment
+        would make them start from a wrong value. The
+        add_n_passwords_counter and add_passwords_size_counter
+        migrations initialize them.
+
+        The global statistics are updated too.
+        """
+        if size != 0:
+            self.db.users.update({
+                '_id': user['_id'],
+                'passwords_size': {'$exists': True},
+            }, {
+                '$inc': {'passwords_size': size},
+            })
+
+        if amount == 0:
+            return
+
+        increments = {'passwords': amount}
+
+        result = self.db.users.find_and_modify({
+            '_id': user['_id'],
+            'n_passwords': {'$exists': True},
+        }, {
+            '$inc': {'n_passwords': amount},
+        }, new=True)
+
+        if result is not None:
+            after = result['n_passwords']
+            before = after - amount
+            if before <= 0 < after:
+                increments['with_passwords'] = 1
+            elif after <= 0 < before:
+                increments['with_passwords'] = -1
 
-        result = self.db.passwords.remove(query)
-        return result['n'] > 0
+        increment_stats(self.db, increments)
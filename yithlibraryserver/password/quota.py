@@ -0,0 +1,72 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+from yithlibraryserver.config import read_setting_from_env
+
+SOFT_QUOTA = 'soft'
+HARD_QUOTA = 'hard'
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class Quota(object):
+    """Limits of the number of passwords and bytes a user can store.
+
+    Going over a soft limit is allowed but the user should be warned.
+    Going over a hard limit is not allowed. A limit of 0 means there
+    is no limit.
+    """
+
+    def __init__(self, soft_passwords=0, hard_passwords=0,
+                 soft_size=0, hard_size=0):
+        self.soft_passwords = soft_passwords
+        self.hard_passwords = hard_passwords
+        self.soft_size = soft_size
+        self.hard_size = hard_size
+
+    @classmethod
+    def from_settings(cls, settings):
+        def read(key):
+            return int(read_setting_from_env(settings, key, 0))
+
+        return cls(read('password_quota_soft_count'),
+                   read('password_quota_hard_count'),
+                   read('password_quota_soft_size'),
+                   read('password_quota_hard_size'))
+
+    @property
+    def enabled(self):
+        return bool(self.soft_passwords or self.hard_passwords or
+                    self.soft_size or self.hard_size)
+
+    def check(self, n_passwords, size):
+        """Return the quota that this usage goes over, if any"""
+        if exceeds(n_passwords, self.hard_passwords) or \
+           exceeds(size, self.hard_size):
+            return HARD_QUOTA
+        elif exceeds(n_passwords, self.soft_passwords) or \
+                exceeds(size, self.soft_size):
+            return SOFT_QUOTA
+        else:
+            return None
+
+
+def exceeds(value, limit):
+    return limit > 0 and value > limit
@@ -0,0 +1,109 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+from bson.binary import Binary
+
+from yithlibraryserver.compat import text_type
+from yithlibraryserver.db import MongoDB
+from yithlibraryserver.password.codec import PasswordCodec, is_compressed
+from yithlibraryserver.password.codec import get_compression_report
+from yithlibraryserver.testing import MONGO_URI, clean_db
+
+NOTES = text_type('This is a certificate. ') * 100
+
+
+class Cursor(object):
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def count(self):
+        return len(self.documents)
+
+
+class PasswordCodecTests(unittest.TestCase):
+
+    def setUp(self):
+        self.codec = PasswordCodec()
+
+    def test_encode(self):
+        password = {'secret': 's3cr3t', 'notes': 'short notes'}
+        self.assertTrue(self.codec.encode(password) is password)
+
+        password = {'secret': 's3cr3t', 'notes': NOTES, 'tags': None}
+        encoded = self.codec.encode(password)
+        self.assertFalse(encoded is password)
+        self.assertEqual(password['notes'], NOTES)
+        self.assertTrue(is_compressed(encoded['notes']))
+        self.assertTrue(len(encoded['notes']) < len(NOTES))
+        self.assertEqual(encoded['secret'], 's3cr3t')
+
+        # incompressible data is stored as it is
+        codec = PasswordCodec(threshold=10)
+        password = {'notes': text_type('0123456789ab')}
+        self.assertTrue(codec.encode(password) is password)
+
+        # other values are left alone
+        password = {'notes': 1000, 'secret': Binary(b'a' * 2000)}
+        self.assertTrue(self.codec.encode(password) is password)
+
+    def test_decode(self):
+        password = {'secret': 's3cr3t', 'notes': NOTES}
+        decoded = self.codec.decode(self.codec.encode(password))
+        self.assertEqual(decoded, password)
+
+        password = {'secret': Binary(b'abc'), 'notes': 'short notes'}
+        self.assertEqual(self.codec.decode(password), password)
+
+        self.assertEqual(self.codec.decode(None), None)
+
+    def test_decode_cursor(self):
+        cursor = self.codec.decode_cursor(Cursor([
+            self.codec.encode({'notes': NOTES}),
+            {'notes': 'short'},
+        ]))
+        self.assertEqual(cursor.count(), 2)
+        self.assertEqual(list(cursor), [{'notes': NOTES}, {'notes': 'short'}])
+
+
+class CompressionReportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MongoDB(MONGO_URI).get_database()
+
+    def tearDown(self):
+        clean_db(self.db)
+
+    def test_report(self):
+        codec = PasswordCodec()
+        self.db.passwords.insert(codec.encode({'notes': NOTES}))
+        self.db.passwords.insert({'notes': 'short', 'secret': 's3cr3t'})
+
+        report = get_compression_report(self.db)
+        self.assertEqual(report[1], ('secret', 0, 0, 0))
+        field, n_values, original, stored = report[0]
+        self.assertEqual(field, 'notes')
+        self.assertEqual(n_values, 1)
+        self.assertEqual(original, len(NOTES))
+        self.assertTrue(0 < stored < original)
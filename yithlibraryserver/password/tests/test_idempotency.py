@@ -0,0 +1,82 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import datetime
+import unittest
+
+from bson.tz_util import utc
+from freezegun import freeze_time
+from pyramid.response import Response
+
+from yithlibraryserver.db import MongoDB
+from yithlibraryserver.password.idempotency import IdempotencyStore
+from yithlibraryserver.testing import MONGO_URI, clean_db
+
+
+class IdempotencyStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.mongodb = MongoDB(MONGO_URI)
+        self.db = self.mongodb.get_database()
+        self.store = IdempotencyStore(self.mongodb, 3600)
+        self.store.ensure_indexes()
+
+    def tearDown(self):
+        clean_db(self.db)
+
+    def test_from_settings(self):
+        store = IdempotencyStore.from_settings(self.mongodb, {})
+        self.assertEqual(store.ttl, 86400)
+        store = IdempotencyStore.from_settings(
+            self.mongodb, {'idempotency_key_ttl': '60'})
+        self.assertEqual(store.ttl, 60)
+
+    @freeze_time('2014-02-23 08:00:00')
+    def test_reserve_and_replay(self):
+        self.assertEqual(self.store.reserve('user1', 'key1', 'POST /a'), None)
+        document = self.store.reserve('user1', 'key1', 'POST /a')
+        self.assertEqual(document['status'], None)
+        self.assertEqual(document['expires'],
+                         datetime.datetime(2014, 2, 23, 9, 0, tzinfo=utc))
+
+        # other users can use the same key
+        self.assertEqual(self.store.reserve('user2', 'key1', 'POST /a'), None)
+
+        self.store.save('user1', 'key1', Response(
+            status='201 Created', body=b'{"a": 1}',
+            content_type='application/json'))
+        document = self.store.reserve('user1', 'key1', 'POST /a')
+        response = self.store.replay(document)
+        self.assertEqual(response.status, '201 Created')
+        self.assertEqual(response.body, b'{"a": 1}')
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertEqual(response.headers['Idempotent-Replayed'], 'true')
+
+        self.store.release('user1', 'key1')
+        self.assertEqual(self.store.reserve('user1', 'key1', 'POST /b'), None)
+
+    def test_expired_keys(self):
+        with freeze_time('2014-02-23 08:00:00'):
+            self.store.reserve('user1', 'key1', 'POST /a')
+
+        with freeze_time('2014-02-23 09:00:01'):
+            self.assertEqual(self.store.reserve('user1', 'key1', 'POST /b'),
+                             None)
+        document = self.db.idempotency_keys.find_one({'key': 'key1'})
+        self.assertEqual(document['fingerprint'], 'POST /b')
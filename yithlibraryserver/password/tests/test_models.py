@@ -20,10 +20,15 @@
 
 import unittest
 
+from bson.binary import Binary
+from bson.objectid import ObjectId
 from pyramid import testing
 
+from yithlibraryserver.compat import text_type
 from yithlibraryserver.db import MongoDB
 from yithlibraryserver.password.models import PasswordsManager
+from yithlibraryserver.password.models import get_password_size
+from yithlibraryserver.password.quota import Quota, QuotaExceeded
 from yithlibraryserver.testing import MONGO_URI, clean_db
 
 
@@ -50,6 +55,7 @@ class PasswordsManagerTests(unittest.TestCase):
         password = {'secret': 'secret1'}
         created_password = self.pm.create(self.user, password)
         self.assertEqual(created_password['owner'], self.user_id)
+        self.assertEqual(created_password['revision'], 1)
         self.assertTrue('_id' in created_password)
         self.assertEqual(n_passwords + 1, self.db.passwords.count())
 
@@ -105,6 +111,55 @@ class PasswordsManagerTests(unittest.TestCase):
             '_id': p2,
         }])
 
+    def test_search(self):
+        p1 = self.db.passwords.insert({
+            'service': 'example.com',
+            'account': 'john',
+            'tags': ['work', 'email'],
+            'expiration': 100,
+            'owner': self.user_id,
+        })
+        p2 = self.db.passwords.insert({
+            'service': 'example.org',
+            'account': 'peter',
+            'tags': ['work'],
+            'expiration': 200,
+            'owner': self.user_id,
+        })
+        p3 = self.db.passwords.insert({
+            'service': 'test.com',
+            'account': 'john.doe',
+            'owner': self.user_id,
+        })
+        self.db.passwords.insert({
+            'service': 'example.com',
+            'owner': '000000000000000000000000',
+        })
+
+        def search(**filters):
+            return [p['_id'] for p in self.pm.search(self.user, **filters)]
+
+        self.assertEqual(search(), [p1, p2, p3])
+        self.assertEqual(search(tags=['work']), [p1, p2])
+        self.assertEqual(search(tags=['work', 'email']), [p1])
+        self.assertEqual(search(service='example.'), [p1, p2])
+        self.assertEqual(search(service='.com'), [])
+        self.assertEqual(search(account='john'), [p1, p3])
+        self.assertEqual(search(account='john', tags=['work']), [p1])
+        self.assertEqual(search(expires_after=150), [p2])
+        self.assertEqual(search(expires_before=150), [p1])
+        self.assertEqual(search(expires_after=100, expires_before=200),
+                         [p1, p2])
+
+    def test_ensure_indexes(self):
+        self.pm.ensure_indexes()
+        indexes = self.db.passwords.index_information()
+        self.assertTrue('owner_1_tags_1' in indexes)
+        self.assertTrue('owner_1_service_1' in indexes)
+        self.assertTrue('owner_1_account_1' in indexes)
+        self.assertTrue('owner_1_expiration_1' in indexes)
+        self.assertTrue('expiration_1_owner_1' in indexes)
+
     def test_update(self):
         p1 = self.db.passwords.insert({
             'secret': 'secret1',
@@ -116,13 +171,46 @@ class PasswordsManagerTests(unittest.TestCase):
             '_id': p1,
             'owner': self.user_id,
             'secret': 'new secret',
+            'revision': 1,
         })
 
+        # update only if the revision is the expected one
+        updated_password = self.pm.update(self.user, p1, new_password, 0)
+        self.assertEqual(None, updated_password)
+        updated_password = self.pm.update(self.user, p1, new_password, 1)
+        self.assertEqual(updated_password['revision'], 2)
+
         fake_user = {'_id': '000000000000000000000000'}
         new_password['secret'] = 'another secret'
         updated_password = self.pm.update(fake_user, p1, new_password)
         self.assertEqual(None, updated_password)
 
+    def test_patch(self):
+        p1 = self.db.passwords.insert({
+            'secret': 'secret1',
+            'notes': 'notes1',
+            'owner': self.user_id,
+        })
+        patched_password = self.pm.patch(self.user, p1, {'tags': ['a']},
+                                         ['notes'])
+        self.assertEqual(patched_password, {
+            '_id': p1,
+            'owner': self.user_id,
+            'secret': 'secret1',
+            'tags': ['a'],
+            'revision': 1,
+        })
+
+        self.assertEqual(None, self.pm.patch(self.user, p1, {'tags': []},
+                                             revision=0))
+        patched_password = self.pm.patch(self.user, p1, {'tags': []},
+                                         revision=1)
+        self.assertEqual(patched_password['tags'], [])
+        self.assertEqual(patched_password['revision'], 2)
+
+        fake_user = {'_id': '000000000000000000000000'}
+        self.assertEqual(None, self.pm.patch(fake_user, p1, {'tags': []}))
+
     def test_delete(self):
         p1 = self.db.passwords.insert({
             'secret': 'secret1',
@@ -150,3 +238,222 @@ class PasswordsManagerTests(unittest.TestCase):
         self.assertEqual(None, password1)
         password2 = self.db.passwords.find_one({'_id': p2})
         self.assertEqual(None, password2)
+
+        p1 = self.db.passwords.insert({
+            'secret': 'secret1',
+            'owner': self.user_id,
+            'revision': 3,
+        })
+        self.assertFalse(self.pm.delete(self.user, p1, 2))
+        self.assertTrue(self.pm.delete(self.user, p1, 3))
+
+    def test_counter(self):
+        # users without the counter are not touched
+        self.pm.create(self.user, {'secret': 'secret1'})
+        user = self.db.users.find_one({'_id': self.user_id})
+        self.assertFalse('n_passwords' in user)
+
+        self.db.users.update({'_id': self.user_id},
+                             {'$set': {'n_passwords': 1}})
+
+        self.pm.create(self.user, {'secret': 'secret2'})
+        user = self.db.users.find_one({'_id': self.user_id})
+        self.assertEqual(user['n_passwords'], 2)
+
+        p3, p4 = self.pm.create(self.user, [
+            {'secret': 'secret3'},
+            {'secret': 'secret4'},
+        ])
+        user = self.db.users.find_one({'_id': self.user_id})
+        self.assertEqual(user['n_passwords'], 4)
+
+        self.pm.update(self.user, p3['_id'], {'secret': 'new secret'})
+        user = self.db.users.find_one({'_id': self.user_id})
+        self.assertEqual(user['n_passwords'], 4)
+
+        self.pm.delete(self.user, p3['_id'])
+        user = self.db.users.find_one({'_id': self.user_id})
+        self.assertEqual(user['n_passwords'], 3)
+
+        self.pm.delete(self.user, p3['_id'])
+        user = self.db.users.find_one({'_id': self.user_id})
+        self.assertEqual(user['n_passwords'], 3)
+
+        self.pm.delete(self.user)
+        user = self.db.users.find_one({'_id': self.user_id})
+        self.assertEqual(user['n_passwords'], 0)
+
+    def assertSize(self):
+        user = self.db.users.find_one({'_id': self.user_id})
+        expected = sum([get_password_size(p)
+                        for p in self.db.passwords.find({'owner': self.user_id})])
+        self.assertEqual(user['passwords_size'], expected)
+
+    def test_size_counter(self):
+        # users without the counter are not touched
+        self.pm.create(self.user, {'secret': 'secret1'})
+        user = self.db.users.find_one({'_id': self.user_id})
+        self.assertFalse('passwords_size' in user)
+        self.assertEqual(self.pm.get_usage(self.user)[0], 1)
+
+        self.db.users.update({'_id': self.user_id}, {'$set': {
+            'passwords_size': self.pm.get_usage(self.user)[1],
+        }})
+
+        p2 = self.pm.create(self.user, {'secret': 'secret2'})
+        self.assertSize()
+
+        p3, p4 = self.pm.create(self.user, [
+            {'secret': 'secret3'},
+            {'secret': 'secret4', 'notes': text_type('notes ') * 500},
+        ])
+        self.assertSize()
+
+        self.pm.update(self.user, p3['_id'], {'secret': 'a longer secret'})
+        self.assertSize()
+
+        self.pm.patch(self.user, p2['_id'], {'service': 'service2'})
+        self.assertSize()
+
+        self.pm.patch(self.user, p4['_id'], {}, ['notes'])
+        self.assertSize()
+
+        self.pm.delete(self.user, p3['_id'])
+        self.assertSize()
+
+        self.pm.delete(self.user)
+        user = self.db.users.find_one({'_id': self.user_id})
+        self.assertEqual(user['passwords_size'], 0)
+        self.assertEqual(self.pm.get_usage(self.user), (0, 0))
+
+    def test_create_quota(self):
+        quota = Quota(soft_passwords=1, hard_passwords=2)
+        pm = PasswordsManager(self.db, quota=quota)
+
+        self.assertEqual(pm.get_quota_level(self.user), None)
+        pm.create(self.user, {'secret': 'secret1'})
+        self.assertEqual(pm.get_quota_level(self.user), None)
+        pm.create(self.user, {'secret': 'secret2'})
+        self.assertEqual(pm.get_quota_level(self.user), 'soft')
+
+        self.assertRaises(QuotaExceeded, pm.create, self.user,
+                          {'secret': 'secret3'})
+        self.assertRaises(QuotaExceeded, pm.create, self.user,
+                          [{'secret': 'secret3'}, {'secret': 'secret4'}])
+        self.assertEqual(self.db.passwords.count(), 2)
+
+        # the replaced passwords do not count
+        self.assertRaises(QuotaExceeded, pm.create, self.user,
+                          [{'secret': 's3'}, {'secret': 's4'}, {'secret': 's5'}],
+                          replace=True)
+        self.assertEqual(self.db.passwords.count(), 2)
+        pm.create(self.user, [{'secret': 's3'}, {'secret': 's4'}],
+                  replace=True)
+        self.assertEqual(sorted([p['secret'] for p in self.db.passwords.find()]),
+                         ['s3', 's4'])
+
+        size = pm.get_usage(self.user)[1]
+        pm.quota = Quota(hard_size=size)
+        self.assertRaises(QuotaExceeded, pm.create, self.user,
+                          {'secret': 'secret5'})
+
+        # the quota is not enforced without a manager quota
+        self.pm.create(self.user, {'secret': 'secret5'})
+        self.assertEqual(self.db.passwords.count(), 3)
+
+    def test_update_quota(self):
+        p1 = self.pm.create(self.user, {'secret': 'secret1',
+                                        'notes': 'some notes'})
+        size = self.pm.get_usage(self.user)[1]
+        pm = PasswordsManager(self.db, quota=Quota(hard_size=size))
+
+        # the password can not grow
+        self.assertRaises(QuotaExceeded, pm.update, self.user, p1['_id'],
+                          {'secret': 'secret1', 'notes': 'longer notes'})
+        self.assertRaises(QuotaExceeded, pm.patch, self.user, p1['_id'],
+                          {'account': 'john'})
+        password = self.db.passwords.find_one()
+        self.assertEqual(password['notes'], 'some notes')
+        self.assertFalse('account' in password)
+        self.assertEqual(self.pm.get_usage(self.user)[1], size)
+
+        # but it can stay the same or get smaller
+        pm.update(self.user, p1['_id'], {'secret': 'secret2',
+                                         'notes': 'more notes'})
+        pm.patch(self.user, p1['_id'], {}, ['notes'])
+        password = self.db.passwords.find_one()
+        self.assertEqual(password['secret'], 'secret2')
+        self.assertFalse('notes' in password)
+        self.assertTrue(self.pm.get_usage(self.user)[1] < size)
+
+        # unknown passwords are not checked
+        self.assertEqual(pm.update(self.user, ObjectId(), {'secret': 's'}),
+                         None)
+
+    def assertTags(self, user, expected):
+        tags = self.pm.get_tags(user)
+        self.assertEqual([(t['tag'], t['count']) for t in tags], expected)
+
+    def test_tags(self):
+        self.assertTags(self.user, [])
+
+        p1, p2 = self.pm.create(self.user, [
+            {'secret': 'secret1', 'tags': ['work', 'email']},
+            {'secret': 'secret2', 'tags': ['work', 'work']},
+        ])
+        p3 = self.pm.create(self.user, {'secret': 'secret3', 'tags': None})
+        self.assertTags(self.user, [('email', 1), ('work', 2)])
+
+        self.pm.update(self.user, p1['_id'], {'secret': 'secret1',
+                                              'tags': ['home']})
+        self.assertTags(self.user, [('home', 1), ('work', 1)])
+
+        self.pm.patch(self.user, p3['_id'], {'tags': ['home', 'bank']})
+        self.assertTags(self.user, [('bank', 1), ('home', 2), ('work', 1)])
+
+        self.pm.patch(self.user, p2['_id'], {}, ['tags'])
+        self.assertTags(self.user, [('bank', 1), ('home', 2)])
+
+        self.pm.delete(self.user, p3['_id'])
+        self.assertTags(self.user, [('home', 1)])
+
+        other_user = {'_id': self.db.users.insert({'name': 'Peter'})}
+        self.pm.create(other_user, {'secret': 'secret4', 'tags': ['home']})
+        self.pm.move_tags(other_user, self.user)
+        self.assertTags(self.user, [('home', 2)])
+        self.assertTags(other_user, [])
+
+        self.pm.rebuild_tags(self.user)
+        self.assertTags(self.user, [('home', 1)])
+
+        self.pm.delete(self.user)
+        self.assertTags(self.user, [])
+
+    def test_compression(self):
+        notes = text_type('This is a certificate. ') * 100
+        password = self.pm.create(self.user, {'secret': 's3cr3t',
+                                              'notes': notes})
+        self.assertEqual(password['notes'], notes)
+        stored = self.db.passwords.find_one({'_id': password['_id']})
+        self.assertTrue(isinstance(stored['notes'], Binary))
+        self.assertEqual(stored['secret'], 's3cr3t')
+
+        self.assertEqual(self.pm.retrieve(self.user, password['_id']),
+                         password)
+        self.assertEqual(list(self.pm.retrieve(self.user)), [password])
+        self.assertEqual(self.pm.retrieve(self.user).count(), 1)
+
+        password = self.pm.patch(self.user, password['_id'],
+                                 {'tags': ['a']})
+        self.assertEqual(password['notes'], notes)
+
+        password = self.pm.update(self.user, password['_id'],
+                                  {'secret': 's3cr3t', 'notes': 'short'})
+        stored = self.db.passwords.find_one({'_id': password['_id']})
+        self.assertEqual(stored['notes'], 'short')
+
+        password = self.pm.patch(self.user, password['_id'],
+                                 {'notes': notes})
+        self.assertEqual(password['notes'], notes)
+        stored = self.db.passwords.find_one({'_id': password['_id']})
+        self.assertTrue(isinstance(stored['notes'], Binary))
@@ -0,0 +1,64 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+
+from yithlibraryserver.password.quota import Quota, HARD_QUOTA, SOFT_QUOTA
+
+
+class QuotaTests(unittest.TestCase):
+
+    def test_from_settings(self):
+        quota = Quota.from_settings({})
+        self.assertFalse(quota.enabled)
+        self.assertEqual(quota.check(1000000, 1000000000), None)
+
+        quota = Quota.from_settings({
+            'password_quota_soft_count': '100',
+            'password_quota_hard_count': '200',
+            'password_quota_soft_size': '1000',
+            'password_quota_hard_size': '2000',
+        })
+        self.assertTrue(quota.enabled)
+        self.assertEqual(quota.soft_passwords, 100)
+        self.assertEqual(quota.hard_passwords, 200)
+        self.assertEqual(quota.soft_size, 1000)
+        self.assertEqual(quota.hard_size, 2000)
+
+        os.environ['PASSWORD_QUOTA_HARD_COUNT'] = '10'
+        try:
+            quota = Quota.from_settings({})
+            self.assertEqual(quota.hard_passwords, 10)
+        finally:
+            del os.environ['PASSWORD_QUOTA_HARD_COUNT']
+
+    def test_check(self):
+        quota = Quota(soft_passwords=10, hard_passwords=20,
+                      soft_size=100, hard_size=200)
+        self.assertEqual(quota.check(0, 0), None)
+        self.assertEqual(quota.check(10, 100), None)
+        self.assertEqual(quota.check(11, 100), SOFT_QUOTA)
+        self.assertEqual(quota.check(10, 101), SOFT_QUOTA)
+        self.assertEqual(quota.check(21, 0), HARD_QUOTA)
+        self.assertEqual(quota.check(0, 201), HARD_QUOTA)
+
+        # only the hard limit
+        quota = Quota(hard_size=200)
+        self.assertEqual(quota.check(1000, 200), None)
+        self.assertEqual(quota.check(1000, 201), HARD_QUOTA)
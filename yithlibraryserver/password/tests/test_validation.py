@@ -20,7 +20,10 @@
 
 import unittest
 
+import msgpack
+
 from yithlibraryserver.password.validation import validate_password
+from yithlibraryserver.password.validation import validate_password_changes
 
 
 class UtilsTests(unittest.TestCase):
@@ -63,3 +66,107 @@ class UtilsTests(unittest.TestCase):
             'creation': None,
             'last_modification': None,
         })
+
+    def test_validate_password_msgpack(self):
+        content_type = 'application/x-msgpack'
+
+        password, errors = validate_password(b'', content_type=content_type)
+        self.assertEqual(password, {})
+        self.assertEqual(errors, ['No MessagePack object could be decoded'])
+
+        password, errors = validate_password(b'\x81\xa3foo\xa3bar',
+                                             content_type=content_type)
+        self.assertEqual(password, {})
+        self.assertEqual(errors, ['There must be only one toplevel element called "password"'])
+
+        data = msgpack.packb({'password': {'secret': 's3cr3t',
+                                           'service': 'myservice'}})
+        password, errors = validate_password(data, _id='1',
+                                             content_type=content_type)
+        self.assertEqual(errors, [])
+        self.assertEqual(password['secret'], 's3cr3t')
+        self.assertEqual(password['service'], 'myservice')
+        self.assertEqual(password['account'], None)
+
+    def test_validate_password_types(self):
+        content_type = 'application/x-msgpack'
+
+        # msgpack bin values arrive as bytes
+        data = msgpack.packb({'password': {'secret': b'\x00\xff',
+                                           'service': 'myservice'}},
+                             use_bin_type=True)
+        password, errors = validate_password(data, _id='1',
+                                             content_type=content_type)
+        self.assertEqual(errors, ['Secret must be a string'])
+
+        data = msgpack.packb({'password': {'secret': 's3cr3t',
+                                           'service': 'myservice',
+                                           'tags': ['a', b'\x00'],
+                                           'expiration': b'\x00'}},
+                             use_bin_type=True)
+        password, errors = validate_password(data, _id='1',
+                                             content_type=content_type)
+        self.assertEqual(errors, ['Expiration can not be binary',
+                                  'Tags must be a list of strings'])
+
+        password, errors = validate_password(
+            b'{"password": {"secret": "s3cr3t", "service": 1, "tags": "a"}}')
+        self.assertEqual(errors, ['Service must be a string',
+                                  'Tags must be a list of strings'])
+
+        data = msgpack.packb({'password': {'notes': b'\x00\xff'}},
+                             use_bin_type=True)
+        changes, removals, errors = validate_password_changes(
+            data, content_type=content_type)
+        self.assertEqual(errors, ['Notes must be a string'])
+        self.assertEqual(changes, {})
+
+    def test_validate_password_field_size(self):
+        data = (b'{"password": {"secret": "s3cr3t", "notes": "' +
+                b'a' * 20 + b'"}}')
+        password, errors = validate_password(data, max_field_size=20)
+        self.assertEqual(errors, ['Service is required'])
+
+        password, errors = validate_password(data, max_field_size=19)
+        self.assertEqual(password, {})
+        self.assertEqual(errors, ['Notes is too large'])
+
+        # the unknown fields are checked too but not named
+        data = b'{"password": {"secret": "s3cr3t", "foo": [1, 2, 3, 4, 5, 6, 7]}}'
+        password, errors = validate_password(data, max_field_size=6)
+        self.assertEqual(errors, ['A field is too large'])
+
+        # the tags are counted together
+        data = b'{"password": {"secret": "s3cr3t", "tags": ["abc", "def"]}}'
+        password, errors = validate_password(data, max_field_size=7)
+        self.assertEqual(errors, ['Tags is too large'])
+
+        data = msgpack.packb({'password': {'secret': 's3cr3t' * 10,
+                                           'service': 'myservice'}})
+        password, errors = validate_password(
+            data, content_type='application/x-msgpack', max_field_size=20)
+        self.assertEqual(errors, ['Secret is too large'])
+
+        changes, removals, errors = validate_password_changes(
+            b'{"password": {"notes": "too long"}}', max_field_size=5)
+        self.assertEqual(errors, ['Notes is too large'])
+
+    def test_validate_password_changes(self):
+        changes, removals, errors = validate_password_changes(b'[1')
+        self.assertEqual(errors, ['No JSON object could be decoded'])
+
+        changes, removals, errors = validate_password_changes(
+            b'{"password": {"foo": "bar"}}')
+        self.assertEqual(errors, ['There are no fields to update'])
+
+        changes, removals, errors = validate_password_changes(
+            b'{"password": {"secret": null, "service": null}}')
+        self.assertEqual(errors, ['Secret can not be removed',
+                                  'Service can not be removed'])
+
+        changes, removals, errors = validate_password_changes(
+            b'{"password": {"secret": "s3cr3t", "notes": null, '
+            b'"tags": ["a"], "_id": "1"}}')
+        self.assertEqual(errors, [])
+        self.assertEqual(changes, {'secret': 's3cr3t', 'tags': ['a']})
+        self.assertEqual(removals, ['notes'])
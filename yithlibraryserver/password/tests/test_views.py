@@ -19,12 +19,17 @@
 # along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
 
 import datetime
+import hashlib
+import json
+
+import msgpack
 
 from bson.tz_util import utc
 from freezegun import freeze_time
 
 from yithlibraryserver import testing
 from yithlibraryserver.compat import text_type
+from yithlibraryserver.password.models import PasswordsManager
 
 
 class ViewTests(testing.TestCase):
@@ -63,7 +68,8 @@ class ViewTests(testing.TestCase):
         self.assertEqual(res.headers['Access-Control-Allow-Methods'],
                          'GET, POST')
         self.assertEqual(res.headers['Access-Control-Allow-Headers'],
-                         'Origin, Content-Type, Accept, Authorization')
+                         'Origin, Content-Type, Accept, Authorization, '
+                         'Idempotency-Key')
 
     def test_password_collection_get_empty(self):
         res = self.testapp.get('/passwords', headers=self.auth_header)
@@ -91,6 +97,39 @@ class ViewTests(testing.TestCase):
             ],
         })
 
+    def test_password_collection_get_filters(self):
+        self.db.passwords.insert({
+            'service': 'example.com',
+            'secret': 's3cr3t',
+            'tags': ['work', 'email'],
+            'expiration': 100,
+            'owner': self.user_id,
+        })
+        self.db.passwords.insert({
+            'service': 'example.org',
+            'secret': 's3cr3t',
+            'account': 'john',
+            'tags': ['work'],
+            'owner': self.user_id,
+        })
+
+        def services(query):
+            res = self.testapp.get('/passwords?' + query,
+                                   headers=self.auth_header)
+            return sorted([p['service'] for p in res.json['passwords']])
+
+        self.assertEqual(services('tag=work'), ['example.com', 'example.org'])
+        self.assertEqual(services('tag=work&tag=email'), ['example.com'])
+        self.assertEqual(services('service=example.o'), ['example.org'])
+        self.assertEqual(services('account=jo'), ['example.org'])
+        self.assertEqual(services('expires_before=100'), ['example.com'])
+        self.assertEqual(services('expires_after=101'), [])
+
+        res = self.testapp.get('/passwords?expires_after=tomorrow',
+                               headers=self.auth_header, status=400)
+        self.assertEqual(res.body,
+                         b'{"message": "expires_after must be an integer"}')
+
     def test_password_collection_post(self):
         res = self.testapp.post('/passwords', '', headers=self.auth_header,
                                 status=400)
@@ -104,14 +143,56 @@ class ViewTests(testing.TestCase):
 
         self.assertEqual(res.status, '200 OK')
 
+    def test_password_collection_post_quota(self):
+        quota = self.testapp.app.registry.settings['password_quota']
+        quota.soft_passwords = 1
+        quota.hard_passwords = 2
+        body = '{"secret": "s3cr3t", "service": "myservice"}'
+
+        res = self.testapp.post('/passwords', body, headers=self.auth_header)
+        self.assertEqual(res.status, '200 OK')
+        self.assertFalse('Warning' in res.headers)
+
+        res = self.testapp.post('/passwords', body, headers=self.auth_header)
+        self.assertEqual(res.status, '200 OK')
+        self.assertEqual(res.headers['Warning'],
+                         '199 - "You are close to the limit of your '
+                         'password quota"')
+
+        res = self.testapp.post('/passwords', body, headers=self.auth_header,
+                                status=507)
+        self.assertEqual(res.status, '507 Insufficient Storage')
+        self.assertEqual(res.body,
+                         b'{"message": "Your password quota is exceeded"}')
+        self.assertEqual(self.db.passwords.count(), 2)
+
+    def test_password_collection_post_limits(self):
+        body_limits = self.testapp.app.registry.settings['body_limits']
+        body_limits.max_body_size = 100
+        body_limits.max_field_size = 10
+
+        body = '{"password": {"secret": "%s"}}' % ('a' * 100)
+        res = self.testapp.post('/passwords', body, headers=self.auth_header,
+                                status=413)
+        self.assertEqual(res.status, '413 Request Entity Too Large')
+        self.assertEqual(res.body,
+                         b'{"message": "The request body is too large"}')
+
+        body = '{"password": {"secret": "%s"}}' % ('a' * 20)
+        res = self.testapp.post('/passwords', body, headers=self.auth_header,
+                                status=400)
+        self.assertEqual(res.body, b'{"message": "Secret is too large"}')
+        self.assertEqual(self.db.passwords.count(), 0)
+
     def test_password_options(self):
         res = self.testapp.options('/passwords/123456')
         self.assertEqual(res.status, '200 OK')
         self.assertEqual(res.body, b'')
         self.assertEqual(res.headers['Access-Control-Allow-Methods'],
-                         'GET, PUT, DELETE')
+                         'GET, PUT, PATCH, DELETE')
         self.assertEqual(res.headers['Access-Control-Allow-Headers'],
-                         'Origin, Content-Type, Accept, Authorization')
+                         'Origin, Content-Type, Accept, Authorization, '
+                         'Idempotency-Key, If-Match, If-None-Match')
 
     def test_password_get(self):
         res = self.testapp.get('/passwords/123456', headers=self.auth_header,
@@ -178,10 +259,12 @@ class ViewTests(testing.TestCase):
                 'last_modification': None,
                 'notes': None,
                 'tags': None,
+                'revision': 1,
                 '_id': str(password_id),
                 'id': str(password_id),
             },
         })
+        self.assertEqual(res.headers['ETag'], '"1"')
         password = self.db.passwords.find_one(password_id)
         self.assertNotEqual(password, None)
         self.assertEqual(password['service'], 'testing2')
@@ -222,3 +305,323 @@ class ViewTests(testing.TestCase):
                                     + text_type(_id).encode('ascii')
                                     + b'"}}'))
         self.assertEqual(self.db.passwords.count(), count - 1)
+
+    def test_password_collection_msgpack(self):
+        headers = dict(self.auth_header, Accept='application/x-msgpack')
+        res = self.testapp.get('/passwords', headers=headers)
+        self.assertEqual(res.status, '200 OK')
+        self.assertEqual(res.content_type, 'application/x-msgpack')
+        self.assertEqual(res.headers['Vary'], 'Accept')
+        self.assertEqual(msgpack.unpackb(res.body, encoding='utf-8'),
+                         {'passwords': []})
+
+        headers['Content-Type'] = 'application/x-msgpack'
+        res = self.testapp.post('/passwords', b'\xc1',
+                                headers=headers, status=400)
+        self.assertEqual(res.body, (b'{"message": "No MessagePack object '
+                                    b'could be decoded"}'))
+
+        data = msgpack.packb({'password': {'secret': 's3cr3t',
+                                           'service': 'myservice'}})
+        res = self.testapp.post('/passwords', data, headers=headers)
+        self.assertEqual(res.status, '200 OK')
+        password = msgpack.unpackb(res.body, encoding='utf-8')['password']
+        self.assertEqual(password['secret'], 's3cr3t')
+        self.assertEqual(password['service'], 'myservice')
+        self.assertEqual(password['owner'], str(self.user_id))
+        self.assertEqual(password['id'], password['_id'])
+
+        res = self.testapp.get('/passwords', headers=headers)
+        passwords = msgpack.unpackb(res.body, encoding='utf-8')['passwords']
+        self.assertEqual(len(passwords), 1)
+        self.assertEqual(passwords[0]['id'], password['id'])
+
+        # binary values are rejected so the JSON clients can read
+        # every password
+        data = msgpack.packb({'password': {'secret': b'\x00\xff',
+                                           'service': 'myservice'}},
+                             use_bin_type=True)
+        res = self.testapp.post('/passwords', data, headers=headers,
+                                status=400)
+        self.assertEqual(res.body,
+                         b'{"message": "Secret must be a string"}')
+        res = self.testapp.get('/passwords', headers=self.auth_header)
+        self.assertEqual(len(res.json['passwords']), 1)
+
+    def test_password_msgpack(self):
+        password_id = self.db.passwords.insert({
+            'service': 'testing',
+            'secret': 's3cr3t',
+            'owner': self.user_id,
+        })
+        headers = dict(self.auth_header, Accept='application/x-msgpack')
+        res = self.testapp.get('/passwords/%s' % str(password_id),
+                               headers=headers)
+        self.assertEqual(res.content_type, 'application/x-msgpack')
+        self.assertEqual(msgpack.unpackb(res.body, encoding='utf-8'), {
+            'password': {
+                'service': 'testing',
+                'secret': 's3cr3t',
+                'owner': str(self.user_id),
+                '_id': str(password_id),
+                'id': str(password_id),
+            },
+        })
+
+        headers['Content-Type'] = 'application/x-msgpack'
+        data = msgpack.packb({'password': {'secret': 'sup3rs3cr3t',
+                                           'service': 'testing2'}})
+        res = self.testapp.put('/passwords/%s' % str(password_id),
+                               data, headers=headers)
+        password = msgpack.unpackb(res.body, encoding='utf-8')['password']
+        self.assertEqual(password['service'], 'testing2')
+        self.assertEqual(password['id'], str(password_id))
+
+        # JSON is still the default
+        res = self.testapp.get('/passwords/%s' % str(password_id),
+                               headers=dict(self.auth_header, Accept='*/*'))
+        self.assertEqual(res.content_type, 'application/json')
+        self.assertEqual(res.json['password']['service'], 'testing2')
+
+    def test_idempotency_key(self):
+        headers = dict(self.auth_header)
+        headers['Idempotency-Key'] = 'key1'
+        data = '{"password": {"secret": "s3cr3t", "service": "myservice"}}'
+        count = self.db.passwords.count()
+
+        res = self.testapp.post('/passwords', data, headers=headers)
+        self.assertEqual(res.status, '200 OK')
+        self.assertFalse('Idempotent-Replayed' in res.headers)
+        self.assertEqual(self.db.passwords.count(), count + 1)
+        password_id = res.json['password']['id']
+
+        # the retry gets the same response without a new password
+        res2 = self.testapp.post('/passwords', data, headers=headers)
+        self.assertEqual(res2.status, '200 OK')
+        self.assertEqual(res2.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(res2.content_type, 'application/json')
+        self.assertEqual(res2.json, res.json)
+        self.assertEqual(self.db.passwords.count(), count + 1)
+
+        # the same key with a different request is an error
+        res = self.testapp.post('/passwords', data.replace('s3cr3t', 'x'),
+                                headers=headers, status=422)
+        self.assertEqual(res.body, (b'{"message": "This Idempotency-Key was '
+                                    b'used for a different request"}'))
+
+        # keys are scoped by user
+        key = self.db.idempotency_keys.find_one({'key': 'key1'})
+        self.assertEqual(key['user'], self.user_id)
+        self.assertEqual(key['status'], '200 OK')
+
+        # deleting twice returns the first response
+        headers['Idempotency-Key'] = 'key2'
+        url = '/passwords/%s' % password_id
+        res = self.testapp.delete(url, headers=headers)
+        self.assertEqual(res.status, '200 OK')
+        res = self.testapp.delete(url, headers=headers)
+        self.assertEqual(res.status, '200 OK')
+        self.assertEqual(res.json, {'password': {'id': password_id}})
+        self.assertEqual(self.db.passwords.count(), count)
+
+        # errors are remembered too
+        headers['Idempotency-Key'] = 'key3'
+        res = self.testapp.put(url, '', headers=headers, status=400)
+        res = self.testapp.put(url, '', headers=headers, status=400)
+        self.assertEqual(res.headers['Idempotent-Replayed'], 'true')
+
+    def test_idempotency_key_errors(self):
+        headers = dict(self.auth_header)
+        data = '{"password": {"secret": "s3cr3t", "service": "myservice"}}'
+
+        headers['Idempotency-Key'] = ''
+        res = self.testapp.post('/passwords', data, headers=headers,
+                                status=400)
+        self.assertEqual(res.body,
+                         b'{"message": "Invalid Idempotency-Key header"}')
+
+        headers['Idempotency-Key'] = 'a' * 256
+        self.testapp.post('/passwords', data, headers=headers, status=400)
+
+        # a request that has not finished yet
+        headers['Idempotency-Key'] = 'key1'
+        self.db.idempotency_keys.insert({
+            'user': self.user_id,
+            'key': 'key1',
+            'fingerprint': 'POST /passwords %s' % hashlib.sha1(
+                data.encode('utf-8')).hexdigest(),
+            'status': None,
+            'expires': datetime.datetime(2014, 2, 24, 8, 0, tzinfo=utc),
+        })
+        res = self.testapp.post('/passwords', data, headers=headers,
+                                status=409)
+        self.assertEqual(res.body, (b'{"message": "A request with this '
+                                    b'Idempotency-Key is still in progress"}'))
+
+    def test_password_etag(self):
+        password_id = self.db.passwords.insert({
+            'service': 'testing',
+            'secret': 's3cr3t',
+            'owner': self.user_id,
+        })
+        url = '/passwords/%s' % str(password_id)
+
+        # old passwords have no revision
+        res = self.testapp.get(url, headers=self.auth_header)
+        self.assertEqual(res.headers['ETag'], '"0"')
+
+        headers = dict(self.auth_header)
+        headers['If-None-Match'] = '"0"'
+        res = self.testapp.get(url, headers=headers, status=304)
+        self.assertEqual(res.headers['ETag'], '"0"')
+        self.assertEqual(res.body, b'')
+
+        data = '{"password": {"service": "testing2", "secret": "s3cr3t2"}}'
+        headers = dict(self.auth_header)
+        headers['If-Match'] = '"0"'
+        res = self.testapp.put(url, data, headers=headers)
+        self.assertEqual(res.headers['ETag'], '"1"')
+        self.assertEqual(res.json['password']['revision'], 1)
+
+        # the GET is no longer cached
+        headers['If-None-Match'] = '"0"'
+        res = self.testapp.get(url, headers=headers)
+        self.assertEqual(res.headers['ETag'], '"1"')
+
+        # a second device with the old version can not overwrite it
+        data = '{"password": {"service": "testing3", "secret": "s3cr3t3"}}'
+        headers = dict(self.auth_header)
+        headers['If-Match'] = '"0"'
+        res = self.testapp.put(url, data, headers=headers, status=412)
+        self.assertEqual(res.body, (b'{"message": "The password was '
+                                    b'modified by another request"}'))
+        res = self.testapp.delete(url, headers=headers, status=412)
+        password = self.db.passwords.find_one(password_id)
+        self.assertEqual(password['service'], 'testing2')
+        self.assertEqual(password['revision'], 1)
+
+        # updates without If-Match still work
+        res = self.testapp.put(url, data, headers=self.auth_header)
+        self.assertEqual(res.headers['ETag'], '"2"')
+
+        headers['If-Match'] = '"2"'
+        res = self.testapp.delete(url, headers=headers)
+        self.assertEqual(res.status, '200 OK')
+        self.assertEqual(self.db.passwords.find_one(password_id), None)
+
+        res = self.testapp.delete(url, headers=headers, status=404)
+        res = self.testapp.put(url, data, headers=headers, status=404)
+
+    def test_password_put_and_patch_quota(self):
+        res = self.testapp.post('/passwords',
+                                '{"secret": "s3cr3t", "service": "testing", '
+                                '"notes": "some notes"}',
+                                headers=self.auth_header)
+        url = '/passwords/%s' % res.json['password']['_id']
+        usage = PasswordsManager(self.db).get_usage({'_id': self.user_id})
+        quota = self.testapp.app.registry.settings['password_quota']
+        quota.hard_size = usage[1]
+
+        res = self.testapp.put(url, '{"secret": "s3cr3t", "service": "testing", '
+                               '"notes": "longer notes"}',
+                               headers=self.auth_header, status=507)
+        self.assertEqual(res.body,
+                         b'{"message": "Your password quota is exceeded"}')
+
+        res = self.testapp.patch(url, '{"account": "john"}',
+                                 headers=self.auth_header, status=507)
+        self.assertEqual(res.body,
+                         b'{"message": "Your password quota is exceeded"}')
+        self.assertEqual(self.db.passwords.find_one()['notes'], 'some notes')
+
+        res = self.testapp.patch(url, '{"notes": null}',
+                                 headers=self.auth_header)
+        self.assertEqual(res.status, '200 OK')
+
+        res = self.testapp.put(url, '{"secret": "s3cr3t", "service": "testing"}',
+                               headers=self.auth_header)
+        self.assertEqual(res.status, '200 OK')
+
+    def test_password_patch(self):
+        res = self.testapp.patch('/passwords/123456',
+                                 headers=self.auth_header, status=400)
+        self.assertEqual(res.body, b'{"message": "Invalid password id"}')
+
+        password_id = self.db.passwords.insert({
+            'service': 'testing',
+            'secret': 's3cr3t',
+            'account': 'john',
+            'notes': 'some notes',
+            'owner': self.user_id,
+        })
+        url = '/passwords/%s' % str(password_id)
+
+        res = self.testapp.patch(url, '', headers=self.auth_header,
+                                 status=400)
+        self.assertEqual(res.body,
+                         b'{"message": "No JSON object could be decoded"}')
+
+        res = self.testapp.patch(url, '{"password": {"secret": null}}',
+                                 headers=self.auth_header, status=400)
+        self.assertEqual(res.body,
+                         b'{"message": "Secret can not be removed"}')
+
+        res = self.testapp.patch(url, '{"password": {"owner": "1"}}',
+                                 headers=self.auth_header, status=400)
+        self.assertEqual(res.body,
+                         b'{"message": "There are no fields to update"}')
+
+        data = '{"password": {"tags": ["tag1"], "notes": null}}'
+        res = self.testapp.patch(url, data, headers=self.auth_header)
+        self.assertEqual(res.status, '200 OK')
+        self.assertEqual(res.headers['ETag'], '"1"')
+        self.assertEqual(res.json, {
+            'password': {
+                'service': 'testing',
+                'secret': 's3cr3t',
+                'account': 'john',
+                'tags': ['tag1'],
+                'owner': str(self.user_id),
+                'revision': 1,
+                '_id': str(password_id),
+                'id': str(password_id),
+            },
+        })
+        password = self.db.passwords.find_one(password_id)
+        self.assertEqual(password['tags'], ['tag1'])
+        self.assertFalse('notes' in password)
+
+        headers = dict(self.auth_header)
+        headers['If-Match'] = '"0"'
+        data = '{"password": {"account": "peter"}}'
+        res = self.testapp.patch(url, data, headers=headers, status=412)
+        headers['If-Match'] = '"1"'
+        res = self.testapp.patch(url, data, headers=headers)
+        self.assertEqual(res.json['password']['account'], 'peter')
+        self.assertEqual(res.headers['ETag'], '"2"')
+
+        res = self.testapp.patch('/passwords/000000000000000000000000',
+                                 data, headers=self.auth_header, status=404)
+        self.assertEqual(res.body, b'{"message": "Password not found"}')
+
+    def test_tag_collection(self):
+        res = self.testapp.options('/tags')
+        self.assertEqual(res.status, '200 OK')
+        self.assertEqual(res.headers['Access-Control-Allow-Methods'], 'GET')
+
+        res = self.testapp.get('/tags', status=401)
+
+        res = self.testapp.get('/tags', headers=self.auth_header)
+        self.assertEqual(res.body, b'{"tags": []}')
+
+        for tags in (['work', 'email'], ['work']):
+            data = json.dumps({'password': {'secret': 's3cr3t',
+                                            'service': 'myservice',
+                                            'tags': tags}})
+            self.testapp.post('/passwords', data, headers=self.auth_header)
+
+        res = self.testapp.get('/tags', headers=self.auth_header)
+        self.assertEqual(res.json, {'tags': [
+            {'tag': 'email', 'count': 1},
+            {'tag': 'work', 'count': 2},
+        ]})
@@ -20,18 +20,117 @@
 
 import json
 
+from msgpack.exceptions import UnpackException
 
-def validate_password(rawdata, encoding='utf-8', _id=None):
+from yithlibraryserver import msgpackrenderer
+from yithlibraryserver.compat import binary_type, string_types, text_type
+
+REQUIRED_FIELDS = ('secret', 'service')
+
+OPTIONAL_FIELDS = ('account', 'expiration', 'notes', 'tags',
+                   'last_modification', 'creation')
+
+TEXT_FIELDS = ('secret', 'service', 'account', 'notes')
+
+
+class FieldTooLarge(ValueError):
+
+    def __init__(self, field):
+        super(FieldTooLarge, self).__init__(field)
+        self.field = field
+
+    def get_message(self):
+        if self.field in REQUIRED_FIELDS + OPTIONAL_FIELDS:
+            return '%s is too large' % self.field.capitalize()
+        else:
+            return 'A field is too large'
+
+
+def get_value_size(value):
+    if isinstance(value, (string_types, bytes)):
+        return len(value)
+    elif isinstance(value, list):
+        return len(value) + sum([get_value_size(item) for item in value])
+    else:
+        # objects are checked on their own when they are decoded
+        return 0
+
+
+def field_size_checker(max_field_size):
+    """Return a hook for the decoders that checks every object.
+
+    The decoders call it as soon as each object is read, so the
+    parsing stops at the first field that is too large instead of
+    building the whole document first.
+    """
+    def check(obj):
+        for key, value in obj.items():
+            if (get_value_size(key) > max_field_size or
+                    get_value_size(value) > max_field_size):
+                raise FieldTooLarge(key)
+        return obj
+
+    return check
+
+
+def get_type_error(field, value):
+    """Return an error message if value can not be stored in field.
+
+    MessagePack can send binary values, which could not be rendered
+    as JSON afterwards.
+    """
+    if value is None:
+        return None
+
+    if field in TEXT_FIELDS:
+        if not isinstance(value, text_type):
+            return '%s must be a string' % field.capitalize()
+    elif field == 'tags':
+        if not (isinstance(value, list) and
+                all([isinstance(tag, text_type) for tag in value])):
+            return 'Tags must be a list of strings'
+    elif isinstance(value, binary_type):
+        return '%s can not be binary' % field.capitalize()
+
+    return None
+
+
+def load_password_data(rawdata, encoding, content_type,
+                       max_field_size=None):
     errors = []
 
+    if max_field_size:
+        object_hook = field_size_checker(max_field_size)
+    else:
+        object_hook = None
+
+    if content_type == msgpackrenderer.MSGPACK_CONTENT_TYPE:
+        loads = lambda data: msgpackrenderer.loads(data, object_hook)
+        decode_error = 'No MessagePack object could be decoded'
+    else:
+        loads = lambda data: json.loads(data.decode(encoding),
+                                        object_hook=object_hook)
+        decode_error = 'No JSON object could be decoded'
+
+    data = None
     try:
-        json_data = json.loads(rawdata.decode(encoding))
-        data = json_data['password']
-    except ValueError:
-        errors.append('No JSON object could be decoded')
+        data = loads(rawdata)['password']
+    except FieldTooLarge as e:
+        errors.append(e.get_message())
+    except (ValueError, UnpackException):
+        errors.append(decode_error)
     except KeyError:
         errors.append('There must be only one toplevel element called "password"')
 
+    return data, errors
+
+
+def validate_password(rawdata, encoding='utf-8', _id=None,
+                      content_type=msgpackrenderer.JSON_CONTENT_TYPE,
+                      max_field_size=None):
+    data, errors = load_password_data(rawdata, encoding, content_type,
+                                      max_field_size)
+
     # if we have errors here, we can't proceed
     if errors:
         return {}, errors
@@ -51,11 +150,77 @@ def validate_password(rawdata, encoding='utf-8', _id=None):
         errors.append('Service is required')
 
     # then optional attributes
-    password['account'] = data.get('account')
-    password['expiration'] = data.get('expiration')
-    password['notes'] = data.get('notes')
-    password['tags'] = data.get('tags')
-    password['last_modification'] = data.get('last_modification')
-    password['creation'] = data.get('creation')
+    for field in OPTIONAL_FIELDS:
+        password[field] = data.get(field)
+
+    for field in REQUIRED_FIELDS + OPTIONAL_FIELDS:
+        error = get_type_error(field, password.get(field))
+        if error is not None:
+            errors.append(error)
 
     return password, errors
+
+
+def validate_password_changes(rawdata, encoding='utf-8',
+                              content_type=msgpackrenderer.JSON_CONTENT_TYPE,
+                              max_field_size=None):
+    """Validate a partial password update.
+
+    Return the fields to set, the fields to remove and a list of
+    errors. A null value removes the field, which is not allowed for
+    the required ones. Like in validate_password, attributes that are
+    not password fields are ignored.
+    """
+    data, errors = load_password_data(rawdata, encoding, content_type,
+                                      max_field_size)
+    if errors:
+        return {}, [], errors
+
+    changes = {}
+    removals = []
+    for field in REQUIRED_FIELDS + OPTIONAL_FIELDS:
+        if field not in data:
+            continue
+
+        value = data[field]
+        error = get_type_error(field, value)
+        if error is not None:
+            errors.append(error)
+        elif value is not None:
+            changes[field] = value
+        elif field in REQUIRED_FIELDS:
+            errors.append('%s can not be removed' % field.capitalize())
+        else:
+            removals.append(field)
+
+    if not (changes or removals or errors):
+        errors.append('There are no fields to update')
+
+    return changes, removals, errors
+
+
+def validate_filters(params):
+    """Read the search filters from the query string.
+
+    Return the arguments for PasswordsManager.search and a list of
+    errors.
+    """
+    filters = {}
+    errors = []
+
+    tags = params.getall('tag')
+    if tags:
+        filters['tags'] = tags
+
+    for name in ('service', 'account'):
+        if name in params:
+            filters[name] = params[name]
+
+    for name in ('expires_after', 'expires_before'):
+        if name in params:
+            try:
+                filters[name] = int(params[name])
+            except ValueError:
+                errors.append('%s must be an integer' % name)
+
+    return filters, errors
@@ -22,68 +22,125 @@ import json
 
 import bson
 
-from pyramid.httpexceptions import HTTPBadRequest
+from pyramid.httpexceptions import HTTPBadRequest, HTTPNotModified
 from pyramid.view import view_config, view_defaults
 
 from yithlibraryserver.errors import password_not_found, invalid_password_id
+from yithlibraryserver.errors import password_modified, quota_exceeded
+from yithlibraryserver.jsonrenderer import Document, Documents
 from yithlibraryserver.oauth2.decorators import protected_method
-from yithlibraryserver.password.models import PasswordsManager
+from yithlibraryserver.password.idempotency import idempotent
+from yithlibraryserver.password.models import PasswordsManager, get_revision
+from yithlibraryserver.password.quota import SOFT_QUOTA, QuotaExceeded
+from yithlibraryserver.password.validation import validate_filters
 from yithlibraryserver.password.validation import validate_password
+from yithlibraryserver.password.validation import validate_password_changes
 
 
-@view_defaults(route_name='password_collection_view', renderer='json')
+SOFT_QUOTA_WARNING = 'You are close to the limit of your password quota'
+
+
+def get_max_field_size(request):
+    return request.registry.settings['body_limits'].max_field_size
+
+
+def get_etag(password):
+    return str(get_revision(password))
+
+
+@view_defaults(route_name='password_collection_view', renderer='api')
 class PasswordCollectionRESTView(object):
 
     def __init__(self, request):
         self.request = request
-        self.passwords_manager = PasswordsManager(request.db)
+        self.passwords_manager = PasswordsManager(
+            request.db, quota=request.registry.settings['password_quota'])
 
     @view_config(request_method='OPTIONS', renderer='string')
     def options(self):
         headers = self.request.response.headers
         headers['Access-Control-Allow-Methods'] = 'GET, POST'
         headers['Access-Control-Allow-Headers'] = ('Origin, Content-Type, '
-                                                   'Accept, Authorization')
+                                                   'Accept, Authorization, '
+                                                   'Idempotency-Key')
         return ''
 
     @view_config(request_method='GET')
     @protected_method(['read-passwords'])
     def get(self):
-        passwords = list(self.passwords_manager.retrieve(self.request.user))
-        for p in passwords:
-            p['id'] = p['_id']
-        return {"passwords": passwords}
+        filters, errors = validate_filters(self.request.GET)
+        if errors:
+            result = {'message': ','.join(errors)}
+            return HTTPBadRequest(body=json.dumps(result),
+                                  content_type='application/json')
+
+        passwords = self.passwords_manager.search(self.request.user,
+                                                  **filters)
+        return {"passwords": Documents(passwords)}
 
     @view_config(request_method='POST')
     @protected_method(['write-passwords'])
+    @idempotent
     def post(self):
-        password, errors = validate_password(self.request.body,
-                                             self.request.charset)
+        password, errors = validate_password(
+            self.request.body, self.request.charset,
+            content_type=self.request.content_type,
+            max_field_size=get_max_field_size(self.request))
 
         if errors:
             result = {'message': ','.join(errors)}
             return HTTPBadRequest(body=json.dumps(result),
                                   content_type='application/json')
 
-        result = self.passwords_manager.create(self.request.user, password)
-        result['id'] = result['_id']
-        return {'password': result}
+        try:
+            result = self.passwords_manager.create(self.request.user,
+                                                   password)
+        except QuotaExceeded:
+            return quota_exceeded()
 
+        level = self.passwords_manager.get_quota_level(self.request.user)
+        if level == SOFT_QUOTA:
+            self.request.response.headers['Warning'] = (
+                '199 - "%s"' % SOFT_QUOTA_WARNING)
 
-@view_defaults(route_name='password_view', renderer='json')
+        return {'password': Document(result)}
+
+
+@view_defaults(route_name='password_view', renderer='api')
 class PasswordRESTView(object):
 
     def __init__(self, request):
         self.request = request
-        self.passwords_manager = PasswordsManager(request.db)
+        self.passwords_manager = PasswordsManager(
+            request.db, quota=request.registry.settings['password_quota'])
         self.password_id = self.request.matchdict['password']
 
+    def check_if_match(self, _id):
+        """Return the revision the If-Match header asks for.
+
+        The second element of the result is an error response if the
+        password does not exist or its revision is a different one.
+        """
+        if 'If-Match' not in self.request.headers:
+            return None, None
+
+        password = self.passwords_manager.retrieve(self.request.user, _id)
+        if password is None:
+            return None, password_not_found()
+
+        if get_etag(password) not in self.request.if_match:
+            return None, password_modified()
+
+        return get_revision(password), None
+
     @view_config(request_method='OPTIONS', renderer='string')
     def options(self):
         headers = self.request.response.headers
-        headers['Access-Control-Allow-Methods'] = 'GET, PUT, DELETE'
+        headers['Access-Control-Allow-Methods'] = 'GET, PUT, PATCH, DELETE'
         headers['Access-Control-Allow-Headers'] = ('Origin, Content-Type, '
-                                                   'Accept, Authorization')
+                                                   'Accept, Authorization, '
+                                                   'Idempotency-Key, '
+                                                   'If-Match, If-None-Match')
         return ''
 
     @view_config(request_method='GET')
@@ -98,44 +155,129 @@ class PasswordRESTView(object):
 
         if password is None:
             return password_not_found()
-        else:
-            password['id'] = password['_id']
-            return {'password': password}
+
+        etag = get_etag(password)
+        if etag in self.request.if_none_match:
+            return HTTPNotModified(headers={'ETag': '"%s"' % etag})
+
+        self.request.response.etag = etag
+        return {'password': Document(password)}
 
     @view_config(request_method='PUT')
     @protected_method(['write-passwords'])
+    @idempotent
     def put(self):
         try:
             _id = bson.ObjectId(self.password_id)
         except bson.errors.InvalidId:
             return invalid_password_id()
 
-        password, errors = validate_password(self.request.body,
-                                             self.request.charset,
-                                             _id)
+        password, errors = validate_password(
+            self.request.body, self.request.charset, _id,
+            self.request.content_type,
+            max_field_size=get_max_field_size(self.request))
 
         if errors:
             result = {'message': ','.join(errors)}
             return HTTPBadRequest(body=json.dumps(result),
                                   content_type='application/json')
 
-        result = self.passwords_manager.update(self.request.user, _id,
-                                               password)
+        revision, error = self.check_if_match(_id)
+        if error is not None:
+            return error
+
+        try:
+            result = self.passwords_manager.update(self.request.user, _id,
+                                                   password, revision)
+        except QuotaExceeded:
+            return quota_exceeded()
+
         if result is None:
-            return password_not_found()
-        else:
-            result['id'] = result['_id']
-            return {'password': result}
+            if revision is None:
+                return password_not_found()
+            else:
+                return password_modified()
+
+        self.request.response.etag = get_etag(result)
+        return {'password': Document(result)}
+
+    @view_config(request_method='PATCH')
+    @protected_method(['write-passwords'])
+    @idempotent
+    def patch(self):
+        try:
+            _id = bson.ObjectId(self.password_id)
+        except bson.errors.InvalidId:
+            return invalid_password_id()
+
+        changes, removals, errors = validate_password_changes(
+            self.request.body, self.request.charset,
+            self.request.content_type,
+            max_field_size=get_max_field_size(self.request))
+
+        if errors:
+            result = {'message': ','.join(errors)}
+            return HTTPBadRequest(body=json.dumps(result),
+                                  content_type='application/json')
+
+        revision, error = self.check_if_match(_id)
+        if error is not None:
+            return error
+
+        try:
+            result = self.passwords_manager.patch(self.request.user, _id,
+                                                  changes, removals,
+                                                  revision)
+        except QuotaExceeded:
+            return quota_exceeded()
+
+        if result is None:
+            if revision is None:
+                return password_not_found()
+            else:
+                return password_modified()
+
+        self.request.response.etag = get_etag(result)
+        return {'password': Document(result)}
 
     @view_config(request_method='DELETE')
     @protected_method(['write-passwords'])
+    @idempotent
     def delete(self):
         try:
             _id = bson.ObjectId(self.password_id)
         except bson.errors.InvalidId:
             return invalid_password_id()
 
-        if self.passwords_manager.delete(self.request.user, _id):
+        revision, error = self.check_if_match(_id)
+        if error is not None:
+            return error
+
+        if self.passwords_manager.delete(self.request.user, _id, revision):
             return {'password': {'id': _id}}
-        else:
+        elif revision is None:
             return password_not_found()
+        else:
+            return password_modified()
+
+
+@view_defaults(route_name='tag_collection_view', renderer='api')
+class TagCollectionRESTView(object):
+
+    def __init__(self, request):
+        self.request = request
+        self.passwords_manager = PasswordsManager(request.db)
+
+    @view_config(request_method='OPTIONS', renderer='string')
+    def options(self):
+        headers = self.request.response.headers
+        headers['Access-Control-Allow-Methods'] = 'GET'
+        headers['Access-Control-Allow-Headers'] = ('Origin, Content-Type, '
+                                                   'Accept, Authorization')
+        return ''
+
+    @view_config(request_method='GET')
+    @protected_method(['read-passwords'])
+    def get(self):
+        return {'tags': list(self.passwords_manager.get_tags(
+            self.request.user))}
@@ -18,11 +18,10 @@
 
 import hashlib
 
-import requests
-
 from pyramid.httpexceptions import HTTPBadRequest, HTTPForbidden
 from pyramid.httpexceptions import HTTPMethodNotAllowed, HTTPServerError
 
+from yithlibraryserver.httpclient import get_http_client
 from yithlibraryserver.user.utils import register_or_update
 from yithlibraryserver.persona.audience import get_audience
 
@@ -41,8 +40,8 @@ def persona_login(request):
     settings = request.registry.settings
     data = {'assertion': assertion,
             'audience': get_audience(settings['public_url_root'])}
-    response = requests.post(settings['persona_verifier_url'],
-                             data=data, verify=True)
+    response = get_http_client(settings).post(
+        'persona', settings['persona_verifier_url'], data=data, verify=True)
 
     if response.ok:
         verification_data = response.json()
@@ -20,40 +20,44 @@ import optparse
 import textwrap
 import sys
 
-import transaction
-
 from pyramid.paster import bootstrap
 
 from pyramid_mailer import get_mailer
 
 from yithlibraryserver.compat import urlparse
-from yithlibraryserver.email import create_message
-from yithlibraryserver.scripts.reports import get_passwords_map
+from yithlibraryserver.email import MessageRenderer, create_message
+from yithlibraryserver.scripts.bulkmail import BulkMailer, Checkpoint
+from yithlibraryserver.scripts.bulkmail import get_session_factory
 from yithlibraryserver.scripts.utils import safe_print
 from yithlibraryserver.scripts.utils import get_user_display_name
 
 
-def get_all_users_with_passwords_and_email(db):
-    all_passwords = list(db.passwords.find())
-    passwords_map = get_passwords_map(all_passwords)
-    for user in db.users.find({
-        'email_verified': True,
-    }):
+def get_all_users_with_passwords_and_email(db, after=None):
+    """Yield the verified users with an email and passwords sorted by _id.
+
+    If after is not None only the users with a greater _id are returned.
+    """
+    owners = set(db.passwords.distinct('owner'))
+    query = {'email_verified': True}
+    if after is not None:
+        query['_id'] = {'$gt': after}
+
+    for user in db.users.find(query).sort('_id'):
         if not user['email']:
             continue
 
-        if not user['_id'] in passwords_map:
+        if not user['_id'] in owners:
             continue
 
         yield user
 
 
-def send_email(request, email_template, user, preferences_link):
+def send_email(request, template, user, preferences_link):
     safe_print('Sending email to %s' % get_user_display_name(user))
     context = {'user': user, 'preferences_link': preferences_link}
     return create_message(
         request,
-        'yithlibraryserver.scripts:templates/%s' % email_template,
+        template,
         context,
         "Yith Library announcement",
         [user['email']],
@@ -61,12 +65,20 @@ def send_email(request, email_template, user, preferences_link):
 
 
 def announce():
-    usage = "migrate: %prog config_uri migration_name"
-    description = "Add a 'send_email_periodically' preference to every user."
+    usage = "announce: %prog config_uri email_template"
+    description = "Send an announcement email to every active user."
     parser = optparse.OptionParser(
         usage=usage,
         description=textwrap.dedent(description)
     )
+    parser.add_option('--concurrency', type='int', default=1,
+                      help='number of SMTP connections used in parallel')
+    parser.add_option('--rate', type='float', default=None,
+                      help='maximum number of emails sent per second')
+    parser.add_option('--batch-size', type='int', default=100,
+                      help='number of emails sent between checkpoints')
+    parser.add_option('--restart', action='store_true', default=False,
+                      help='start again instead of resuming a previous run')
     options, args = parser.parse_args(sys.argv[1:])
     if len(args) != 2:
         safe_print('You must provide two arguments. '
@@ -88,16 +100,38 @@ def announce():
             public_url_root,
             request.route_path('user_preferences'))
 
-        tx = transaction.begin()
-
-        mailer = get_mailer(request)
-
-        for user in get_all_users_with_passwords_and_email(db):
-            message = send_email(request, email_template, user,
-                                 preferences_link)
-            mailer.send(message)
-
-        tx.commit()
+        checkpoint = Checkpoint(db, 'announce-%s' % email_template)
+        if options.restart:
+            checkpoint.restart()
+        elif checkpoint.finished:
+            safe_print('The announcement "%s" was already sent. Use '
+                       '--restart to send it again.' % email_template)
+            return 3
+
+        # the same template is rendered for every user
+        template = MessageRenderer(
+            'yithlibraryserver.scripts:templates/%s' % email_template)
+
+        mailer = BulkMailer(
+            get_session_factory(get_mailer(request)),
+            concurrency=options.concurrency,
+            rate=options.rate,
+            batch_size=options.batch_size,
+        )
+
+        errors = mailer.send_all(
+            lambda after: get_all_users_with_passwords_and_email(db, after),
+            lambda user: send_email(request, template, user,
+                                    preferences_link),
+            checkpoint,
+        )
+        for user, error in errors:
+            safe_print('Error sending email to %s: %s' % (
+                get_user_display_name(user), error))
+        if errors:
+            safe_print('The announcement was stopped. Run the same '
+                       'command again to resume it.')
+            return 1
 
     finally:
         closer()
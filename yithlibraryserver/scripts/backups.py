@@ -20,8 +20,9 @@ import datetime
 
 import transaction
 
-from yithlibraryserver.backups.email import send_passwords
+from yithlibraryserver.backups.email import TEMPLATE, send_passwords
 from yithlibraryserver.compat import urlparse
+from yithlibraryserver.email import MessageRenderer
 from yithlibraryserver.scripts.utils import safe_print, setup_simple_command
 from yithlibraryserver.scripts.utils import get_user_display_name
 
@@ -75,10 +76,13 @@ def send_backups_via_email():
             public_url_root,
             request.route_path('backups_index'))
 
+        template = MessageRenderer(TEMPLATE)
+
         for user in user_iterator:
             if user['email']:
                 sent = send_passwords(request, user,
-                                      preferences_link, backups_link)
+                                      preferences_link, backups_link,
+                                      template)
                 if sent:
                     safe_print('Passwords sent to %s' %
                                get_user_display_name(user))
@@ -0,0 +1,296 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import smtplib
+import threading
+import time
+
+from pyramid_mailer.mailer import Mailer
+
+from yithlibraryserver.compat import queue
+
+
+class SMTPSession(object):
+    """SMTP connection that is kept open between messages.
+
+    pyramid_mailer opens a new connection for every message, which
+    means a TCP (and maybe TLS) handshake and a login each time.
+    The connection is created by the smtp_mailer of a configured
+    pyramid_mailer Mailer, so the ssl, keyfile and certfile options
+    are honored.
+    """
+
+    def __init__(self, smtp_mailer, default_sender=None):
+        self.smtp_mailer = smtp_mailer
+        self.default_sender = default_sender
+        self.connection = None
+
+    @classmethod
+    def from_mailer(cls, mailer):
+        return cls(mailer.smtp_mailer, mailer.default_sender)
+
+    def connect(self):
+        # the same handshake repoze.sendmail does for every message
+        smtp_mailer = self.smtp_mailer
+        connection = smtp_mailer.smtp_factory()
+        code, response = connection.ehlo()
+        if code < 200 or code >= 300:
+            code, response = connection.helo()
+            if code < 200 or code >= 300:
+                raise smtplib.SMTPHeloError(code, response)
+
+        have_tls = connection.has_extn('starttls')
+        if not have_tls and smtp_mailer.force_tls:
+            raise smtplib.SMTPException(
+                'TLS is not available but TLS is required')
+        if have_tls and not smtp_mailer.no_tls:
+            connection.starttls()
+            connection.ehlo()
+
+        if smtp_mailer.username is not None and \
+           smtp_mailer.password is not None:
+            connection.login(smtp_mailer.username, smtp_mailer.password)
+        self.connection = connection
+
+    def send(self, message):
+        if not message.sender:
+            message.sender = self.default_sender
+        email = message.to_message()
+
+        if self.connection is None:
+            self.connect()
+
+        try:
+            self.connection.sendmail(message.sender, message.send_to,
+                                     email.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # the server closed an idle connection. Try again once
+            self.connect()
+            self.connection.sendmail(message.sender, message.send_to,
+                                     email.as_string())
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.quit()
+            except (smtplib.SMTPException, IOError):
+                pass
+            self.connection = None
+
+
+class MailerSession(object):
+    """Adapts a mailer that does not talk SMTP (like the testing one)
+    to the SMTPSession interface.
+    """
+
+    def __init__(self, mailer):
+        self.mailer = mailer
+
+    def send(self, message):
+        self.mailer.send_immediately(message)
+
+    def close(self):
+        pass
+
+
+def get_session_factory(mailer):
+    if isinstance(mailer, Mailer):
+        return lambda: SMTPSession.from_mailer(mailer)
+    else:
+        return lambda: MailerSession(mailer)
+
+
+class RateLimiter(object):
+    """Spread calls to wait() so there are at most rate per second"""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_call = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.time()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Checkpoint(object):
+    """Progress of a bulk mail job stored in the bulkmail_jobs collection.
+
+    Recipients are processed in _id order so the job can be resumed
+    after the last recipient of the last completed batch. When a batch
+    has failures the checkpoint stays before the first failed
+    recipient and the ones of that batch that were sent anyway are
+    remembered in skip, so they do not get the message twice.
+    """
+
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.job = db.bulkmail_jobs.find_one({'_id': name}) or {
+            '_id': name,
+            'last_id': None,
+            'skip': [],
+            'sent': 0,
+            'finished': False,
+        }
+
+    @property
+    def last_id(self):
+        return self.job['last_id']
+
+    @property
+    def finished(self):
+        return self.job['finished']
+
+    @property
+    def skip(self):
+        return self.job.get('skip', [])
+
+    def restart(self):
+        self.job.update({
+            'last_id': None,
+            'skip': [],
+            'sent': 0,
+            'finished': False,
+        })
+        self.db.bulkmail_jobs.save(self.job)
+
+    def advance(self, last_id, sent, skip=()):
+        self.job['last_id'] = last_id
+        self.job['skip'] = list(skip)
+        self.job['sent'] += sent
+        self.db.bulkmail_jobs.save(self.job)
+
+    def finish(self):
+        self.job['finished'] = True
+        self.db.bulkmail_jobs.save(self.job)
+
+
+class BulkMailer(object):
+    """Send many messages using several persistent SMTP sessions.
+
+    The messages are built in the calling thread, since rendering the
+    templates needs the request stored in the thread locals, and they
+    are delivered by concurrency threads.
+    """
+
+    def __init__(self, session_factory, concurrency=1, rate=None,
+                 batch_size=100):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate)
+        self.batch_size = batch_size
+
+    def _deliver(self, messages, errors):
+        session = self.session_factory()
+        try:
+            while True:
+                try:
+                    recipient, message = messages.get_nowait()
+                except queue.Empty:
+                    return
+
+                self.rate_limiter.wait()
+                try:
+                    session.send(message)
+                except Exception as e:
+                    # keep going with the rest of the queue
+                    errors.append((recipient, e))
+                    session.close()
+        finally:
+            session.close()
+
+    def send_batch(self, batch):
+        """Send a list of (recipient, message) tuples.
+
+        Return the list of (recipient, error) tuples of the failed ones.
+        """
+        messages = queue.Queue()
+        for item in batch:
+            messages.put(item)
+
+        errors = []
+        threads = [
+            threading.Thread(target=self._deliver, args=(messages, errors))
+            for i in range(min(self.concurrency, len(batch)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return errors
+
+    def send_all(self, recipients, build_message, checkpoint):
+        """Send one message to every recipient after the checkpoint.
+
+        recipients is a callable that receives the last processed _id
+        (or None) and returns the recipients sorted by _id.
+        build_message receives a recipient and returns its message.
+
+        The job stops after the first batch with failures, so it can
+        be resumed from the first failed recipient once the problem is
+        fixed. Return the list of (recipient, error) tuples of the
+        failed ones.
+        """
+        skip = set(checkpoint.skip)
+        batch = []
+        for recipient in recipients(checkpoint.last_id):
+            if recipient['_id'] in skip:
+                continue
+            batch.append((recipient, build_message(recipient)))
+            if len(batch) == self.batch_size:
+                errors = self._send_and_advance(batch, checkpoint)
+                if errors:
+                    return errors
+                batch = []
+
+        if batch:
+            errors = self._send_and_advance(batch, checkpoint)
+            if errors:
+                return errors
+
+        checkpoint.finish()
+        return []
+
+    def _send_and_advance(self, batch, checkpoint):
+        errors = self.send_batch(batch)
+        ids = [recipient['_id'] for recipient, message in batch]
+        failed = set([recipient['_id'] for recipient, error in errors])
+
+        # do not go past the first failed recipient
+        if failed:
+            first = min([ids.index(_id) for _id in failed])
+        else:
+            first = len(ids)
+        last_id = ids[first - 1] if first > 0 else checkpoint.last_id
+
+        # the recipients after it that got their message anyway
+        skip = [_id for _id in checkpoint.skip + ids[first:]
+                if _id not in failed and (last_id is None or _id > last_id)]
+
+        checkpoint.advance(last_id, len(batch) - len(errors), skip)
+        return errors
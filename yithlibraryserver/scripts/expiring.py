@@ -0,0 +1,164 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import datetime
+import optparse
+
+import transaction
+
+from yithlibraryserver.email import MessageRenderer, send_email
+from yithlibraryserver.password.models import EXPIRATION_INDEX
+from yithlibraryserver.scripts.utils import safe_print, setup_simple_command
+from yithlibraryserver.scripts.utils import get_user_display_name
+
+TEMPLATE = 'yithlibraryserver.password:templates/email_expiring_passwords'
+
+EPOCH = datetime.date(1970, 1, 1)
+
+USERS_BATCH_SIZE = 100
+
+
+def date_to_days(date):
+    """Return the date as the number of days since the epoch.
+
+    This is how the clients store the expiration of the passwords.
+    """
+    return (date - EPOCH).days
+
+
+def days_to_date(days):
+    return EPOCH + datetime.timedelta(days=days)
+
+
+def get_expiring_passwords(db, today, days):
+    """Return the passwords that expire between today and today + days.
+
+    Only the fields needed for the email are read. The query is a
+    range on the (expiration, owner) index so it only visits the
+    expiring passwords, in the order of the index.
+    """
+    first = date_to_days(today)
+    return db.passwords.find({
+        'expiration': {'$gte': first, '$lte': first + days},
+    }, fields={
+        'owner': True,
+        'service': True,
+        'account': True,
+        'expiration': True,
+    }).sort(EXPIRATION_INDEX).hint(EXPIRATION_INDEX)
+
+
+def group_by_owner(passwords):
+    """Return the owners in the order they were seen and their passwords.
+
+    A single pass over the cursor is done and only the expiring
+    passwords, with the few fields the email needs, are kept in memory.
+    """
+    owners = []
+    groups = {}
+    for password in passwords:
+        owner = password['owner']
+        if owner not in groups:
+            owners.append(owner)
+            groups[owner] = []
+        groups[owner].append(password)
+    return owners, groups
+
+
+def get_users(db, owners, batch_size=USERS_BATCH_SIZE):
+    """Yield the users that can receive emails with one query per batch"""
+    for i in range(0, len(owners), batch_size):
+        for user in db.users.find({
+                '_id': {'$in': owners[i:i + batch_size]},
+                'email_verified': True,
+        }):
+            if user.get('email'):
+                yield user
+
+
+def get_description(password):
+    if password.get('account'):
+        return '%s (%s)' % (password.get('service', ''), password['account'])
+    return password.get('service', '')
+
+
+def send_digest(request, template, user, passwords, days):
+    passwords = sorted([{
+        'description': get_description(password),
+        'expiration': days_to_date(password['expiration']).isoformat(),
+    } for password in passwords], key=lambda p: p['expiration'])
+
+    context = {
+        'user': user,
+        'days': days,
+        'passwords': passwords,
+        'passwords_text': '\n'.join([
+            '- %(description)s: %(expiration)s' % password
+            for password in passwords
+        ]),
+    }
+    send_email(
+        request,
+        template,
+        context,
+        'Some of your passwords are about to expire',
+        [user['email']],
+    )
+
+
+def expiring_passwords():
+    result = setup_simple_command(
+        "expiring_passwords",
+        "Send an email to the users whose passwords are about to expire.",
+        [optparse.make_option('--days', type='int', default=7,
+                              help='number of days to look ahead')],
+    )
+    if isinstance(result, int):
+        return result
+    else:
+        settings, closer, env, args = result
+
+    try:
+        request = env['request']
+        days = env['options'].days
+        today = datetime.datetime.utcnow().date()
+
+        passwords = get_expiring_passwords(request.db, today, days)
+        owners, groups = group_by_owner(passwords)
+
+        template = MessageRenderer(TEMPLATE)
+
+        # the emails of every batch of users are sent together so a
+        # failure does not lose the ones that were already sent
+        for i in range(0, len(owners), USERS_BATCH_SIZE):
+            tx = transaction.begin()
+            for user in get_users(request.db,
+                                  owners[i:i + USERS_BATCH_SIZE]):
+                send_digest(request, template, user,
+                            groups.pop(user['_id']), days)
+                safe_print('Expiring passwords sent to %s' %
+                           get_user_display_name(user))
+            tx.commit()
+
+    finally:
+        closer()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    expiring_passwords()
@@ -0,0 +1,235 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import optparse
+
+from yithlibraryserver.pagecache import invalidate_pages
+from yithlibraryserver.scripts.utils import safe_print, setup_simple_command
+from yithlibraryserver.scripts.utils import get_user_display_name
+from yithlibraryserver.stats import increment_stats
+from yithlibraryserver.user.cleanup import DEFAULT_BATCH_SIZE
+from yithlibraryserver.user.cleanup import remove_in_batches
+
+DEFAULT_SAMPLES = 5
+
+# description, collection, field, referenced collection and field.
+# The applications go before the documents that reference them so
+# a repair removes everything in one run
+REFERENCE_CHECKS = (
+    ('Passwords of missing users',
+     'passwords', 'owner', 'users', '_id'),
+    ('Tags of missing users',
+     'tags', 'owner', 'users', '_id'),
+    ('Idempotency keys of missing users',
+     'idempotency_keys', 'user', 'users', '_id'),
+    ('Applications of missing users',
+     'applications', 'owner', 'users', '_id'),
+    ('Authorized apps of missing users',
+     'authorized_apps', 'user', 'users', '_id'),
+    ('Authorized apps of missing applications',
+     'authorized_apps', 'client_id', 'applications', 'client_id'),
+    ('Authorization codes of missing users',
+     'authorization_codes', 'user', 'users', '_id'),
+    ('Authorization codes of missing applications',
+     'authorization_codes', 'client_id', 'applications', 'client_id'),
+    ('Access codes of missing users',
+     'access_codes', 'user_id', 'users', '_id'),
+    ('Access codes of missing applications',
+     'access_codes', 'client_id', 'applications', 'client_id'),
+)
+
+# the code can not be used if there is no email to verify
+DANGLING_CODE_QUERY = {
+    'email_verification_code': {'$exists': True},
+    '$or': [
+        {'email_verified': True},
+        {'email': {'$in': ['', None]}},
+    ],
+}
+
+
+def group_values(cursor, field):
+    """Yield every value of field and how many documents have it.
+
+    The cursor must be sorted by field so the documents with the
+    same value come together and nothing else is kept in memory.
+    """
+    current = None
+    count = 0
+    for document in cursor:
+        value = document.get(field)
+        if count > 0 and value == current:
+            count += 1
+        else:
+            if count > 0:
+                yield current, count
+            current, count = value, 1
+    if count > 0:
+        yield current, count
+
+
+def filter_missing(target, target_field, batch):
+    """Return the (value, count) pairs of batch whose value is not
+    in the target_field of any document of target.
+    """
+    values = [value for value, count in batch if value is not None]
+    existing = set([document[target_field] for document in target.find(
+        {target_field: {'$in': values}}, fields=[target_field])])
+    return [(value, count) for value, count in batch
+            if value is None or value not in existing]
+
+
+def find_missing_references(db, collection, field, target, target_field,
+                            batch_size=DEFAULT_BATCH_SIZE):
+    """Yield the values of field that no document of target has.
+
+    The collection is read once in the order of its index on field
+    and the target is queried once for every batch_size distinct
+    values. Every value is yielded with the number of documents
+    that have it.
+    """
+    cursor = db[collection].find(
+        {}, fields={field: True, '_id': False}).sort(field, 1)
+    batch = []
+    for value, count in group_values(cursor, field):
+        batch.append((value, count))
+        if len(batch) >= batch_size:
+            for missing in filter_missing(db[target], target_field, batch):
+                yield missing
+            batch = []
+    if batch:
+        for missing in filter_missing(db[target], target_field, batch):
+            yield missing
+
+
+def check_references(db, description, collection, field, target,
+                     target_field, repair, samples, batch_size):
+    n_values = 0
+    n_documents = 0
+    removed = 0
+    found = []
+    for value, count in find_missing_references(db, collection, field,
+                                                target, target_field,
+                                                batch_size):
+        n_values += 1
+        n_documents += count
+        if len(found) < samples:
+            found.append((value, count))
+        if repair:
+            removed += remove_in_batches(db[collection], {field: value},
+                                         batch_size)
+
+    if n_documents == 0:
+        safe_print('%s: OK' % description)
+        return 0
+
+    safe_print('%s: %d documents with %d missing references' %
+               (description, n_documents, n_values))
+    for value, count in found:
+        safe_print('\t%s (%d documents)' % (value, count))
+    if repair:
+        if collection == 'passwords':
+            # they were counted when they were created
+            increment_stats(db, {'passwords': -removed})
+        elif collection == 'applications':
+            invalidate_pages(db, 'oauth2_clients')
+        safe_print('\tRemoved %d documents' % removed)
+    return n_documents
+
+
+def check_verification_codes(db, repair, samples, batch_size):
+    description = 'Users with a dangling email verification code'
+    cursor = db.users.find(DANGLING_CODE_QUERY,
+                           fields=['first_name', 'last_name', 'email'])
+    found = 0
+    sample = []
+    batch = []
+    for user in cursor:
+        found += 1
+        if len(sample) < samples:
+            sample.append(user)
+        if repair:
+            batch.append(user['_id'])
+            if len(batch) >= batch_size:
+                unset_verification_codes(db, batch)
+                batch = []
+    if batch:
+        unset_verification_codes(db, batch)
+
+    if found == 0:
+        safe_print('%s: OK' % description)
+    else:
+        safe_print('%s: %d users' % (description, found))
+        for user in sample:
+            safe_print('\t%s (%s)' % (get_user_display_name(user),
+                                      user['_id']))
+        if repair:
+            safe_print('\tRemoved %d codes' % found)
+    return found
+
+
+def unset_verification_codes(db, user_ids):
+    db.users.update({'_id': {'$in': user_ids}}, {
+        '$unset': {'email_verification_code': ''},
+    }, multi=True)
+
+
+def fsck():
+    result = setup_simple_command(
+        "fsck",
+        "Check the references between the documents of the database "
+        "and optionally repair the broken ones.",
+        options=[
+            optparse.make_option(
+                '--repair', action='store_true', default=False,
+                help='remove the documents with broken references',
+            ),
+            optparse.make_option(
+                '--samples', type='int', default=DEFAULT_SAMPLES,
+                help='number of broken references shown for every check',
+            ),
+            optparse.make_option(
+                '--batch-size', type='int', default=DEFAULT_BATCH_SIZE,
+                help='number of documents checked or changed in every '
+                'operation',
+            ),
+        ],
+    )
+    if isinstance(result, int):
+        return result
+    else:
+        settings, closer, env, args = result
+
+    try:
+        options = env['options']
+        db = settings['mongodb'].get_database()
+
+        for check in REFERENCE_CHECKS:
+            check_references(db, *check, repair=options.repair,
+                             samples=options.samples,
+                             batch_size=options.batch_size)
+
+        check_verification_codes(db, options.repair, options.samples,
+                                 options.batch_size)
+
+    finally:
+        closer()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    fsck()
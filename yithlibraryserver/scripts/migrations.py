@@ -23,6 +23,9 @@ import sys
 from pyramid.paster import bootstrap
 
 from yithlibraryserver.oauth2.authorization import Authorizator
+from yithlibraryserver.password.codec import PasswordCodec
+from yithlibraryserver.password.models import PasswordsManager
+from yithlibraryserver.password.models import get_password_size
 from yithlibraryserver.scripts.utils import safe_print
 from yithlibraryserver.scripts.utils import get_user_display_name
 
@@ -81,6 +84,75 @@ def new_authorized_apps_collection(db):
     db.users.update({}, {'$unset': {'authorized_apps': ''}}, multi=True)
 
 
+@migration
+def add_n_passwords_counter(db):
+    """Initialize the n_passwords counter that PasswordsManager maintains
+    for every user that does not have it yet.
+    """
+    result = db.passwords.aggregate([
+        {'$group': {'_id': '$owner', 'count': {'$sum': 1}}},
+    ])
+    counts = dict([(group['_id'], group['count'])
+                   for group in result['result']])
+
+    for user in db.users.find({'n_passwords': {'$exists': False}}):
+        add_attribute(db.users, user, get_user_display_name(user),
+                      'n_passwords', counts.get(user['_id'], 0))
+
+
+@migration
+def add_tags_catalogue(db):
+    """Build the tags catalogue that PasswordsManager maintains for
+    every user.
+    """
+    passwords_manager = PasswordsManager(db)
+    for user in db.users.find():
+        safe_print('Building the tags catalogue of %s' %
+                   get_user_display_name(user))
+        passwords_manager.rebuild_tags(user)
+
+
+@migration
+def compress_password_fields(db):
+    """Compress the big fields of the passwords stored before the
+    compression was added.
+    """
+    codec = PasswordCodec()
+    fields = dict([(field, True) for field in codec.fields])
+    for password in db.passwords.find({}, fields=fields):
+        encoded = codec.encode(password)
+        if encoded is password:
+            continue
+
+        safe_print('Compressing password %s' % password['_id'])
+        # only if it was not changed since we read it
+        query = {'_id': password['_id']}
+        changes = {}
+        for field in codec.fields:
+            if encoded.get(field) is not password.get(field):
+                query[field] = password[field]
+                changes[field] = encoded[field]
+        db.passwords.update(query, {'$set': changes})
+
+
+@migration
+def add_passwords_size_counter(db):
+    """Initialize the passwords_size counter that PasswordsManager
+    maintains for every user that does not have it yet.
+
+    Run it after compress_password_fields since the compression
+    changes the size of the passwords.
+    """
+    sizes = {}
+    for password in db.passwords.find():
+        owner = password.get('owner')
+        sizes[owner] = sizes.get(owner, 0) + get_password_size(password)
+
+    for user in db.users.find({'passwords_size': {'$exists': False}}):
+        add_attribute(db.users, user, get_user_display_name(user),
+                      'passwords_size', sizes.get(user['_id'], 0))
+
+
 def migrate():
     usage = "migrate: %prog config_uri migration_name"
     description = "Add a 'send_email_periodically' preference to every user."
@@ -0,0 +1,112 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import optparse
+
+from yithlibraryserver.scripts.fsck import find_missing_references
+from yithlibraryserver.scripts.utils import safe_print, setup_simple_command
+from yithlibraryserver.user.cleanup import DEFAULT_BATCH_SIZE
+from yithlibraryserver.user.cleanup import USER_REFERENCES
+from yithlibraryserver.user.cleanup import DeletedUsersQueue
+from yithlibraryserver.user.cleanup import delete_users_data
+from yithlibraryserver.user.cleanup import process_deleted_users
+
+
+def find_orphan_owners(db, collection, field, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield lists of at most batch_size user ids that the documents
+    of collection reference but that have no user.
+
+    This is the same streaming scan that yith_fsck does: the
+    collection is read once in the order of its index on field and
+    the users are looked up with one query per batch. The documents
+    without a user are left to yith_fsck.
+    """
+    batch = []
+    for owner, count in find_missing_references(db, collection, field,
+                                                'users', '_id',
+                                                batch_size):
+        if owner is None:
+            continue
+        batch.append(owner)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def format_counts(counts):
+    return ', '.join(['%d %s' % (count, collection)
+                      for collection, count in sorted(counts.items())
+                      if count > 0])
+
+
+def gc_orphans():
+    result = setup_simple_command(
+        "gc_orphans",
+        "Remove the data of the users that do not exist anymore.",
+        options=[
+            optparse.make_option(
+                '--dry-run', action='store_true', default=False,
+                help='only report the deleted users with data left',
+            ),
+            optparse.make_option(
+                '--batch-size', type='int', default=DEFAULT_BATCH_SIZE,
+                help='number of users or documents handled in every '
+                'operation',
+            ),
+        ],
+    )
+    if isinstance(result, int):
+        return result
+    else:
+        settings, closer, env, args = result
+
+    try:
+        options = env['options']
+        db = settings['mongodb'].get_database()
+
+        if not options.dry_run:
+            # the users the worker did not process yet
+            processed = process_deleted_users(DeletedUsersQueue(db),
+                                              options.batch_size)
+            if processed:
+                safe_print('Removed the data of %d deleted users' %
+                           processed)
+
+        # every collection is scanned after the previous ones were
+        # cleaned so a deleted user is only found once
+        for collection, field in USER_REFERENCES:
+            for owners in find_orphan_owners(db, collection, field,
+                                             options.batch_size):
+                if options.dry_run:
+                    for owner in owners:
+                        safe_print('Found data of the deleted user %s in %s'
+                                   % (owner, collection))
+                else:
+                    counts = delete_users_data(db, owners,
+                                               batch_size=options.batch_size)
+                    safe_print('Removed the data of %d deleted users: %s' %
+                               (len(owners), format_counts(counts)))
+
+    finally:
+        closer()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    gc_orphans()
@@ -17,19 +17,40 @@
 # along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
 
 import operator
+import optparse
 
+from yithlibraryserver.password.codec import get_compression_report
+from yithlibraryserver.password.models import get_password_size
+from yithlibraryserver.password.models import get_passwords_size
+from yithlibraryserver.stats import get_stats, set_stats
 from yithlibraryserver.user.accounts import get_available_providers
-from yithlibraryserver.user.accounts import get_provider_key, get_n_passwords
+from yithlibraryserver.user.accounts import get_n_passwords
+from yithlibraryserver.user.accounts import get_user_counters
 from yithlibraryserver.scripts.utils import safe_print, setup_simple_command
 from yithlibraryserver.scripts.utils import get_user_display_name
 
 
-def _get_user_info(db, user):
+def _get_quota_status(quota, n_passwords, size):
+    if not quota.enabled:
+        return 'Unlimited'
+
+    level = quota.check(n_passwords, size)
+    if level is None:
+        return 'OK'
+    else:
+        return '%s quota exceeded' % level.capitalize()
+
+
+def _get_user_info(db, user, quota):
     providers = ', '.join([prov for prov in get_available_providers()
                            if ('%s_id' % prov) in user])
+    n_passwords = get_n_passwords(db, user)
+    size = get_passwords_size(db, user)
     return {
         'display_name': get_user_display_name(user),
-        'passwords': get_n_passwords(db, user),
+        'passwords': n_passwords,
+        'size': size,
+        'quota': _get_quota_status(quota, n_passwords, size),
         'providers': providers,
         'verified': user.get('email_verified', False),
         'date_joined': user.get('date_joined', 'Unknown'),
@@ -49,12 +70,15 @@ def users():
 
     try:
         db = settings['mongodb'].get_database()
+        quota = settings['password_quota']
         for user in db.users.find().sort('date_joined'):
-            info = _get_user_info(db, user)
+            info = _get_user_info(db, user, quota)
             providers = info['providers']
             text = (
                 '%s (%s)\n'
                 '\tPasswords: %d\n'
+                '\tSize: %d bytes\n'
+                '\tQuota: %s\n'
                 '\tProviders:%s\n'
                 '\tVerified: %s\n'
                 '\tDate joined: %s\n'
@@ -62,6 +86,8 @@ def users():
                     info['display_name'],
                     user['_id'],
                     info['passwords'],
+                    info['size'],
+                    info['quota'],
                     ' ' + providers if providers else '',
                     info['verified'],
                     info['date_joined'],
@@ -123,75 +149,52 @@ def applications():
         closer()
 
 
-def group_by_identity_provider(users):
-    providers = {}
-    for user in users:
-        for provider in get_available_providers():
-            key = get_provider_key(provider)
-            if user.get(key, None):
-                if provider in providers:
-                    providers[provider] += 1
-                else:
-                    providers[provider] = 1
-
-    return sorted(providers.items(), key=operator.itemgetter(1), reverse=True)
-
-
-def group_by_email_provider(users, threshold):
-    providers = {}
-    no_email = 0
-    for user in users:
-        email = user.get('email', None)
-        if not email:
-            no_email += 1
-            continue
+def rebuild_statistics(db):
+    """Compute the statistics and the password counters from scratch.
 
-        provider = email.split('@')[1]
-        if provider in providers:
-            providers[provider] += 1
-        else:
-            providers[provider] = 1
+    The passwords are streamed once to count them and add their sizes
+    by owner, so both counters of every user are fixed together.
+    """
+    counts = {}
+    sizes = {}
+    for password in db.passwords.find():
+        owner = password.get('owner')
+        counts[owner] = counts.get(owner, 0) + 1
+        sizes[owner] = sizes.get(owner, 0) + get_password_size(password)
 
-    providers = [(p, a) for p, a in providers.items() if a > threshold]
-    providers.sort(key=operator.itemgetter(1), reverse=True)
+    counters = {'passwords': sum(counts.values())}
+    for user in db.users.find():
+        changes = {
+            'n_passwords': counts.get(user['_id'], 0),
+            'passwords_size': sizes.get(user['_id'], 0),
+        }
+        if any([user.get(key, None) != value
+                for key, value in changes.items()]):
+            db.users.update({'_id': user['_id']}, {'$set': changes})
+            user.update(changes)
 
-    return providers, no_email
+        for key, amount in get_user_counters(user).items():
+            counters[key] = counters.get(key, 0) + amount
 
+    set_stats(db, counters)
 
-def get_passwords_map(passwords):
-    # make a password dict keyed by users_id
-    passwords_map = {}
-    for password in passwords:
-        owner = password['owner']
-        if owner in passwords_map:
-            passwords_map[owner] += 1
-        else:
-            passwords_map[owner] = 1
 
-    return passwords_map
-
-
-def users_with_most_passwords(users, passwords, amount):
-    passwords_map = get_passwords_map(passwords)
-    users_map = dict([(user['_id'], user) for user in users])
-
-    passwords_list = sorted(
-        passwords_map.items(),
-        key=operator.itemgetter(1),
-        reverse=True,
-    )[:amount]
-
-    result = []
-    for password_owner, amount in passwords_list:
-        result.append((users_map[password_owner], amount))
-
-    return result, len(passwords_map)
+def sort_counters(counters, threshold=0):
+    return sorted([(key, amount) for key, amount in counters.items()
+                   if amount > threshold],
+                  key=operator.itemgetter(1), reverse=True)
 
 
 def statistics():
     result = setup_simple_command(
         "statistics",
         "Report several different statistics.",
+        options=[
+            optparse.make_option(
+                '--rebuild', action='store_true', default=False,
+                help='recompute the statistics from scratch',
+            ),
+        ],
     )
     if isinstance(result, int):
         return result
@@ -201,31 +204,39 @@ def statistics():
     try:
         db = settings['mongodb'].get_database()
 
+        stats = get_stats(db)
+        if stats is None or env['options'].rebuild:
+            rebuild_statistics(db)
+            stats = get_stats(db)
+
         # Get the number of users and passwords
-        n_users = db.users.count()
+        n_users = stats.get('users', 0)
         if n_users == 0:
             return
 
-        n_passwords = db.passwords.count()
+        n_passwords = stats.get('passwords', 0)
 
         # How many users are verified
-        n_verified = db.users.find({'email_verified': True}).count()
+        n_verified = stats.get('verified', 0)
         # How many users allow the analytics cookie
-        n_allow_cookie = db.users.find({'allow_google_analytics': True}).count()
-
-        all_users = list(db.users.find())
+        n_allow_cookie = stats.get('allow_google_analytics', 0)
 
         # Identity providers
-        by_identity = group_by_identity_provider(all_users)
+        by_identity = sort_counters(stats.get('providers', {}))
 
         # Email providers
-        by_email, without_email = group_by_email_provider(all_users, 1)
+        by_email = sort_counters(stats.get('email_providers', {}), 1)
+        without_email = stats.get('without_email', 0)
         with_email = n_users - without_email
 
         # Top ten users
-        all_passwords = list(db.passwords.find())
-        most_active_users, users_with_passwords = users_with_most_passwords(
-            all_users, all_passwords, 10)
+        most_active_users = [
+            (user, user['n_passwords'])
+            for user in db.users.find({
+                'n_passwords': {'$gt': 0},
+            }).sort('n_passwords', -1).limit(10)
+        ]
+        users_with_passwords = stats.get('with_passwords', 0)
 
         # print the statistics
         safe_print('Number of users: %d' % n_users)
@@ -261,3 +272,28 @@ def statistics():
 
     finally:
         closer()
+
+
+def compression():
+    result = setup_simple_command(
+        "compression",
+        "Report how much the compressed password fields save.",
+    )
+    if isinstance(result, int):
+        return result
+    else:
+        settings, closer, env, args = result
+
+    try:
+        db = settings['mongodb'].get_database()
+        for field, n_values, original, stored in get_compression_report(db):
+            if n_values == 0:
+                safe_print('%s: no compressed values' % field)
+            else:
+                safe_print('%s: %d compressed values, %d bytes stored '
+                           'instead of %d (%.2f%%)' % (
+                               field, n_values, stored, original,
+                               (100.0 * stored) / original))
+
+    finally:
+        closer()
@@ -0,0 +1,76 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark of the rendering of bulk emails.
+
+Run it with:
+
+    python -m yithlibraryserver.scripts.tests.benchmark_rendering [n_users]
+
+It compares how many announcement messages per second are created
+with plain template names and with a MessageRenderer.
+"""
+
+import sys
+import time
+
+from pyramid import testing
+
+from yithlibraryserver.email import MessageRenderer, create_message
+from yithlibraryserver.scripts.utils import safe_print
+
+TEMPLATE = 'yithlibraryserver.scripts:templates/new_feature_send_passwords_via_email'
+
+
+def get_synthetic_users(n_users):
+    return [{
+        'first_name': 'User%d' % i,
+        'last_name': 'Doe',
+        'email': 'user%d@example.com' % i,
+    } for i in range(n_users)]
+
+
+def measure(request, template, users):
+    start = time.time()
+    for user in users:
+        create_message(request, template, {
+            'user': user,
+            'preferences_link': 'http://localhost:6543/preferences',
+        }, 'Yith Library announcement', [user['email']])
+    return len(users) / (time.time() - start)
+
+
+def main(n_users=10000):
+    config = testing.setUp()
+    config.include('pyramid_chameleon')
+    config.include('yithlibraryserver.subscribers')
+    try:
+        request = testing.DummyRequest()
+        users = get_synthetic_users(n_users)
+
+        safe_print('Rendering %d messages' % n_users)
+        safe_print('\tTemplate name: %.1f messages/s' % measure(
+            request, TEMPLATE, users))
+        safe_print('\tMessageRenderer: %.1f messages/s' % measure(
+            request, MessageRenderer(TEMPLATE), users))
+    finally:
+        testing.tearDown()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -107,3 +107,61 @@ class AnnounceTests(ScriptTests):
 Sending email to John3 Doe <john3@example.com>
 """
         self.assertEqual(stdout, expected_output)
+
+        # the announcement can not be sent twice by accident
+        sys.argv = ['notused', self.conf_file_path, 'new_feature_send_passwords_via_email']
+        sys.stdout = StringIO()
+        result = announce()
+        self.assertEqual(result, 3)
+        stdout = sys.stdout.getvalue()
+        self.assertEqual(stdout, 'The announcement "new_feature_send_passwords_via_email" was already sent. Use --restart to send it again.\n')
+
+        sys.argv = ['notused', self.conf_file_path, 'new_feature_send_passwords_via_email', '--restart']
+        sys.stdout = StringIO()
+        result = announce()
+        self.assertEqual(result, None)
+        stdout = sys.stdout.getvalue()
+        self.assertEqual(stdout, expected_output)
+
+    def test_announce_resume(self):
+        self.add_passwords(self.db.users.insert({
+            'first_name': 'John1',
+            'last_name': 'Doe',
+            'email': 'john1@example.com',
+            'email_verified': True,
+        }), 1)
+        self.add_passwords(self.db.users.insert({
+            'first_name': 'John2',
+            'last_name': 'Doe',
+            'email': 'john2@example.com',
+            'email_verified': True,
+        }), 1)
+        u3_id = self.add_passwords(self.db.users.insert({
+            'first_name': 'John3',
+            'last_name': 'Doe',
+            'email': 'john3@example.com',
+            'email_verified': True,
+        }), 1)
+        self.add_passwords(self.db.users.insert({
+            'first_name': 'John4',
+            'last_name': 'Doe',
+            'email': 'john4@example.com',
+            'email_verified': True,
+        }), 1)
+
+        sys.argv = ['notused', self.conf_file_path, 'new_feature_send_passwords_via_email', '--batch-size', '3']
+        sys.stdout = StringIO()
+        result = announce()
+        self.assertEqual(result, None)
+
+        # simulate a run that crashed after the first batch
+        self.db.bulkmail_jobs.update({}, {'$set': {
+            'last_id': u3_id,
+            'finished': False,
+        }})
+        sys.argv = ['notused', self.conf_file_path, 'new_feature_send_passwords_via_email']
+        sys.stdout = StringIO()
+        result = announce()
+        self.assertEqual(result, None)
+        stdout = sys.stdout.getvalue()
+        self.assertEqual(stdout, 'Sending email to John4 Doe <john4@example.com>\n')
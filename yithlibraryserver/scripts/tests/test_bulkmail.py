@@ -0,0 +1,214 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import smtplib
+import time
+import unittest
+
+from pyramid_mailer.mailer import Mailer
+from pyramid_mailer.message import Message
+from pyramid_mailer.testing import DummyMailer
+
+from yithlibraryserver.db import MongoDB
+from yithlibraryserver.scripts.bulkmail import BulkMailer, Checkpoint
+from yithlibraryserver.scripts.bulkmail import MailerSession, SMTPSession
+from yithlibraryserver.scripts.bulkmail import RateLimiter
+from yithlibraryserver.scripts.bulkmail import get_session_factory
+from yithlibraryserver.testing import MONGO_URI, clean_db
+
+
+class FakeSession(object):
+
+    sessions = []
+
+    def __init__(self, fail_for=()):
+        self.fail_for = fail_for
+        self.sent = []
+        self.closed = False
+        self.sessions.append(self)
+
+    def send(self, message):
+        if message.recipients[0] in self.fail_for:
+            raise smtplib.SMTPRecipientsRefused({})
+        if message.recipients[0] == 'broken@example.com':
+            raise ValueError('Bad message')
+        self.sent.append(message)
+
+    def close(self):
+        self.closed = True
+
+
+class SessionFactoryTests(unittest.TestCase):
+
+    def test_get_session_factory(self):
+        mailer = Mailer(host='example.com', port=1025, ssl=True,
+                        keyfile='key.pem', certfile='cert.pem',
+                        default_sender='no-reply@example.com')
+        factory = get_session_factory(mailer)
+        session = factory()
+        self.assertTrue(isinstance(session, SMTPSession))
+        self.assertTrue(session.smtp_mailer is mailer.smtp_mailer)
+        self.assertEqual(session.default_sender, 'no-reply@example.com')
+
+        factory = get_session_factory(DummyMailer())
+        self.assertTrue(isinstance(factory(), MailerSession))
+
+    def test_mailer_session(self):
+        mailer = DummyMailer()
+        session = MailerSession(mailer)
+        session.send(Message(subject='Test', recipients=['a@example.com'],
+                             body='Hi'))
+        session.close()
+        self.assertEqual(len(mailer.outbox), 1)
+
+
+class RateLimiterTests(unittest.TestCase):
+
+    def test_no_rate(self):
+        limiter = RateLimiter()
+        start = time.time()
+        for i in range(100):
+            limiter.wait()
+        self.assertTrue(time.time() - start < 0.1)
+
+    def test_rate(self):
+        limiter = RateLimiter(20)
+        start = time.time()
+        for i in range(5):
+            limiter.wait()
+        # the first call does not wait
+        self.assertTrue(time.time() - start >= 0.2)
+
+
+class BulkMailerTests(unittest.TestCase):
+
+    def setUp(self):
+        mdb = MongoDB(MONGO_URI)
+        self.db = mdb.get_database()
+        FakeSession.sessions = []
+
+    def tearDown(self):
+        clean_db(self.db)
+
+    def _build_message(self, recipient):
+        return Message(subject='Test', recipients=[recipient['email']],
+                       body='Hi')
+
+    def _recipients(self, n):
+        recipients = [{'_id': i, 'email': 'user%d@example.com' % i}
+                      for i in range(n)]
+
+        def get_recipients(after):
+            return [r for r in recipients if after is None or r['_id'] > after]
+
+        return get_recipients
+
+    def test_send_all(self):
+        mailer = BulkMailer(FakeSession, concurrency=3, batch_size=4)
+        checkpoint = Checkpoint(self.db, 'test')
+        errors = mailer.send_all(self._recipients(10), self._build_message,
+                                 checkpoint)
+        self.assertEqual(errors, [])
+        sent = sum([len(session.sent) for session in FakeSession.sessions])
+        self.assertEqual(sent, 10)
+        self.assertTrue(all([s.closed for s in FakeSession.sessions]))
+
+        job = self.db.bulkmail_jobs.find_one({'_id': 'test'})
+        self.assertEqual(job['last_id'], 9)
+        self.assertEqual(job['sent'], 10)
+        self.assertTrue(job['finished'])
+
+    def test_errors(self):
+        mailer = BulkMailer(lambda: FakeSession(['user3@example.com']),
+                            batch_size=5)
+        checkpoint = Checkpoint(self.db, 'test')
+        errors = mailer.send_all(self._recipients(10), self._build_message,
+                                 checkpoint)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0][0]['_id'], 3)
+
+        # the job stops before the failed recipient
+        job = self.db.bulkmail_jobs.find_one({'_id': 'test'})
+        self.assertEqual(job['last_id'], 2)
+        self.assertEqual(job['skip'], [4])
+        self.assertEqual(job['sent'], 4)
+        self.assertFalse(job['finished'])
+
+        # and the resume only sends what is missing
+        FakeSession.sessions = []
+        mailer = BulkMailer(FakeSession, batch_size=5)
+        checkpoint = Checkpoint(self.db, 'test')
+        errors = mailer.send_all(self._recipients(10), self._build_message,
+                                 checkpoint)
+        self.assertEqual(errors, [])
+        sent = FakeSession.sessions[0].sent
+        self.assertEqual([m.recipients[0] for m in sent], [
+            'user3@example.com', 'user5@example.com', 'user6@example.com',
+            'user7@example.com', 'user8@example.com', 'user9@example.com',
+        ])
+        job = self.db.bulkmail_jobs.find_one({'_id': 'test'})
+        self.assertEqual(job['last_id'], 9)
+        self.assertEqual(job['skip'], [])
+        self.assertEqual(job['sent'], 10)
+        self.assertTrue(job['finished'])
+
+    def test_unexpected_errors(self):
+        mailer = BulkMailer(FakeSession, batch_size=5)
+        checkpoint = Checkpoint(self.db, 'test')
+
+        def build_message(recipient):
+            if recipient['_id'] == 0:
+                return Message(subject='Test',
+                               recipients=['broken@example.com'], body='Hi')
+            return self._build_message(recipient)
+
+        errors = mailer.send_all(self._recipients(10), build_message,
+                                 checkpoint)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0][0]['_id'], 0)
+        self.assertEqual(str(errors[0][1]), 'Bad message')
+        # the rest of the batch was delivered
+        self.assertEqual(len(FakeSession.sessions[0].sent), 4)
+        job = self.db.bulkmail_jobs.find_one({'_id': 'test'})
+        self.assertEqual(job['last_id'], None)
+        self.assertEqual(job['skip'], [1, 2, 3, 4])
+        self.assertFalse(job['finished'])
+
+    def test_resume(self):
+        self.db.bulkmail_jobs.insert({
+            '_id': 'test',
+            'last_id': 5,
+            'sent': 6,
+            'finished': False,
+        })
+        mailer = BulkMailer(FakeSession)
+        checkpoint = Checkpoint(self.db, 'test')
+        mailer.send_all(self._recipients(10), self._build_message,
+                        checkpoint)
+        sent = FakeSession.sessions[0].sent
+        self.assertEqual([m.recipients[0] for m in sent], [
+            'user6@example.com', 'user7@example.com',
+            'user8@example.com', 'user9@example.com',
+        ])
+        self.assertEqual(checkpoint.job['sent'], 10)
+
+        checkpoint.restart()
+        job = self.db.bulkmail_jobs.find_one({'_id': 'test'})
+        self.assertEqual(job['last_id'], None)
+        self.assertEqual(job['sent'], 0)
+        self.assertFalse(job['finished'])
@@ -0,0 +1,164 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import datetime
+import sys
+
+from freezegun import freeze_time
+
+from yithlibraryserver.compat import StringIO
+from yithlibraryserver.password.models import PasswordsManager
+from yithlibraryserver.scripts.expiring import date_to_days, days_to_date
+from yithlibraryserver.scripts.expiring import expiring_passwords
+from yithlibraryserver.scripts.expiring import get_expiring_passwords
+from yithlibraryserver.scripts.expiring import group_by_owner
+from yithlibraryserver.scripts.expiring import USERS_BATCH_SIZE
+from yithlibraryserver.scripts.testing import ScriptTests
+
+TODAY = date_to_days(datetime.date(2015, 2, 1))
+
+
+class ExpiringPasswordsTests(ScriptTests):
+
+    def setUp(self):
+        super(ExpiringPasswordsTests, self).setUp()
+        self.old_args = sys.argv[:]
+        self.old_stdout = sys.stdout
+
+    def tearDown(self):
+        sys.argv = self.old_args
+        sys.stdout = self.old_stdout
+        super(ExpiringPasswordsTests, self).tearDown()
+
+    def add_password(self, owner, service, expiration):
+        return self.db.passwords.insert({
+            'service': service,
+            'account': 'john',
+            'secret': 's3cr3t',
+            'notes': 'a long note',
+            'expiration': expiration,
+            'owner': owner,
+        })
+
+    def test_dates(self):
+        self.assertEqual(date_to_days(datetime.date(1970, 1, 2)), 1)
+        self.assertEqual(days_to_date(TODAY), datetime.date(2015, 2, 1))
+
+    def test_get_expiring_passwords(self):
+        PasswordsManager(self.db).ensure_indexes()
+        p1 = self.add_password('user1', 'service1', TODAY)
+        p2 = self.add_password('user2', 'service2', TODAY + 7)
+        p3 = self.add_password('user1', 'service3', TODAY + 3)
+        self.add_password('user1', 'service4', TODAY + 8)
+        self.add_password('user1', 'service5', TODAY - 1)
+        self.add_password('user1', 'service6', None)
+
+        passwords = get_expiring_passwords(self.db, datetime.date(2015, 2, 1),
+                                           7)
+        passwords = list(passwords)
+        # in the order of the (expiration, owner) index
+        self.assertEqual([p['_id'] for p in passwords], [p1, p3, p2])
+        self.assertFalse('secret' in passwords[0])
+        self.assertFalse('notes' in passwords[0])
+
+        owners, groups = group_by_owner(passwords)
+        self.assertEqual(owners, ['user1', 'user2'])
+        self.assertEqual([p['_id'] for p in groups['user1']], [p1, p3])
+        self.assertEqual([p['_id'] for p in groups['user2']], [p2])
+
+    @freeze_time('2015-02-01 10:00:00')
+    def test_many_users(self):
+        for i in range(USERS_BATCH_SIZE + 5):
+            user_id = self.db.users.insert({
+                'first_name': 'John%d' % i,
+                'last_name': 'Doe',
+                'email': 'john%d@example.com' % i,
+                'email_verified': True,
+            })
+            self.add_password(user_id, 'service1', TODAY + 1)
+
+        sys.argv = ['notused', self.conf_file_path]
+        sys.stdout = StringIO()
+        result = expiring_passwords()
+        self.assertEqual(result, None)
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), USERS_BATCH_SIZE + 5)
+        self.assertEqual(lines[0], 'Expiring passwords sent to John0 Doe '
+                         '<john0@example.com>')
+        self.assertEqual(lines[-1], 'Expiring passwords sent to John%d Doe '
+                         '<john%d@example.com>' % (USERS_BATCH_SIZE + 4,
+                                                   USERS_BATCH_SIZE + 4))
+
+    def test_no_arguments(self):
+        sys.argv = []
+        sys.stdout = StringIO()
+        result = expiring_passwords()
+        self.assertEqual(result, 2)
+        stdout = sys.stdout.getvalue()
+        self.assertEqual(stdout, 'You must provide at least one argument\n')
+
+    def test_empty_database(self):
+        sys.argv = ['notused', self.conf_file_path]
+        sys.stdout = StringIO()
+        result = expiring_passwords()
+        self.assertEqual(result, None)
+        self.assertEqual(sys.stdout.getvalue(), '')
+
+    @freeze_time('2015-02-01 10:00:00')
+    def test_several_users(self):
+        u1_id = self.db.users.insert({
+            'first_name': 'John1',
+            'last_name': 'Doe',
+            'email': 'john1@example.com',
+            'email_verified': True,
+        })
+        self.add_password(u1_id, 'service1', TODAY + 1)
+        self.add_password(u1_id, 'service2', TODAY + 2)
+        u2_id = self.db.users.insert({
+            'first_name': 'John2',
+            'last_name': 'Doe',
+            'email': 'john2@example.com',
+            'email_verified': False,
+        })
+        self.add_password(u2_id, 'service1', TODAY + 1)
+        u3_id = self.db.users.insert({
+            'first_name': 'John3',
+            'last_name': 'Doe',
+            'email': 'john3@example.com',
+            'email_verified': True,
+        })
+        self.add_password(u3_id, 'service1', TODAY + 20)
+
+        sys.argv = ['notused', self.conf_file_path]
+        sys.stdout = StringIO()
+        result = expiring_passwords()
+        self.assertEqual(result, None)
+        self.assertEqual(sys.stdout.getvalue(),
+                         'Expiring passwords sent to John1 Doe '
+                         '<john1@example.com>\n')
+
+        sys.argv = ['notused', self.conf_file_path, '--days', '30']
+        sys.stdout = StringIO()
+        result = expiring_passwords()
+        self.assertEqual(result, None)
+        self.assertEqual(sys.stdout.getvalue(),
+                         'Expiring passwords sent to John1 Doe '
+                         '<john1@example.com>\n'
+                         'Expiring passwords sent to John3 Doe '
+                         '<john3@example.com>\n')
@@ -0,0 +1,151 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+
+from yithlibraryserver.compat import StringIO
+from yithlibraryserver.pagecache import get_page_version
+from yithlibraryserver.scripts.fsck import fsck, group_values
+from yithlibraryserver.scripts.fsck import find_missing_references
+from yithlibraryserver.scripts.testing import ScriptTests
+
+
+class FsckTests(ScriptTests):
+
+    def setUp(self):
+        super(FsckTests, self).setUp()
+        self.old_args = sys.argv[:]
+        self.old_stdout = sys.stdout
+
+    def tearDown(self):
+        super(FsckTests, self).tearDown()
+        sys.argv = self.old_args
+        sys.stdout = self.old_stdout
+
+    def test_group_values(self):
+        documents = [{}, {'owner': 'a'}, {'owner': 'a'}, {'owner': 'b'}]
+        self.assertEqual(list(group_values(documents, 'owner')),
+                         [(None, 1), ('a', 2), ('b', 1)])
+        self.assertEqual(list(group_values([], 'owner')), [])
+
+    def test_find_missing_references(self):
+        u1_id = self.db.users.insert({'first_name': 'John'})
+        self.add_passwords(u1_id, 2)
+        self.add_passwords('deleted1', 3)
+        self.add_passwords('deleted2', 1)
+        self.db.passwords.insert({'secret': 'no owner'})
+
+        missing = find_missing_references(self.db, 'passwords', 'owner',
+                                          'users', '_id', batch_size=2)
+        self.assertEqual(sorted(missing, key=str),
+                         [(None, 1), ('deleted1', 3), ('deleted2', 1)])
+
+    def test_no_arguments(self):
+        sys.argv = []
+        sys.stdout = StringIO()
+        result = fsck()
+        self.assertEqual(result, 2)
+
+    def test_fsck(self):
+        u1_id = self.db.users.insert({
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'email': 'john@example.com',
+            'email_verified': True,
+            'email_verification_code': '1234',
+        })
+        u2_id = self.db.users.insert({
+            'first_name': 'Peter',
+            'last_name': 'Doe',
+            'email': 'peter@example.com',
+            'email_verified': False,
+            'email_verification_code': '5678',
+        })
+        self.add_passwords(u1_id, 2)
+        self.add_passwords('deleted1', 3)
+        self.db.applications.insert({'owner': u2_id, 'client_id': 'app1'})
+        self.db.applications.insert({'owner': 'deleted1',
+                                     'client_id': 'app2'})
+        self.db.authorized_apps.insert({'user': u1_id, 'client_id': 'app1'})
+        self.db.authorized_apps.insert({'user': u1_id, 'client_id': 'app2'})
+        self.db.authorized_apps.insert({'user': u1_id, 'client_id': 'app3'})
+
+        sys.argv = ['notused', self.conf_file_path]
+        sys.stdout = StringIO()
+        result = fsck()
+        self.assertEqual(result, None)
+        expected_output = """Passwords of missing users: 3 documents with 1 missing references
+%(tab)sdeleted1 (3 documents)
+Tags of missing users: OK
+Idempotency keys of missing users: OK
+Applications of missing users: 1 documents with 1 missing references
+%(tab)sdeleted1 (1 documents)
+Authorized apps of missing users: OK
+Authorized apps of missing applications: 1 documents with 1 missing references
+%(tab)sapp3 (1 documents)
+Authorization codes of missing users: OK
+Authorization codes of missing applications: OK
+Access codes of missing users: OK
+Access codes of missing applications: OK
+Users with a dangling email verification code: 1 users
+%(tab)sJohn Doe <john@example.com> (%(u1)s)
+""" % {'tab': '\t', 'u1': u1_id}
+        self.assertEqual(sys.stdout.getvalue(), expected_output)
+
+        sys.argv = ['notused', self.conf_file_path, '--repair',
+                    '--samples', '0']
+        sys.stdout = StringIO()
+        result = fsck()
+        self.assertEqual(result, None)
+        expected_output = """Passwords of missing users: 3 documents with 1 missing references
+%(tab)sRemoved 3 documents
+Tags of missing users: OK
+Idempotency keys of missing users: OK
+Applications of missing users: 1 documents with 1 missing references
+%(tab)sRemoved 1 documents
+Authorized apps of missing users: OK
+Authorized apps of missing applications: 2 documents with 2 missing references
+%(tab)sRemoved 2 documents
+Authorization codes of missing users: OK
+Authorization codes of missing applications: OK
+Access codes of missing users: OK
+Access codes of missing applications: OK
+Users with a dangling email verification code: 1 users
+%(tab)sRemoved 1 codes
+""" % {'tab': '\t'}
+        self.assertEqual(sys.stdout.getvalue(), expected_output)
+
+        self.assertEqual(self.db.passwords.count(), 2)
+        self.assertEqual(self.db.stats.find_one()['passwords'], -3)
+        self.assertEqual([app['client_id']
+                          for app in self.db.applications.find()], ['app1'])
+        self.assertEqual(get_page_version(self.db, 'oauth2_clients'), 1)
+        self.assertEqual([auth['client_id']
+                          for auth in self.db.authorized_apps.find()],
+                         ['app1'])
+        user1 = self.db.users.find_one({'_id': u1_id})
+        self.assertFalse('email_verification_code' in user1)
+        user2 = self.db.users.find_one({'_id': u2_id})
+        self.assertEqual(user2['email_verification_code'], '5678')
+
+        # everything is fine now
+        sys.argv = ['notused', self.conf_file_path]
+        sys.stdout = StringIO()
+        fsck()
+        for line in sys.stdout.getvalue().splitlines():
+            self.assertTrue(line.endswith(': OK'))
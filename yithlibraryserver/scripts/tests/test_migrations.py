@@ -18,8 +18,10 @@
 
 import sys
 
-from yithlibraryserver.compat import StringIO
+from yithlibraryserver.compat import StringIO, text_type
 from yithlibraryserver.oauth2.authorization import Authorizator
+from yithlibraryserver.password.codec import is_compressed
+from yithlibraryserver.password.models import get_password_size
 from yithlibraryserver.scripts.migrations import migrate
 from yithlibraryserver.scripts.testing import ScriptTests
 
@@ -162,3 +164,149 @@ Storing authorized app "app1" for user John2 Doe2 <john2@example.com>
         self.assertFalse('authorized_apps' in user2)
         auths = authorizator.get_user_authorizations({'_id': u2_id})
         self.assertEqual(auths.count(), 1)
+
+
+class AddNPasswordsCounterTests(BaseMigrationsTests):
+
+    def test_no_users(self):
+        sys.argv = ['notused', self.conf_file_path, 'add_n_passwords_counter']
+        sys.stdout = StringIO()
+        result = migrate()
+        self.assertEqual(result, None)
+        stdout = sys.stdout.getvalue()
+        self.assertEqual(stdout, '')
+
+    def test_some_users(self):
+        u1_id = self.db.users.insert({
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'email': 'john@example.com',
+        })
+        self.db.passwords.insert({'owner': u1_id, 'secret': 'secret1'})
+        self.db.passwords.insert({'owner': u1_id, 'secret': 'secret2'})
+        u2_id = self.db.users.insert({
+            'first_name': 'John2',
+            'last_name': 'Doe2',
+            'email': 'john2@example.com',
+        })
+        u3_id = self.db.users.insert({
+            'first_name': 'John3',
+            'last_name': 'Doe3',
+            'email': 'john3@example.com',
+            'n_passwords': 0,
+        })
+
+        sys.argv = ['notused', self.conf_file_path, 'add_n_passwords_counter']
+        sys.stdout = StringIO()
+        result = migrate()
+        self.assertEqual(result, None)
+        stdout = sys.stdout.getvalue()
+        expected_output = """Adding attribute "n_passwords" to John Doe <john@example.com>
+Adding attribute "n_passwords" to John2 Doe2 <john2@example.com>
+"""
+        self.assertEqual(stdout, expected_output)
+
+        user1 = self.db.users.find_one({'_id': u1_id})
+        self.assertEqual(user1['n_passwords'], 2)
+        user2 = self.db.users.find_one({'_id': u2_id})
+        self.assertEqual(user2['n_passwords'], 0)
+        user3 = self.db.users.find_one({'_id': u3_id})
+        self.assertEqual(user3['n_passwords'], 0)
+
+
+class AddTagsCatalogueTests(BaseMigrationsTests):
+
+    def test_no_users(self):
+        sys.argv = ['notused', self.conf_file_path, 'add_tags_catalogue']
+        sys.stdout = StringIO()
+        result = migrate()
+        self.assertEqual(result, None)
+        stdout = sys.stdout.getvalue()
+        self.assertEqual(stdout, '')
+
+    def test_some_users(self):
+        u1_id = self.db.users.insert({
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'email': 'john@example.com',
+        })
+        self.db.passwords.insert({'owner': u1_id, 'tags': ['a', 'b']})
+        self.db.passwords.insert({'owner': u1_id, 'tags': ['a']})
+        self.db.passwords.insert({'owner': u1_id, 'tags': None})
+        # an outdated entry
+        self.db.tags.insert({'owner': u1_id, 'tag': 'c', 'count': 1})
+        self.db.users.insert({
+            'first_name': 'John2',
+            'last_name': 'Doe2',
+            'email': 'john2@example.com',
+        })
+
+        sys.argv = ['notused', self.conf_file_path, 'add_tags_catalogue']
+        sys.stdout = StringIO()
+        result = migrate()
+        self.assertEqual(result, None)
+        stdout = sys.stdout.getvalue()
+        expected_output = """Building the tags catalogue of John Doe <john@example.com>
+Building the tags catalogue of John2 Doe2 <john2@example.com>
+"""
+        self.assertEqual(stdout, expected_output)
+
+        tags = self.db.tags.find({'owner': u1_id}, sort=[('tag', 1)])
+        self.assertEqual([(t['tag'], t['count']) for t in tags],
+                         [('a', 2), ('b', 1)])
+
+
+class CompressPasswordFieldsTests(BaseMigrationsTests):
+
+    def test_compress(self):
+        notes = text_type('This is a certificate. ') * 100
+        p1 = self.db.passwords.insert({'secret': 's3cr3t', 'notes': notes})
+        p2 = self.db.passwords.insert({'secret': 's3cr3t', 'notes': 'short'})
+
+        sys.argv = ['notused', self.conf_file_path,
+                    'compress_password_fields']
+        sys.stdout = StringIO()
+        result = migrate()
+        self.assertEqual(result, None)
+        stdout = sys.stdout.getvalue()
+        self.assertEqual(stdout, 'Compressing password %s\n' % p1)
+
+        password1 = self.db.passwords.find_one({'_id': p1})
+        self.assertTrue(is_compressed(password1['notes']))
+        self.assertEqual(password1['secret'], 's3cr3t')
+        password2 = self.db.passwords.find_one({'_id': p2})
+        self.assertEqual(password2['notes'], 'short')
+
+
+class AddPasswordsSizeCounterTests(BaseMigrationsTests):
+
+    def test_some_users(self):
+        u1_id = self.db.users.insert({
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'email': 'john@example.com',
+        })
+        self.db.passwords.insert({'owner': u1_id, 'secret': 'secret1'})
+        self.db.passwords.insert({'owner': u1_id, 'secret': 'secret2'})
+        u2_id = self.db.users.insert({
+            'first_name': 'John2',
+            'last_name': 'Doe2',
+            'email': 'john2@example.com',
+            'passwords_size': 10,
+        })
+
+        sys.argv = ['notused', self.conf_file_path,
+                    'add_passwords_size_counter']
+        sys.stdout = StringIO()
+        result = migrate()
+        self.assertEqual(result, None)
+        stdout = sys.stdout.getvalue()
+        self.assertEqual(stdout, 'Adding attribute "passwords_size" to '
+                                 'John Doe <john@example.com>\n')
+
+        expected = sum([get_password_size(p)
+                        for p in self.db.passwords.find({'owner': u1_id})])
+        user1 = self.db.users.find_one({'_id': u1_id})
+        self.assertEqual(user1['passwords_size'], expected)
+        user2 = self.db.users.find_one({'_id': u2_id})
+        self.assertEqual(user2['passwords_size'], 10)
@@ -0,0 +1,109 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+
+from yithlibraryserver.compat import StringIO
+from yithlibraryserver.scripts.orphans import gc_orphans
+from yithlibraryserver.scripts.orphans import find_orphan_owners
+from yithlibraryserver.scripts.testing import ScriptTests
+from yithlibraryserver.user.cleanup import DeletedUsersQueue
+
+
+class GCOrphansTests(ScriptTests):
+
+    def setUp(self):
+        super(GCOrphansTests, self).setUp()
+        self.old_args = sys.argv[:]
+        self.old_stdout = sys.stdout
+
+    def tearDown(self):
+        super(GCOrphansTests, self).tearDown()
+        sys.argv = self.old_args
+        sys.stdout = self.old_stdout
+
+    def test_find_orphan_owners(self):
+        u1_id = self.db.users.insert({'first_name': 'John'})
+        self.add_passwords(u1_id, 1)
+        self.add_passwords('user3', 2)
+        self.add_passwords('user4', 1)
+        self.add_passwords('user5', 1)
+        self.add_passwords(None, 1)
+        self.assertEqual(list(find_orphan_owners(self.db, 'tags', 'owner')),
+                         [])
+        self.assertEqual(
+            list(find_orphan_owners(self.db, 'passwords', 'owner',
+                                    batch_size=2)),
+            [['user3', 'user4'], ['user5']])
+
+    def test_no_arguments(self):
+        sys.argv = []
+        sys.stdout = StringIO()
+        result = gc_orphans()
+        self.assertEqual(result, 2)
+
+    def test_gc_orphans(self):
+        sys.argv = ['notused', self.conf_file_path]
+        sys.stdout = StringIO()
+        result = gc_orphans()
+        self.assertEqual(result, None)
+        self.assertEqual(sys.stdout.getvalue(), '')
+
+        user_id = self.db.users.insert({'first_name': 'John'})
+        self.add_passwords(user_id, 2)
+        self.add_passwords('deleted1', 3)
+        self.db.applications.insert({'owner': 'deleted2',
+                                     'client_id': 'client1'})
+        self.db.authorized_apps.insert({'user': user_id,
+                                        'client_id': 'client1'})
+        self.db.passwords.insert({'owner': 'deleted3'})
+        DeletedUsersQueue(self.db).enqueue('deleted3')
+
+        sys.argv = ['notused', self.conf_file_path, '--dry-run']
+        sys.stdout = StringIO()
+        result = gc_orphans()
+        self.assertEqual(result, None)
+        self.assertEqual(sys.stdout.getvalue().splitlines(), [
+            'Found data of the deleted user deleted1 in passwords',
+            'Found data of the deleted user deleted3 in passwords',
+            'Found data of the deleted user deleted2 in applications',
+        ])
+        self.assertEqual(self.db.passwords.count(), 6)
+
+        sys.argv = ['notused', self.conf_file_path]
+        sys.stdout = StringIO()
+        result = gc_orphans()
+        self.assertEqual(result, None)
+        self.assertEqual(sys.stdout.getvalue().splitlines(), [
+            'Removed the data of 1 deleted users',
+            'Removed the data of 1 deleted users: 3 passwords',
+            'Removed the data of 1 deleted users: '
+            '1 applications, 1 authorized_apps',
+        ])
+        self.assertEqual(self.db.passwords.find({'owner': user_id}).count(),
+                         2)
+        self.assertEqual(self.db.passwords.count(), 2)
+        self.assertEqual(self.db.applications.count(), 0)
+        self.assertEqual(self.db.authorized_apps.count(), 0)
+        self.assertEqual(self.db.deleted_users.count(), 0)
+
+        # nothing is left
+        sys.argv = ['notused', self.conf_file_path]
+        sys.stdout = StringIO()
+        result = gc_orphans()
+        self.assertEqual(sys.stdout.getvalue(), '')
@@ -16,11 +16,17 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
 import datetime
+import os
+import re
 import sys
 
-from yithlibraryserver.compat import StringIO
+from yithlibraryserver.compat import StringIO, text_type
+from yithlibraryserver.password.codec import PasswordCodec
+from yithlibraryserver.password.models import get_password_size
 from yithlibraryserver.scripts.reports import users, applications, statistics
+from yithlibraryserver.scripts.reports import compression
 from yithlibraryserver.scripts.testing import ScriptTests
+from yithlibraryserver.stats import increment_stats
 
 
 class ReportTests(ScriptTests):
@@ -48,6 +54,11 @@ class ReportTests(ScriptTests):
         stdout = sys.stdout.getvalue()
         self.assertEqual(stdout, '')
 
+        # Simulate an install where the statistics were never built
+        # but some changes were counted already
+        self.db.stats.drop()
+        increment_stats(self.db, {'users': 1, 'passwords': 3})
+
         # Add some data to the database
         u1_id = self.db.users.insert({
             'first_name': 'John',
@@ -100,6 +111,8 @@ class ReportTests(ScriptTests):
         }
         expected_output = """John Doe <john@example.com> (%(u1)s)
 %(tab)sPasswords: 0
+%(tab)sSize: 0 bytes
+%(tab)sQuota: Unlimited
 %(tab)sProviders:
 %(tab)sVerified: False
 %(tab)sDate joined: Unknown
@@ -107,6 +120,8 @@ class ReportTests(ScriptTests):
 
 John2 Doe2 <john2@example.com> (%(u2)s)
 %(tab)sPasswords: 1
+%(tab)sSize: 82 bytes
+%(tab)sQuota: Unlimited
 %(tab)sProviders: twitter
 %(tab)sVerified: True
 %(tab)sDate joined: Unknown
@@ -114,6 +129,8 @@ John2 Doe2 <john2@example.com> (%(u2)s)
 
 John3 Doe3 <john3@example.com> (%(u3)s)
 %(tab)sPasswords: 2
+%(tab)sSize: 164 bytes
+%(tab)sQuota: Unlimited
 %(tab)sProviders: facebook, google, twitter
 %(tab)sVerified: True
 %(tab)sDate joined: 2012-12-12 12:12:12+00:00
@@ -122,6 +139,26 @@ John3 Doe3 <john3@example.com> (%(u3)s)
 """ % context
         self.assertEqual(stdout, expected_output)
 
+        # The counters and the quota are used when available
+        self.db.users.update({'_id': u3_id},
+                             {'$set': {'n_passwords': 2,
+                                       'passwords_size': 1500}})
+        os.environ['PASSWORD_QUOTA_SOFT_SIZE'] = '1000'
+        os.environ['PASSWORD_QUOTA_HARD_SIZE'] = '2000'
+        sys.stdout = StringIO()
+        try:
+            result = users()
+        finally:
+            del os.environ['PASSWORD_QUOTA_SOFT_SIZE']
+            del os.environ['PASSWORD_QUOTA_HARD_SIZE']
+        self.assertEqual(result, None)
+        stdout = sys.stdout.getvalue()
+        self.assertTrue('%(tab)sPasswords: 0\n%(tab)sSize: 0 bytes\n'
+                        '%(tab)sQuota: OK\n' % context in stdout)
+        self.assertTrue('%(tab)sPasswords: 2\n%(tab)sSize: 1500 bytes\n'
+                        '%(tab)sQuota: Soft quota exceeded\n' % context
+                        in stdout)
+
         # Restore sys.values
         sys.argv = old_args
         sys.stdout = old_stdout
@@ -149,6 +186,11 @@ John3 Doe3 <john3@example.com> (%(u3)s)
         stdout = sys.stdout.getvalue()
         self.assertEqual(stdout, '')
 
+        # Simulate an install where the statistics were never built
+        # but some changes were counted already
+        self.db.stats.drop()
+        increment_stats(self.db, {'users': 1, 'passwords': 3})
+
         # Add some data to the database
         u1_id = self.db.users.insert({
             'first_name': 'John',
@@ -216,6 +258,11 @@ Test application 2
         stdout = sys.stdout.getvalue()
         self.assertEqual(stdout, '')
 
+        # Simulate an install where the statistics were never built
+        # but some changes were counted already
+        self.db.stats.drop()
+        increment_stats(self.db, {'users': 1, 'passwords': 3})
+
         # Add some data to the database
         u1_id = self.db.users.insert({
             'first_name': 'John',
@@ -305,6 +352,8 @@ Test application 2
             'persona_id': '2',
         })
 
+        # The partial statistics are not used and they are built
+        # from scratch
         sys.argv = ['notused', self.conf_file_path]
         sys.stdout = StringIO()
         result = statistics()
@@ -332,6 +381,64 @@ Users without passwords: 70.00%% (7)
 """ % {'tab': '\t'}
         self.assertEqual(stdout, expected_output)
 
+        # Now the statistics are a single document read
+        sys.argv = ['notused', self.conf_file_path]
+        sys.stdout = StringIO()
+        result = statistics()
+        self.assertEqual(result, None)
+        self.assertEqual(sys.stdout.getvalue(), expected_output)
+
+        user1 = self.db.users.find_one({'_id': u1_id})
+        self.assertEqual(user1['n_passwords'], 10)
+        self.assertEqual(user1['passwords_size'], sum([
+            get_password_size(p)
+            for p in self.db.passwords.find({'owner': u1_id})]))
+
+        # The users added behind the statistics back are counted
+        # after a rebuild
+        self.db.users.insert({
+            'first_name': 'Zoe',
+            'last_name': 'Doe',
+            'email': '',
+        })
+        sys.argv = ['notused', self.conf_file_path, '--rebuild']
+        sys.stdout = StringIO()
+        result = statistics()
+        self.assertEqual(result, None)
+        self.assertTrue(sys.stdout.getvalue().startswith(
+            'Number of users: 11\n'))
+
         # Restore sys.values
         sys.argv = old_args
         sys.stdout = old_stdout
+
+    def test_compression(self):
+        old_args = sys.argv[:]
+        old_stdout = sys.stdout
+
+        sys.argv = []
+        sys.stdout = StringIO()
+        result = compression()
+        self.assertEqual(result, 2)
+
+        sys.argv = ['notused', self.conf_file_path]
+        sys.stdout = StringIO()
+        result = compression()
+        self.assertEqual(result, None)
+        self.assertEqual(sys.stdout.getvalue(),
+                         'notes: no compressed values\n'
+                         'secret: no compressed values\n')
+
+        notes = text_type('This is a certificate. ') * 100
+        self.db.passwords.insert(PasswordCodec().encode({'notes': notes}))
+        sys.stdout = StringIO()
+        result = compression()
+        self.assertEqual(result, None)
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertTrue(re.match(r'notes: 1 compressed values, \d+ bytes '
+                                 r'stored instead of 2300 \(\d+\.\d\d%\)$',
+                                 lines[0]))
+        self.assertEqual(lines[1], 'secret: no compressed values')
+
+        sys.argv = old_args
+        sys.stdout = old_stdout
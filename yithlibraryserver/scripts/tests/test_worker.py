@@ -0,0 +1,141 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import sys
+
+from bson.tz_util import utc
+from pyramid_mailer.message import Message
+
+from yithlibraryserver.compat import StringIO
+from yithlibraryserver.outbox import Outbox, message_to_document
+from yithlibraryserver.scripts.testing import ScriptTests
+from yithlibraryserver.scripts.worker import deliver_messages, worker
+from yithlibraryserver.user.cleanup import DeletedUsersQueue
+
+
+class BrokenMailer(object):
+
+    def send_immediately(self, message):
+        raise ValueError('Bad message')
+
+
+class WorkerTests(ScriptTests):
+
+    def setUp(self):
+        super(WorkerTests, self).setUp()
+        self.old_args = sys.argv[:]
+        self.old_stdout = sys.stdout
+
+    def tearDown(self):
+        super(WorkerTests, self).tearDown()
+        sys.argv = self.old_args
+        sys.stdout = self.old_stdout
+
+    def _add_message(self, recipient, **attrs):
+        document = message_to_document(Message(
+            subject='Testing message',
+            recipients=[recipient],
+            body='Hello',
+        ))
+        document.update({
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt': datetime.datetime(2012, 1, 1, tzinfo=utc),
+        })
+        document.update(attrs)
+        return self.db.outbox.insert(document)
+
+    def test_no_arguments(self):
+        sys.argv = []
+        sys.stdout = StringIO()
+        result = worker()
+        self.assertEqual(result, 2)
+        stdout = sys.stdout.getvalue()
+        self.assertEqual(stdout, 'You must provide at least one argument\n')
+
+    def test_empty_outbox(self):
+        sys.argv = ['notused', self.conf_file_path, '--once']
+        sys.stdout = StringIO()
+        result = worker()
+        self.assertEqual(result, None)
+        self.assertEqual(sys.stdout.getvalue(), '')
+
+    def test_deliver_messages(self):
+        self._add_message('john@example.com')
+        self._add_message('peter@example.com')
+        self._add_message('susan@example.com', status='failed')
+
+        sys.argv = ['notused', self.conf_file_path, '--once']
+        sys.stdout = StringIO()
+        result = worker()
+        self.assertEqual(result, None)
+        self.assertEqual(sys.stdout.getvalue(), (
+            'Email sent to john@example.com\n'
+            'Email sent to peter@example.com\n'
+        ))
+        self.assertEqual(self.db.outbox.count(), 1)
+        self.assertEqual(self.db.outbox.find_one()['status'], 'failed')
+
+    def test_deliver_messages_unexpected_error(self):
+        self._add_message('john@example.com')
+        self._add_message('peter@example.com')
+
+        sys.stdout = StringIO()
+        outbox = Outbox(self.db, max_attempts=1)
+        self.assertEqual(deliver_messages(outbox, BrokenMailer()), 0)
+        self.assertEqual(sys.stdout.getvalue(), (
+            "Unexpected error sending email to john@example.com: "
+            "Bad message\n"
+            "Unexpected error sending email to peter@example.com: "
+            "Bad message\n"
+        ))
+        for document in self.db.outbox.find():
+            self.assertEqual(document['status'], 'failed')
+            self.assertEqual(document['attempts'], 1)
+            self.assertEqual(document['last_error'], 'Bad message')
+
+    def test_concurrency(self):
+        for i in range(10):
+            self._add_message('john%d@example.com' % i)
+
+        sys.argv = ['notused', self.conf_file_path, '--once',
+                    '--concurrency', '3']
+        sys.stdout = StringIO()
+        result = worker()
+        self.assertEqual(result, None)
+        self.assertEqual(len(sys.stdout.getvalue().splitlines()), 10)
+        self.assertEqual(self.db.outbox.count(), 0)
+
+    def test_deleted_users(self):
+        self.db.passwords.insert({'owner': 'user1', 'secret': 's3cr3t'})
+        self.db.access_codes.insert({'user_id': 'user1', 'client_id': '1'})
+        self.db.passwords.insert({'owner': 'user2', 'secret': 's3cr3t'})
+        DeletedUsersQueue(self.db).enqueue('user1')
+
+        sys.argv = ['notused', self.conf_file_path, '--once',
+                    '--batch-size', '10']
+        sys.stdout = StringIO()
+        result = worker()
+        self.assertEqual(result, None)
+        self.assertEqual(sys.stdout.getvalue(),
+                         'Removed the data of 1 deleted users\n')
+        self.assertEqual(self.db.deleted_users.count(), 0)
+        self.assertEqual(self.db.access_codes.count(), 0)
+        self.assertEqual([p['owner'] for p in self.db.passwords.find()],
+                         ['user2'])
@@ -32,11 +32,17 @@ def safe_print(value):
         print(value.encode('utf-8'))
 
 
-def setup_simple_command(name, description):
+def setup_simple_command(name, description, options=()):
+    """Parse the command line and bootstrap the application.
+
+    The parsed values of the extra optparse options are available
+    in env['options'].
+    """
     usage = name + ": %prog config_uri"
     parser = optparse.OptionParser(
         usage=usage,
-        description=textwrap.dedent(description)
+        description=textwrap.dedent(description),
+        option_list=list(options),
     )
     options, args = parser.parse_args(sys.argv[1:])
     if not len(args) >= 1:
@@ -45,6 +51,7 @@ def setup_simple_command(name, description):
     config_uri = args[0]
     env = bootstrap(config_uri)
     settings, closer = env['registry'].settings, env['closer']
+    env['options'] = options
 
     return settings, closer, env, args[1:]
 
@@ -0,0 +1,140 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import optparse
+import smtplib
+import socket
+import threading
+import time
+
+from pyramid_mailer import get_mailer
+
+from yithlibraryserver.outbox import Outbox, document_to_message
+from yithlibraryserver.outbox import DEFAULT_MAX_ATTEMPTS, DEFAULT_BACKOFF
+from yithlibraryserver.scripts.utils import safe_print, setup_simple_command
+from yithlibraryserver.user.cleanup import DEFAULT_BATCH_SIZE
+from yithlibraryserver.user.cleanup import DeletedUsersQueue
+from yithlibraryserver.user.cleanup import process_deleted_users
+
+
+def deliver_messages(outbox, mailer):
+    """Deliver queued messages until there are no more ready to be sent.
+
+    Returns the number of messages delivered.
+    """
+    delivered = 0
+    while True:
+        document = outbox.claim()
+        if document is None:
+            return delivered
+
+        recipients = ', '.join(document['recipients'])
+        try:
+            mailer.send_immediately(document_to_message(document))
+        except (smtplib.SMTPException, socket.error) as e:
+            safe_print('Error sending email to %s: %s' % (recipients, e))
+            outbox.failed(document, str(e))
+        except Exception as e:
+            # a broken message must not stop the delivery of the rest
+            safe_print('Unexpected error sending email to %s: %s' %
+                       (recipients, e))
+            outbox.failed(document, str(e))
+        else:
+            safe_print('Email sent to %s' % recipients)
+            outbox.delivered(document)
+            delivered += 1
+
+
+def worker():
+    result = setup_simple_command(
+        "worker",
+        "Deliver the emails queued in the outbox and remove the data "
+        "of the deleted users.",
+        options=[
+            optparse.make_option(
+                '--concurrency', type='int', default=1,
+                help='number of emails delivered in parallel',
+            ),
+            optparse.make_option(
+                '--max-attempts', type='int', default=DEFAULT_MAX_ATTEMPTS,
+                help='give up on an email after this number of attempts',
+            ),
+            optparse.make_option(
+                '--backoff', type='int', default=DEFAULT_BACKOFF,
+                help='seconds to wait before the first retry. It doubles '
+                'after every failed attempt',
+            ),
+            optparse.make_option(
+                '--batch-size', type='int', default=DEFAULT_BATCH_SIZE,
+                help='number of documents of a deleted user removed '
+                'in every operation',
+            ),
+            optparse.make_option(
+                '--interval', type='int', default=5,
+                help='seconds to wait when the outbox is empty',
+            ),
+            optparse.make_option(
+                '--once', action='store_true', default=False,
+                help='exit when the outbox is empty',
+            ),
+        ],
+    )
+    if isinstance(result, int):
+        return result
+    else:
+        settings, closer, env, args = result
+
+    try:
+        options = env['options']
+        db = settings['mongodb'].get_database()
+        outbox = Outbox(db, options.max_attempts, options.backoff)
+        outbox.ensure_indexes()
+        mailer = get_mailer(env['request'])
+        deleted_users = DeletedUsersQueue(db)
+
+        while True:
+            threads = [
+                threading.Thread(target=deliver_messages,
+                                 args=(outbox, mailer))
+                for i in range(options.concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            processed = process_deleted_users(deleted_users,
+                                              options.batch_size)
+            if processed:
+                safe_print('Removed the data of %d deleted users' %
+                           processed)
+
+            if options.once:
+                break
+
+            time.sleep(options.interval)
+
+    except KeyboardInterrupt:  # pragma: no cover
+        pass
+
+    finally:
+        closer()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    worker()
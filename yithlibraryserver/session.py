@@ -0,0 +1,215 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import binascii
+import datetime
+import os
+import pickle
+import time
+
+from bson.binary import Binary
+from bson.tz_util import utc
+
+from pyramid.interfaces import ISession
+from pyramid.settings import asbool
+from zope.interface import implementer
+
+from yithlibraryserver.config import read_setting_from_env
+
+SESSION_COOKIE = 'yith_session'
+
+
+def is_bearer_request(request):
+    authorization = request.headers.get('Authorization', '')
+    return authorization.startswith('Bearer ')
+
+
+def manage_changes(method):
+    def wrapper(self, *args, **kwargs):
+        self.changed()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+@implementer(ISession)
+class MongoSession(dict):
+    """Session data kept in the sessions collection.
+
+    It remembers if it was modified so the store only writes the
+    sessions that changed. Mutable values must be replaced or
+    changed() called after modifying them.
+    """
+
+    def __init__(self, session_id=None, data=None, created=None,
+                 expires=None):
+        super(MongoSession, self).__init__(data or {})
+        self.session_id = session_id
+        self.created = created or time.time()
+        self.expires = expires
+        self.new = session_id is None
+        self.dirty = False
+        self.invalidated = False
+
+    def changed(self):
+        self.dirty = True
+
+    def invalidate(self):
+        self.clear()
+        self.invalidated = True
+
+    __setitem__ = manage_changes(dict.__setitem__)
+    __delitem__ = manage_changes(dict.__delitem__)
+    clear = manage_changes(dict.clear)
+    update = manage_changes(dict.update)
+    setdefault = manage_changes(dict.setdefault)
+    popitem = manage_changes(dict.popitem)
+
+    def pop(self, key, *args):
+        if key in self:
+            self.changed()
+        return dict.pop(self, key, *args)
+
+    # flash and csrf API
+    def flash(self, msg, queue='', allow_duplicate=True):
+        storage = self.setdefault('_f_' + queue, [])
+        if allow_duplicate or (msg not in storage):
+            storage.append(msg)
+
+    def pop_flash(self, queue=''):
+        return self.pop('_f_' + queue, [])
+
+    def peek_flash(self, queue=''):
+        return self.get('_f_' + queue, [])
+
+    def new_csrf_token(self):
+        token = binascii.hexlify(os.urandom(20)).decode('ascii')
+        self['_csrft_'] = token
+        return token
+
+    def get_csrf_token(self):
+        token = self.get('_csrft_', None)
+        if token is None:
+            token = self.new_csrf_token()
+        return token
+
+
+class SessionStore(object):
+    """Session factory that keeps the sessions in MongoDB.
+
+    Nothing is read until the request accesses request.session and
+    nothing is written unless the session is modified, so most
+    requests never touch the sessions collection. The requests
+    authenticated with a Bearer token get a throwaway session.
+
+    Expired sessions are removed by a TTL index on the expires field.
+    """
+
+    def __init__(self, mongodb, timeout=86400, cookie_name=SESSION_COOKIE,
+                 secure=False):
+        self.mongodb = mongodb
+        self.timeout = timeout
+        self.cookie_name = cookie_name
+        self.secure = secure
+
+    @classmethod
+    def from_settings(cls, mongodb, settings):
+        timeout = read_setting_from_env(settings, 'session_timeout', 86400)
+        secure = read_setting_from_env(settings, 'session_secure_cookie',
+                                       'false')
+        return cls(mongodb, int(timeout), secure=asbool(secure))
+
+    @property
+    def collection(self):
+        return self.mongodb.get_database().sessions
+
+    def ensure_indexes(self):
+        self.collection.ensure_index('expires', expireAfterSeconds=0)
+
+    def __call__(self, request):
+        if is_bearer_request(request):
+            return MongoSession()
+
+        session = None
+        session_id = request.cookies.get(self.cookie_name, None)
+        if session_id:
+            session = self.load(session_id)
+        if session is None:
+            session = MongoSession()
+
+        def save_session_callback(request, response):
+            self.persist(session, response, session_id)
+
+        request.add_response_callback(save_session_callback)
+        return session
+
+    def get_expiration(self):
+        return (datetime.datetime.now(tz=utc) +
+                datetime.timedelta(seconds=self.timeout))
+
+    def load(self, session_id):
+        document = self.collection.find_one({'_id': session_id})
+        if document is None:
+            return None
+
+        # the TTL monitor only runs once a minute
+        if document['expires'] < datetime.datetime.now(tz=utc):
+            return None
+
+        return MongoSession(session_id, pickle.loads(document['data']),
+                            document['created'], document['expires'])
+
+    def save(self, session):
+        if session.session_id is None:
+            session.session_id = binascii.hexlify(os.urandom(20)).decode(
+                'ascii')
+        session.expires = self.get_expiration()
+        self.collection.update({'_id': session.session_id}, {'$set': {
+            'data': Binary(pickle.dumps(dict(session), 2)),
+            'created': session.created,
+            'expires': session.expires,
+        }}, upsert=True)
+
+    def touch(self, session):
+        session.expires = self.get_expiration()
+        self.collection.update({'_id': session.session_id}, {
+            '$set': {'expires': session.expires},
+        })
+
+    def needs_touch(self, session):
+        remaining = session.expires - datetime.datetime.now(tz=utc)
+        return remaining < datetime.timedelta(seconds=self.timeout // 2)
+
+    def persist(self, session, response, cookie_session_id):
+        if session.invalidated and session.session_id is not None:
+            self.collection.remove({'_id': session.session_id})
+            session.session_id = None
+
+        if session.dirty and session:
+            self.save(session)
+            if session.session_id != cookie_session_id:
+                response.set_cookie(self.cookie_name, session.session_id,
+                                    path='/', httponly=True,
+                                    secure=self.secure)
+        elif session.session_id is None:
+            if cookie_session_id is not None:
+                response.delete_cookie(self.cookie_name, path='/')
+        elif session.dirty:
+            self.save(session)
+        elif self.needs_touch(session):
+            self.touch(session)
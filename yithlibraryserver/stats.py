@@ -0,0 +1,86 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+STATS_ID = 'global'
+
+
+def encode_key(key):
+    """Escape the characters MongoDB does not allow in field names"""
+    return key.replace('%', '%25').replace('.', '%2E').replace('$', '%24')
+
+
+def decode_key(key):
+    return key.replace('%24', '$').replace('%2E', '.').replace('%25', '%')
+
+
+def diff_counters(before, after):
+    """Return the increments that turn the counters before into after.
+
+    Both arguments are flat dicts of counter names to amounts. Names
+    can use the dot notation to address nested counters.
+    """
+    increments = {}
+    for key in set(before) | set(after):
+        amount = after.get(key, 0) - before.get(key, 0)
+        if amount != 0:
+            increments[key] = amount
+    return increments
+
+
+def increment_stats(db, increments):
+    """Add the increments to the statistics document.
+
+    The document is created if it does not exist, but it does not
+    count as built until set_stats fills all its counters.
+    """
+    if increments:
+        db.stats.update({'_id': STATS_ID}, {'$inc': increments}, upsert=True)
+
+
+def update_stats(db, before, after):
+    increment_stats(db, diff_counters(before, after))
+
+
+def set_stats(db, counters):
+    stats = {'_id': STATS_ID, 'built': True}
+    for key, amount in counters.items():
+        parts = key.split('.')
+        container = stats
+        for part in parts[:-1]:
+            container = container.setdefault(part, {})
+        container[parts[-1]] = amount
+
+    db.stats.save(stats)
+
+
+def get_stats(db):
+    """Return the statistics document or None if it was never built.
+
+    A document created by increment_stats before the first build only
+    has the changes made since then, so it is not returned either.
+    """
+    stats = db.stats.find_one({'_id': STATS_ID})
+    if stats is None or not stats.get('built', False):
+        return None
+
+    del stats['_id']
+    del stats['built']
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            stats[key] = dict([(decode_key(k), v) for k, v in value.items()])
+    return stats
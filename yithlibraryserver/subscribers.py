@@ -21,8 +21,10 @@
 from pyramid.events import BeforeRender, NewRequest
 from pyramid.i18n import get_locale_name
 from pyramid.renderers import get_renderer
+from pyramid.threadlocal import get_current_registry
 
 from yithlibraryserver.db import get_db
+from yithlibraryserver.errors import request_too_large
 from yithlibraryserver.locale import DatesFormatter
 
 
@@ -35,6 +37,12 @@ def add_cors_headers_response(event):
     event.request.add_response_callback(cors_headers_callback)
 
 
+def limit_request_body(event):
+    body_limits = event.request.registry.settings['body_limits']
+    if not body_limits.accepts(event.request):
+        raise request_too_large()
+
+
 def add_compress_response_callback(event):
 
     def gzip_response(request, response):
@@ -46,25 +54,53 @@ def add_compress_response_callback(event):
         event.request.add_response_callback(gzip_response)
 
 
+BASE_TEMPLATES = ('base', 'profile')
+
+
+def is_html_render(event):
+    renderer_info = event.get('renderer_info', None)
+    return renderer_info is None or renderer_info.type == '.pt'
+
+
+def get_base_templates(registry):
+    """Return the macro templates used by the html pages.
+
+    They are looked up only once per application. Chameleon still
+    reloads them if they change and reload_templates is enabled.
+    """
+    templates = getattr(registry, 'base_templates', None)
+    if templates is None:
+        templates = {}
+        for name in BASE_TEMPLATES:
+            renderer = get_renderer('yithlibraryserver:templates/%s.pt'
+                                    % name)
+            templates[name] = renderer.implementation()
+        registry.base_templates = templates
+    return templates
+
+
 def add_base_templates(event):
+    if is_html_render(event):
+        event.update(get_base_templates(get_current_registry()))
 
-    def get_template(name):
-        renderer = get_renderer('yithlibraryserver:templates/%s.pt' % name)
-        return renderer.implementation()
 
-    event.update({
-        'base': get_template('base'),
-        'profile': get_template('profile'),
-    })
+_dates_formatters = {}
 
 
-def add_custom_functions(event):
+def get_dates_formatter(locale_name):
+    formatter = _dates_formatters.get(locale_name, None)
+    if formatter is None:
+        formatter = _dates_formatters[locale_name] = DatesFormatter(
+            locale_name)
+    return formatter
 
-    locale_name = get_locale_name(event['request'])
 
-    event.update({
-        'dates_formatter': DatesFormatter(locale_name),
-    })
+def add_custom_functions(event):
+    if is_html_render(event):
+        locale_name = get_locale_name(event['request'])
+        event.update({
+            'dates_formatter': get_dates_formatter(locale_name),
+        })
 
 
 def includeme(config):
@@ -0,0 +1,104 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Benchmark of the REST API requests.
+
+Run it with:
+
+    python -m yithlibraryserver.tests.benchmark_api [n_requests] [n_passwords]
+
+It needs a MongoDB server just like the tests. It compares the
+throughput of the API application with the one of the main
+application, which still has the API views.
+"""
+
+import datetime
+import sys
+import time
+
+from bson.tz_util import utc
+from webtest import TestApp
+
+from yithlibraryserver.scripts.utils import safe_print
+from yithlibraryserver.testing import TestCase
+
+ACCESS_TOKEN = '1234'
+
+
+def add_data(db, n_passwords):
+    user_id = db.users.insert({
+        'first_name': 'John',
+        'last_name': 'Doe',
+        'email': 'john@example.com',
+        'n_passwords': n_passwords,
+    })
+    db.access_codes.insert({
+        'access_token': ACCESS_TOKEN,
+        'type': 'Bearer',
+        'expiration': (datetime.datetime.now(tz=utc) +
+                       datetime.timedelta(days=1)),
+        'user_id': user_id,
+        'scope': 'read-passwords write-passwords read-userinfo',
+        'client_id': 'client1',
+    })
+    for i in range(n_passwords):
+        db.passwords.insert({
+            'service': 'service%d' % i,
+            'account': 'john',
+            'secret': 's3cr3t%d' % i,
+            'owner': user_id,
+        })
+
+
+def measure(testapp, method, url, n_requests):
+    headers = {
+        'Authorization': 'Bearer %s' % ACCESS_TOKEN,
+        'Accept-Encoding': 'gzip',
+    }
+    call = getattr(testapp, method)
+    start = time.time()
+    for i in range(n_requests):
+        call(url, headers=headers, status=200)
+    return n_requests / (time.time() - start)
+
+
+def main(n_requests=1000, n_passwords=20):
+    case = TestCase('setUp')
+    case.setUp()
+    try:
+        add_data(case.db, n_passwords)
+        dispatcher = case.testapp.app
+        apps = (
+            ('API application', case.testapp),
+            ('Main application', TestApp(dispatcher.app)),
+        )
+
+        safe_print('Sending %d requests of every kind' % n_requests)
+        for method, url in (('get', '/passwords'), ('get', '/user'),
+                            ('options', '/passwords')):
+            safe_print('%s %s:' % (method.upper(), url))
+            for name, testapp in apps:
+                safe_print('\t%s: %.1f requests/s' % (
+                    name, measure(testapp, method, url, n_requests)))
+    finally:
+        case.tearDown()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main(*[int(arg) for arg in sys.argv[1:]])
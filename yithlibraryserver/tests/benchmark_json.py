@@ -0,0 +1,101 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Benchmark of the JSON rendering of password lists.
+
+Run it with:
+
+    python -m yithlibraryserver.tests.benchmark_json [n_passwords...]
+
+It does not need a MongoDB server. It compares the generic Pyramid
+JSON renderer, with the id copied into every password, with the
+renderer used by the password views.
+"""
+
+import datetime
+import sys
+import time
+
+import bson
+
+from pyramid.renderers import JSON
+
+from yithlibraryserver.jsonrenderer import Documents, json, json_renderer
+from yithlibraryserver.jsonrenderer import bson_adapter, datetime_adapter
+from yithlibraryserver.scripts.utils import safe_print
+
+
+def make_passwords(n_passwords):
+    owner = bson.ObjectId()
+    now = datetime.datetime.utcnow()
+    return [{
+        '_id': bson.ObjectId(),
+        'service': 'service%d' % i,
+        'account': 'john',
+        'secret': '{"iv":"abcdefghijklmnop","v":1,"iter":1000,"ks":128,'
+                  '"ts":64,"mode":"ccm","cipher":"aes","ct":"s3cr3t%d"}' % i,
+        'notes': 'Some notes',
+        'tags': ['tag1', 'tag2'],
+        'creation': now,
+        'last_modification': now,
+        'expiration': None,
+        'owner': owner,
+    } for i in range(n_passwords)]
+
+
+def generic_render(render, passwords):
+    for p in passwords:
+        p['id'] = p['_id']
+    return render({'passwords': passwords}, {})
+
+
+def documents_render(render, passwords):
+    return render({'passwords': Documents(passwords)}, {})
+
+
+def measure(function, render, passwords, repeat=5):
+    elapsed = 0
+    for i in range(repeat):
+        # every request gets fresh documents from the cursor
+        documents = [dict(p) for p in passwords]
+        start = time.time()
+        function(render, documents)
+        elapsed += time.time() - start
+    return elapsed / repeat * 1000
+
+
+def main(*sizes):
+    generic = JSON()
+    generic.add_adapter(bson.ObjectId, bson_adapter)
+    generic.add_adapter(datetime.datetime, datetime_adapter)
+    generic = generic(None)
+    documents = json_renderer(None)
+
+    safe_print('JSON backend: %s' % json.__name__)
+    for n_passwords in sizes or (1000, 10000, 50000):
+        passwords = make_passwords(n_passwords)
+        safe_print('%d passwords:' % n_passwords)
+        safe_print('\tGeneric renderer: %.1f ms' % measure(
+            generic_render, generic, passwords))
+        safe_print('\tDocuments renderer: %.1f ms' % measure(
+            documents_render, documents, passwords))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,79 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Benchmark of the JSON and MessagePack password payloads.
+
+Run it with:
+
+    python -m yithlibraryserver.tests.benchmark_msgpack [n_passwords...]
+
+It does not need a MongoDB server. For every size it prints the
+payload size and the time spent encoding and decoding a password
+list in both formats.
+"""
+
+import json
+import sys
+import time
+
+from yithlibraryserver import msgpackrenderer
+from yithlibraryserver.jsonrenderer import Documents, json_renderer
+from yithlibraryserver.scripts.utils import safe_print
+from yithlibraryserver.tests.benchmark_json import make_passwords
+
+
+def json_loads(data):
+    return json.loads(data.decode('utf-8'))
+
+
+def measure(function, arg, repeat=5):
+    start = time.time()
+    for i in range(repeat):
+        result = function(arg)
+    return result, (time.time() - start) / repeat * 1000
+
+
+def main(*sizes):
+    render_json = json_renderer(None)
+
+    def json_dumps(passwords):
+        return render_json({'passwords': Documents(passwords)},
+                           {}).encode('utf-8')
+
+    def msgpack_dumps(passwords):
+        return msgpackrenderer.dumps({'passwords': Documents(passwords)})
+
+    formats = (
+        ('JSON', json_dumps, json_loads),
+        ('MessagePack', msgpack_dumps, msgpackrenderer.loads),
+    )
+
+    for n_passwords in sizes or (1000, 10000, 50000):
+        passwords = make_passwords(n_passwords)
+        safe_print('%d passwords:' % n_passwords)
+        for name, dumps, loads in formats:
+            payload, encode_time = measure(dumps, passwords)
+            data, decode_time = measure(loads, payload)
+            assert len(data['passwords']) == n_passwords
+            safe_print('\t%s: %d bytes, encode %.1f ms, decode %.1f ms' % (
+                name, len(payload), encode_time, decode_time))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main(*[int(arg) for arg in sys.argv[1:]])
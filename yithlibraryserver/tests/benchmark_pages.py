@@ -0,0 +1,116 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Benchmark of the rendering of the heavier html pages.
+
+Run it with:
+
+    python -m yithlibraryserver.tests.benchmark_pages [n_requests] [n_apps]
+
+It needs a MongoDB server just like the tests. It prints the number
+of requests per second of every page and, for comparison, the same
+number when the base templates have to be looked up on every render.
+"""
+
+import sys
+import time
+
+import bson
+
+from yithlibraryserver.scripts.utils import safe_print
+from yithlibraryserver.testing import TestCase
+
+PAGES = (
+    ('oauth2_clients', '/oauth2/clients'),
+    ('authorized_applications', '/oauth2/authorized-applications'),
+    ('identity_providers', '/identity-providers'),
+)
+
+
+def add_data(db, n_apps):
+    user_id = db.users.insert({
+        'first_name': 'John',
+        'last_name': 'Doe',
+        'email': 'john@example.com',
+        'email_verified': True,
+        'twitter_id': 'twitter1',
+    })
+    db.users.insert({
+        'first_name': 'John',
+        'last_name': 'Doe',
+        'email': 'john@example.com',
+        'email_verified': True,
+        'google_id': 'google1',
+    })
+    for i in range(n_apps):
+        client_id = 'client%d' % i
+        db.applications.insert({
+            'owner': bson.ObjectId(),
+            'name': 'Application %d' % i,
+            'main_url': 'http://example.com/%d' % i,
+            'callback_url': 'http://example.com/%d/callback' % i,
+            'image_url': 'http://example.com/%d/image.png' % i,
+            'description': 'Description of the application %d' % i,
+            'production_ready': True,
+            'client_id': client_id,
+            'client_secret': 'secret',
+        })
+        db.authorized_apps.insert({
+            'user': user_id,
+            'client_id': client_id,
+            'redirect_uri': 'http://example.com/%d/callback' % i,
+            'response_type': 'code',
+            'scope': 'read-passwords',
+        })
+    return user_id
+
+
+def measure(testapp, url, n_requests, before_request=None):
+    start = time.time()
+    for i in range(n_requests):
+        if before_request is not None:
+            before_request()
+        testapp.get(url, status=200)
+    return n_requests / (time.time() - start)
+
+
+def main(n_requests=500, n_apps=20):
+    case = TestCase('setUp')
+    case.setUp()
+    try:
+        user_id = add_data(case.db, n_apps)
+        case.testapp.get('/__login/' + str(user_id))
+        registry = case.testapp.app.registry
+
+        def forget_base_templates():
+            registry.base_templates = None
+
+        safe_print('Rendering every page %d times' % n_requests)
+        for name, url in PAGES:
+            safe_print('%s:' % name)
+            safe_print('\tCached base templates: %.1f requests/s' % measure(
+                case.testapp, url, n_requests))
+            safe_print('\tUncached base templates: %.1f requests/s' % measure(
+                case.testapp, url, n_requests, forget_base_templates))
+    finally:
+        case.tearDown()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,84 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+from pyramid.interfaces import ISessionFactory
+
+from yithlibraryserver import testing
+from yithlibraryserver.api import APIDispatcher, is_api_path
+
+
+class FakeApp(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.registry = name + ' registry'
+
+    def __call__(self, environ, start_response):
+        return [self.name]
+
+
+class APIDispatcherTests(unittest.TestCase):
+
+    def test_is_api_path(self):
+        self.assertTrue(is_api_path('/passwords'))
+        self.assertTrue(is_api_path('/passwords/1234'))
+        self.assertTrue(is_api_path('/user'))
+        self.assertTrue(is_api_path('/tags'))
+        self.assertFalse(is_api_path('/'))
+        self.assertFalse(is_api_path('/passwords-backup'))
+        self.assertFalse(is_api_path('/user-information'))
+        self.assertFalse(is_api_path('/oauth2/clients'))
+
+    def test_dispatch(self):
+        dispatcher = APIDispatcher(FakeApp('main'), FakeApp('api'))
+        self.assertEqual(dispatcher.registry, 'main registry')
+        self.assertEqual(dispatcher({'PATH_INFO': '/passwords'}, None),
+                         ['api'])
+        self.assertEqual(dispatcher({'PATH_INFO': '/user'}, None), ['api'])
+        self.assertEqual(dispatcher({'PATH_INFO': '/'}, None), ['main'])
+        self.assertEqual(dispatcher({}, None), ['main'])
+
+
+class APIApplicationTests(testing.TestCase):
+
+    def test_lean_pipeline(self):
+        dispatcher = self.testapp.app
+        api_registry = dispatcher.api_app.registry
+        self.assertNotEqual(api_registry, dispatcher.registry)
+        self.assertEqual(api_registry.queryUtility(ISessionFactory), None)
+        self.assertNotEqual(
+            dispatcher.registry.queryUtility(ISessionFactory), None)
+
+    def test_api_requests(self):
+        res = self.testapp.options('/passwords')
+        self.assertEqual(res.status, '200 OK')
+        self.assertEqual(res.headers['Access-Control-Allow-Methods'],
+                         'GET, POST')
+
+        res = self.testapp.options('/user')
+        self.assertEqual(res.status, '200 OK')
+        self.assertEqual(res.headers['Access-Control-Allow-Methods'], 'GET')
+
+        res = self.testapp.get('/passwords', status=401)
+        self.assertEqual(res.status, '401 Unauthorized')
+
+        res = self.testapp.get('/user', status=401)
+        self.assertEqual(res.status, '401 Unauthorized')
@@ -0,0 +1,105 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+
+from webob import Request
+
+from yithlibraryserver.bodylimits import BodyLimits
+from yithlibraryserver.compat import BytesIO
+
+
+class FakeRoute(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+def make_request(body, route_name=None, content_length=True):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'wsgi.input': BytesIO(body),
+    }
+    if content_length:
+        environ['CONTENT_LENGTH'] = str(len(body))
+    request = Request(environ)
+    if route_name is not None:
+        request.matched_route = FakeRoute(route_name)
+    return request
+
+
+class BodyLimitsTests(unittest.TestCase):
+
+    def test_from_settings(self):
+        body_limits = BodyLimits.from_settings({})
+        self.assertEqual(body_limits.max_body_size, 1024 * 1024)
+        self.assertEqual(body_limits.max_field_size, 256 * 1024)
+
+        body_limits = BodyLimits.from_settings({
+            'api_max_body_size': '1000',
+            'api_max_field_size': '100',
+        })
+        self.assertEqual(body_limits.max_body_size, 1000)
+        self.assertEqual(body_limits.max_field_size, 100)
+
+    def test_get_limit(self):
+        body_limits = BodyLimits({
+            'api_max_body_size_password_view': '10',
+        }, max_body_size=100)
+        self.assertEqual(body_limits.get_limit(None), 100)
+        self.assertEqual(body_limits.get_limit('password_view'), 10)
+        self.assertEqual(body_limits.get_limit('password_collection_view'),
+                         100)
+
+        os.environ['API_MAX_BODY_SIZE_TAG_COLLECTION_VIEW'] = '0'
+        try:
+            self.assertEqual(body_limits.get_limit('tag_collection_view'), 0)
+        finally:
+            del os.environ['API_MAX_BODY_SIZE_TAG_COLLECTION_VIEW']
+
+    def test_accepts(self):
+        body_limits = BodyLimits({
+            'api_max_body_size_password_view': '0',
+        }, max_body_size=10)
+
+        self.assertTrue(body_limits.accepts(make_request(b'a' * 10)))
+        self.assertFalse(body_limits.accepts(make_request(b'a' * 11)))
+
+        # the body is not read when there is a Content-Length
+        request = make_request(b'a' * 11)
+        body_limits.accepts(request)
+        self.assertEqual(request.body_file_raw.tell(), 0)
+
+        # a limit of 0 means no limit
+        self.assertTrue(body_limits.accepts(
+            make_request(b'a' * 11, 'password_view')))
+
+        # without a Content-Length only the limit is read
+        request = make_request(b'a' * 100, content_length=False)
+        self.assertFalse(body_limits.accepts(request))
+        self.assertEqual(request.body_file_raw.tell(), 11)
+
+        request = make_request(b'a' * 10, content_length=False)
+        self.assertTrue(body_limits.accepts(request))
+        self.assertEqual(request.body, b'a' * 10)
+
+        # GET requests have no body
+        request = Request({'REQUEST_METHOD': 'GET',
+                           'wsgi.input': BytesIO(b'a' * 100)})
+        self.assertTrue(body_limits.accepts(request))
@@ -18,13 +18,18 @@
 
 import unittest
 
+import transaction
+
 from pyramid import testing
 
 from pyramid_mailer import get_mailer
 from pyramid_mailer.message import Attachment
 
+from yithlibraryserver.email import MessageRenderer
 from yithlibraryserver.email import create_message, send_email
 from yithlibraryserver.email import send_email_to_admins
+from yithlibraryserver.db import MongoDB
+from yithlibraryserver.testing import MONGO_URI, clean_db
 
 
 class CreateMessageTests(unittest.TestCase):
@@ -92,6 +97,61 @@ class CreateMessageTests(unittest.TestCase):
         self.assertEqual(message.extra_headers, {'foo': 'bar'})
 
 
+class MessageRendererTests(unittest.TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('pyramid_chameleon')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def test_render(self):
+        request = testing.DummyRequest()
+        renderer = MessageRenderer(
+            'yithlibraryserver.tests:templates/email_test')
+
+        for name in ('John', 'Peter'):
+            text, html = renderer.render(request, {
+                'name': name,
+                'email': 'john@example.com',
+            })
+            self.assertEqual(html, '<p>Hello %s,</p>\n\n<p>this is your email address: john@example.com</p>' % name)
+            self.assertEqual(text, 'Hello %s,\n\nthis is your email address: john@example.com\n' % name)
+
+        self.assertTrue(renderer._templates is not None)
+
+    def test_render_uses_each_request(self):
+        renderer = MessageRenderer(
+            'yithlibraryserver.tests:templates/email_request_test')
+
+        for path in ('/first', '/second'):
+            request = testing.DummyRequest(path=path)
+            text, html = renderer.render(request, {})
+            self.assertEqual(text, 'Path: %s\n' % path)
+            self.assertEqual(html, '<p>Path: %s</p>' % path)
+
+    def test_create_message(self):
+        request = testing.DummyRequest()
+        renderer = MessageRenderer(
+            'yithlibraryserver.tests:templates/email_test')
+        message = create_message(
+            request,
+            renderer,
+            {'name': 'John', 'email': 'john@example.com'},
+            'Testing message', ['john@example.com'],
+        )
+        expected = create_message(
+            request,
+            'yithlibraryserver.tests:templates/email_test',
+            {'name': 'John', 'email': 'john@example.com'},
+            'Testing message', ['john@example.com'],
+        )
+        self.assertEqual(message.subject, expected.subject)
+        self.assertEqual(message.html, expected.html)
+        self.assertEqual(message.body, expected.body)
+
+
 class SendEmailTests(unittest.TestCase):
 
     def setUp(self):
@@ -146,6 +206,45 @@ class SendEmailTests(unittest.TestCase):
         self.assertEqual(message.extra_headers, {})
 
 
+class SendEmailQueueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp(settings={
+            'mail_queue': True,
+        })
+        self.config.include('pyramid_mailer.testing')
+        self.config.include('pyramid_chameleon')
+        mdb = MongoDB(MONGO_URI)
+        self.db = mdb.get_database()
+
+    def tearDown(self):
+        testing.tearDown()
+        transaction.abort()
+        clean_db(self.db)
+
+    def test_send_email(self):
+        request = testing.DummyRequest()
+        request.db = self.db
+        mailer = get_mailer(request)
+
+        transaction.begin()
+        send_email(
+            request,
+            'yithlibraryserver.tests:templates/email_test',
+            {'name': 'John', 'email': 'john@example.com'},
+            'Testing message', ['john@example.com'],
+        )
+        self.assertEqual(self.db.outbox.count(), 0)
+        transaction.commit()
+
+        self.assertEqual(len(mailer.outbox), 0)
+        self.assertEqual(self.db.outbox.count(), 1)
+        message = self.db.outbox.find_one()
+        self.assertEqual(message['subject'], 'Testing message')
+        self.assertEqual(message['recipients'], ['john@example.com'])
+        self.assertEqual(message['status'], 'pending')
+
+
 class SendEmailNoAdminsTests(unittest.TestCase):
 
     def setUp(self):
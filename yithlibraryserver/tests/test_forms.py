@@ -0,0 +1,89 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import colander
+
+from pyramid import testing
+from pyramid.testing import DummyRequest
+
+from yithlibraryserver.forms import FormFactory
+from yithlibraryserver.i18n import TranslationString as _
+from yithlibraryserver.testing import TestCase
+
+
+class NameSchema(colander.MappingSchema):
+
+    name = colander.SchemaNode(colander.String(), title=_('Name'))
+
+
+class FormFactoryTests(TestCase):
+
+    def setUp(self):
+        super(FormFactoryTests, self).setUp()
+        self.request = DummyRequest()
+        testing.setUp(request=self.request)
+        self.factory = FormFactory(NameSchema, (
+            ('submit', _('Save'), 'btn-primary'),
+        ))
+
+    def tearDown(self):
+        testing.tearDown()
+        super(FormFactoryTests, self).tearDown()
+
+    def test_call(self):
+        form1 = self.factory()
+        form2 = self.factory()
+        self.assertFalse(form1 is form2)
+        self.assertEqual(form1.buttons[0].name, 'submit')
+        self.assertEqual(form1.buttons[0].css_class, 'btn-primary')
+        self.assertEqual(form1.render(), form2.render())
+
+    def test_render(self):
+        html = self.factory.render(self.request)
+        self.assertTrue('name="name"' in html)
+        self.assertEqual(html, self.factory().render())
+        self.assertEqual(self.factory.render(self.request, {}), html)
+        self.assertEqual(list(self.factory._empty_forms.keys()), ['en'])
+
+        html = self.factory.render(self.request, {'name': 'John'})
+        self.assertTrue('value="John"' in html)
+        self.assertEqual(list(self.factory._empty_forms.keys()), ['en'])
+
+        self.request.locale_name = 'es'
+        html = self.factory.render(self.request)
+        self.assertFalse('John' in html)
+        self.assertEqual(sorted(self.factory._empty_forms.keys()),
+                         ['en', 'es'])
+
+    def test_render_does_not_share_data(self):
+        html = self.factory.render(self.request, {'name': 'John'})
+        self.assertTrue('value="John"' in html)
+
+        html = self.factory.render(self.request)
+        self.assertFalse('John' in html)
+        self.assertFalse('John' in self.factory._empty_forms['en'])
+
+        html = self.factory.render(self.request, {'name': 'Peter'})
+        self.assertTrue('value="Peter"' in html)
+        self.assertFalse('John' in html)
+
+        prototype = self.factory._prototype
+        self.assertFalse(prototype is None)
+        self.assertFalse('John' in prototype.render())
+        self.assertFalse('Peter' in prototype.render())
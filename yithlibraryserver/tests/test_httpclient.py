@@ -0,0 +1,340 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import threading
+import time
+import unittest
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+import requests
+
+from yithlibraryserver.httpclient import CircuitBreaker, HTTPClient
+from yithlibraryserver.httpclient import LatencyMetrics, ProviderUnavailable
+from yithlibraryserver.httpclient import RetryBudget, get_http_client
+from yithlibraryserver.httpclient import get_provider_from_url
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(object):
+    """A tiny HTTP server that answers with a fixed status and delay"""
+
+    def __init__(self, status='200 OK', delay=0):
+        self.status = status
+        self.delay = delay
+        self.requests = 0
+        self.server = make_server('127.0.0.1', 0, self.app,
+                                  handler_class=QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d/' % self.server.server_port
+
+    def app(self, environ, start_response):
+        self.requests += 1
+        time.sleep(self.delay)
+        start_response(self.status, [('Content-Type', 'text/plain')])
+        return [b'ok']
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RetryBudgetTests(unittest.TestCase):
+
+    def test_withdraw(self):
+        budget = RetryBudget(ratio=0.5, max_tokens=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+    def test_deposit_is_bounded(self):
+        budget = RetryBudget(ratio=1, max_tokens=2)
+        for i in range(10):
+            budget.deposit()
+        self.assertEqual(budget.tokens, 2)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+
+    def test_opens_after_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        self.assertTrue(breaker.allow())
+        breaker.record(0.1, error=True)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        # a success resets the failures
+        breaker.record(0.1)
+        breaker.record(0.1, error=True)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        breaker.record(0.1, error=True)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.retry_after(), 30)
+
+    def test_slow_calls_are_failures(self):
+        breaker = CircuitBreaker(failure_threshold=1, slow_call_threshold=2)
+        breaker.record(1.9)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record(2.5)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record(0.1, error=True)
+        self.assertFalse(breaker.allow())
+
+        breaker.opened_at -= 30
+        self.assertEqual(breaker.retry_after(), 0)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        # only one probe at a time
+        self.assertFalse(breaker.allow())
+
+        # the probe failed so the breaker opens again
+        breaker.record(0.1, error=True)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        breaker.opened_at -= 30
+        self.assertTrue(breaker.allow())
+        breaker.record(0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_lost_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record(0.1, error=True)
+        breaker.opened_at -= 30
+        self.assertTrue(breaker.allow())
+
+        # the result of the probe is never recorded
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.retry_after(), 30)
+
+        breaker.opened_at -= 30
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+
+class LatencyMetricsTests(unittest.TestCase):
+
+    def test_record(self):
+        metrics = LatencyMetrics()
+        self.assertEqual(metrics.snapshot(), {})
+
+        metrics.record('google', 0.5)
+        metrics.record('google', 1.5, error=True)
+        metrics.record('paypal', 0.25)
+        self.assertEqual(metrics.snapshot(), {
+            'google': {
+                'requests': 2,
+                'errors': 1,
+                'total_time': 2.0,
+                'max_time': 1.5,
+            },
+            'paypal': {
+                'requests': 1,
+                'errors': 0,
+                'total_time': 0.25,
+                'max_time': 0.25,
+            },
+        })
+
+    def test_summary(self):
+        metrics = LatencyMetrics()
+        self.assertEqual(metrics.summary(), '')
+
+        metrics.record('paypal', 0.25)
+        metrics.record('google', 0.5)
+        metrics.record('google', 1.5, error=True)
+        self.assertEqual(
+            metrics.summary(),
+            'google: 2 requests, 1 errors, avg 1000 ms, max 1500 ms; '
+            'paypal: 1 requests, 0 errors, avg 250 ms, max 250 ms')
+
+    def test_should_log(self):
+        metrics = LatencyMetrics(log_interval=60)
+        self.assertFalse(metrics.should_log())
+        metrics.last_log -= 60
+        self.assertTrue(metrics.should_log())
+        self.assertFalse(metrics.should_log())
+
+        metrics = LatencyMetrics(log_interval=0)
+        metrics.last_log -= 60
+        self.assertFalse(metrics.should_log())
+
+
+class HTTPClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer()
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_from_settings(self):
+        client = HTTPClient.from_settings({
+            'http_connect_timeout': '1',
+            'http_read_timeout': '2',
+            'http_pool_size': '3',
+            'http_retry_ratio': '0.5',
+            'http_metrics_log_interval': '60',
+        })
+        adapter = client.session.get_adapter('http://example.com')
+        self.assertEqual(adapter.timeout, (1.0, 2.0))
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertEqual(client.retry_budget.ratio, 0.5)
+        breaker = client.get_breaker('stub')
+        self.assertEqual(breaker.failure_threshold, 5)
+        self.assertEqual(breaker.slow_call_threshold, 5.0)
+        self.assertEqual(breaker.reset_timeout, 30)
+        self.assertEqual(client.metrics.log_interval, 60)
+
+    def test_get_http_client(self):
+        settings = {}
+        client = get_http_client(settings)
+        self.assertTrue(isinstance(client, HTTPClient))
+        self.assertEqual(settings['http_client'], client)
+        self.assertEqual(get_http_client(settings), client)
+
+        default_client = get_http_client(None)
+        self.assertTrue(isinstance(default_client, HTTPClient))
+        self.assertEqual(get_http_client(None), default_client)
+
+    def test_get_provider_from_url(self):
+        self.assertEqual(
+            get_provider_from_url('https://accounts.google.com/o/oauth2'),
+            'accounts.google.com',
+        )
+
+    def test_request(self):
+        client = HTTPClient()
+        response = client.get('stub', self.server.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 'ok')
+
+        response = client.post('stub', self.server.url, data={'a': 1})
+        self.assertEqual(response.status_code, 200)
+
+        metrics = client.metrics.snapshot()
+        self.assertEqual(metrics['stub']['requests'], 2)
+        self.assertEqual(metrics['stub']['errors'], 0)
+
+    def test_server_errors_are_counted(self):
+        self.server.status = '503 Service Unavailable'
+        client = HTTPClient()
+        response = client.get('stub', self.server.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(client.metrics.snapshot()['stub']['errors'], 1)
+
+    def test_read_timeout(self):
+        self.server.delay = 0.5
+        client = HTTPClient(read_timeout=0.1)
+        client.retry_budget.tokens = 0
+        self.assertRaises(requests.Timeout,
+                          client.get, 'stub', self.server.url)
+        metrics = client.metrics.snapshot()
+        self.assertEqual(metrics['stub']['requests'], 1)
+        self.assertEqual(metrics['stub']['errors'], 1)
+
+    def test_retries_idempotent_requests(self):
+        self.server.delay = 0.5
+        client = HTTPClient(read_timeout=0.1)
+        client.retry_budget.tokens = 1
+        self.assertRaises(requests.Timeout,
+                          client.get, 'stub', self.server.url)
+        # one retry was allowed by the budget
+        self.assertEqual(client.metrics.snapshot()['stub']['requests'], 2)
+
+    def test_does_not_retry_posts(self):
+        self.server.delay = 0.5
+        client = HTTPClient(read_timeout=0.1)
+        self.assertRaises(requests.Timeout,
+                          client.post, 'stub', self.server.url)
+        self.assertEqual(client.metrics.snapshot()['stub']['requests'], 1)
+
+    def test_connection_error(self):
+        url = self.server.url
+        self.server.stop()
+        self.server.thread.join()
+        client = HTTPClient()
+        client.retry_budget.tokens = 0
+        self.assertRaises(requests.ConnectionError, client.get, 'stub', url)
+
+    def test_unexpected_errors_are_recorded(self):
+        def broken_hook(response, **kwargs):
+            raise ValueError('Broken response')
+
+        client = HTTPClient(breaker_failures=1)
+        breaker = client.get_breaker('stub')
+        breaker.record(0.1, error=True)
+        breaker.opened_at -= 30
+
+        self.assertRaises(ValueError, client.get, 'stub', self.server.url,
+                          hooks={'response': broken_hook})
+        self.assertEqual(client.metrics.snapshot()['stub']['errors'], 1)
+        # the failed probe opens the breaker again
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.retry_after(), 30)
+
+    def test_fail_fast_when_breaker_is_open(self):
+        self.server.status = '500 Internal Server Error'
+        client = HTTPClient(breaker_failures=2, breaker_reset_timeout=60)
+        client.get('stub', self.server.url)
+        client.get('stub', self.server.url)
+        self.assertEqual(self.server.requests, 2)
+
+        try:
+            client.get('stub', self.server.url)
+        except ProviderUnavailable as e:
+            self.assertEqual(e.provider, 'stub')
+            self.assertEqual(e.retry_after, 60)
+        else:
+            self.fail('ProviderUnavailable was not raised')
+        self.assertEqual(self.server.requests, 2)
+
+        # other providers are not affected
+        client.get('other', self.server.url)
+        self.assertEqual(self.server.requests, 3)
+
+        # after the reset timeout a probe request is allowed
+        self.server.status = '200 OK'
+        client.get_breaker('stub').opened_at -= 60
+        response = client.get('stub', self.server.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get_breaker('stub').state,
+                         CircuitBreaker.CLOSED)
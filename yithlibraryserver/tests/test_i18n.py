@@ -21,6 +21,7 @@ from webtest import TestRequest
 
 from pyramid import testing
 
+from yithlibraryserver.i18n import TranslationString as _
 from yithlibraryserver.i18n import deform_translator, locale_negotiator
 from yithlibraryserver.testing import TestCase
 
@@ -37,6 +38,12 @@ class DeformTranslatorTests(unittest.TestCase):
     def test_deform_translator(self):
         self.assertEqual('foo', deform_translator('foo'))
 
+    def test_deform_translator_mapping(self):
+        self.assertEqual('Hello John', deform_translator(
+            _('Hello ${name}', mapping={'name': 'John'})))
+        self.assertEqual('Hello Peter', deform_translator(
+            _('Hello ${name}', mapping={'name': 'Peter'})))
+
 
 class LocaleNegotiatorTests(TestCase):
 
@@ -0,0 +1,105 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import datetime
+import json
+import unittest
+
+import bson
+
+from pyramid import testing
+
+from yithlibraryserver.jsonrenderer import Document, Documents
+from yithlibraryserver.jsonrenderer import json_renderer, serialize
+
+
+class Unknown(object):
+
+    def __init__(self, value):
+        self.value = value
+
+
+class JSONRendererTests(unittest.TestCase):
+
+    def setUp(self):
+        self.render = json_renderer(None)
+        self._id = bson.ObjectId('0123456789abcdef01234567')
+
+    def test_plain_values(self):
+        self.assertEqual(self.render({'a': [1, 2]}, {}), '{"a": [1, 2]}')
+        self.assertEqual(self.render({'passwords': []}, {}),
+                         '{"passwords": []}')
+
+    def test_object_id_and_datetime(self):
+        value = {
+            '_id': self._id,
+            'date': datetime.datetime(2015, 1, 2, 3, 4, 5),
+        }
+        self.assertEqual(json.loads(self.render(value, {})), {
+            '_id': '0123456789abcdef01234567',
+            'date': '2015-01-02T03:04:05',
+        })
+
+    def test_unknown_types(self):
+        self.assertRaises(TypeError, self.render, {'a': Unknown(1)}, {})
+
+    def test_document(self):
+        password = {'_id': self._id, 'service': 'testing'}
+        result = self.render({'password': Document(password)}, {})
+        self.assertEqual(json.loads(result), {
+            'password': {
+                '_id': '0123456789abcdef01234567',
+                'id': '0123456789abcdef01234567',
+                'service': 'testing',
+            },
+        })
+        # the document is not modified
+        self.assertEqual(password, {'_id': self._id, 'service': 'testing'})
+
+    def test_document_special_cases(self):
+        self.assertEqual(serialize({'password': Document({})}),
+                         '{"password": {}}')
+        self.assertEqual(serialize({'password': Document({'_id': 1})}),
+                         '{"password": {"_id": 1, "id": 1}}')
+
+    def test_documents(self):
+        passwords = [
+            {'_id': self._id, 'secret': 's3cr3t'},
+            {'_id': bson.ObjectId('0123456789abcdef01234568'),
+             'secret': 's3cr3t2'},
+        ]
+        result = self.render({'passwords': Documents(iter(passwords))}, {})
+        self.assertEqual(json.loads(result), {
+            'passwords': [{
+                '_id': '0123456789abcdef01234567',
+                'id': '0123456789abcdef01234567',
+                'secret': 's3cr3t',
+            }, {
+                '_id': '0123456789abcdef01234568',
+                'id': '0123456789abcdef01234568',
+                'secret': 's3cr3t2',
+            }],
+        })
+        self.assertEqual(self.render({'passwords': Documents([])}, {}),
+                         '{"passwords": []}')
+
+    def test_content_type(self):
+        request = testing.DummyRequest()
+        self.render({'password': Document({})}, {'request': request})
+        self.assertEqual(request.response.content_type, 'application/json')
@@ -0,0 +1,94 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import datetime
+import unittest
+
+import bson
+import msgpack
+
+from pyramid import testing
+from webob.acceptparse import MIMEAccept
+
+from yithlibraryserver.jsonrenderer import Document, Documents
+from yithlibraryserver.msgpackrenderer import api_renderer, dumps, loads
+from yithlibraryserver.msgpackrenderer import msgpack_renderer
+
+
+class MessagePackTests(unittest.TestCase):
+
+    def setUp(self):
+        self._id = bson.ObjectId('0123456789abcdef01234567')
+
+    def test_dumps(self):
+        self.assertEqual(loads(dumps({'a': [1, 'b']})), {'a': [1, 'b']})
+        self.assertEqual(loads(dumps({
+            '_id': self._id,
+            'date': datetime.datetime(2015, 1, 2, 3, 4, 5),
+        })), {
+            '_id': '0123456789abcdef01234567',
+            'date': '2015-01-02T03:04:05',
+        })
+        self.assertRaises(TypeError, dumps, {'a': object()})
+
+    def test_documents(self):
+        password = {'_id': self._id, 'service': 'testing'}
+        expected = {
+            '_id': '0123456789abcdef01234567',
+            'id': '0123456789abcdef01234567',
+            'service': 'testing',
+        }
+        self.assertEqual(loads(dumps({'password': Document(password)})),
+                         {'password': expected})
+        self.assertEqual(loads(dumps({'passwords': Documents([password])})),
+                         {'passwords': [expected]})
+        self.assertEqual(password, {'_id': self._id, 'service': 'testing'})
+
+    def test_renderer(self):
+        request = testing.DummyRequest()
+        render = msgpack_renderer(None)
+        result = render({'passwords': []}, {'request': request})
+        self.assertEqual(msgpack.unpackb(result), {b'passwords': []})
+        self.assertEqual(request.response.content_type,
+                         'application/x-msgpack')
+
+    def test_negotiation(self):
+        render = api_renderer(None)
+        self.assertEqual(render({'passwords': []}, {}), '{"passwords": []}')
+
+        request = testing.DummyRequest(accept=MIMEAccept('*/*'))
+        result = render({'passwords': []}, {'request': request})
+        self.assertEqual(result, '{"passwords": []}')
+        self.assertEqual(request.response.content_type, 'application/json')
+        self.assertEqual(request.response.headers['Vary'], 'Accept')
+
+        request = testing.DummyRequest(
+            accept=MIMEAccept('application/x-msgpack'))
+        request.response.vary = ('Accept-Encoding', )
+        result = render({'passwords': []}, {'request': request})
+        self.assertEqual(loads(result), {'passwords': []})
+        self.assertEqual(request.response.content_type,
+                         'application/x-msgpack')
+        self.assertEqual(request.response.headers['Vary'],
+                         'Accept-Encoding, Accept')
+
+        request = testing.DummyRequest(accept=MIMEAccept(
+            'application/json, application/x-msgpack;q=0.5'))
+        result = render({'passwords': []}, {'request': request})
+        self.assertEqual(result, '{"passwords": []}')
@@ -0,0 +1,145 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import unittest
+
+import transaction
+
+from bson.tz_util import utc
+from pyramid_mailer.message import Attachment, Message
+
+from yithlibraryserver.db import MongoDB
+from yithlibraryserver.outbox import Outbox
+from yithlibraryserver.outbox import message_to_document, document_to_message
+from yithlibraryserver.testing import MONGO_URI, clean_db
+
+
+class SerializationTests(unittest.TestCase):
+
+    def test_roundtrip(self):
+        message = Message(
+            subject='Testing message',
+            sender='no-reply@yithlibrary.com',
+            recipients=['john@example.com'],
+            body='Hello John',
+            html='<p>Hello John</p>',
+            extra_headers={'Reply-To': 'admin@example.com'},
+            attachments=[Attachment('foo.txt', 'text/plain', b'test')],
+        )
+        result = document_to_message(message_to_document(message))
+        self.assertEqual(result.subject, 'Testing message')
+        self.assertEqual(result.sender, 'no-reply@yithlibrary.com')
+        self.assertEqual(result.recipients, ['john@example.com'])
+        self.assertEqual(result.body, 'Hello John')
+        self.assertEqual(result.html, '<p>Hello John</p>')
+        self.assertEqual(result.extra_headers,
+                         {'Reply-To': 'admin@example.com'})
+        self.assertEqual(len(result.attachments), 1)
+        self.assertEqual(result.attachments[0].filename, 'foo.txt')
+        self.assertEqual(result.attachments[0].content_type, 'text/plain')
+        self.assertEqual(result.attachments[0].data, b'test')
+
+
+class OutboxTests(unittest.TestCase):
+
+    def setUp(self):
+        mdb = MongoDB(MONGO_URI)
+        self.db = mdb.get_database()
+        self.outbox = Outbox(self.db, max_attempts=2, backoff=60)
+
+    def tearDown(self):
+        transaction.abort()
+        clean_db(self.db)
+
+    def _enqueue(self):
+        transaction.begin()
+        self.outbox.enqueue(Message(
+            subject='Testing message',
+            recipients=['john@example.com'],
+            body='Hello John',
+        ))
+        transaction.commit()
+
+    def test_enqueue_aborted(self):
+        transaction.begin()
+        self.outbox.enqueue(Message(
+            subject='Testing message',
+            recipients=['john@example.com'],
+            body='Hello John',
+        ))
+        transaction.abort()
+        self.assertEqual(self.db.outbox.count(), 0)
+
+    def test_claim_and_deliver(self):
+        self.assertEqual(self.outbox.claim(), None)
+
+        self._enqueue()
+        document = self.outbox.claim()
+        self.assertEqual(document['subject'], 'Testing message')
+        self.assertEqual(document['status'], 'sending')
+        self.assertEqual(document['attempts'], 1)
+
+        # a locked message can not be claimed twice
+        self.assertEqual(self.outbox.claim(), None)
+
+        self.outbox.delivered(document)
+        self.assertEqual(self.db.outbox.count(), 0)
+
+    def test_claim_expired_lock(self):
+        self._enqueue()
+        self.outbox.claim()
+        self.db.outbox.update({}, {'$set': {
+            'locked_at': datetime.datetime(2012, 1, 1, tzinfo=utc),
+        }})
+        document = self.outbox.claim()
+        self.assertEqual(document['attempts'], 2)
+
+        # the last attempt did not finish either
+        self.db.outbox.update({}, {'$set': {
+            'locked_at': datetime.datetime(2012, 1, 1, tzinfo=utc),
+        }})
+        self.assertEqual(self.outbox.claim(), None)
+        document = self.db.outbox.find_one()
+        self.assertEqual(document['status'], 'failed')
+        self.assertEqual(document['last_error'],
+                         'The delivery did not finish')
+        self.assertFalse('locked_at' in document)
+
+    def test_failed(self):
+        self._enqueue()
+        document = self.outbox.claim()
+        self.outbox.failed(document, 'Connection refused')
+
+        document = self.db.outbox.find_one()
+        self.assertEqual(document['status'], 'pending')
+        self.assertEqual(document['last_error'], 'Connection refused')
+        self.assertTrue(document['next_attempt'] >
+                        datetime.datetime.now(tz=utc))
+
+        # not ready yet because of the backoff
+        self.assertEqual(self.outbox.claim(), None)
+
+        self.db.outbox.update({}, {'$set': {
+            'next_attempt': datetime.datetime(2012, 1, 1, tzinfo=utc),
+        }})
+        document = self.outbox.claim()
+        self.outbox.failed(document, 'Connection refused')
+        document = self.db.outbox.find_one()
+        self.assertEqual(document['status'], 'failed')
+        self.assertEqual(self.outbox.claim(), None)
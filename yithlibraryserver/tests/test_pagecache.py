@@ -0,0 +1,219 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+from webtest import TestApp
+
+from pyramid.response import Response
+from pyramid.testing import DummyRequest
+
+from yithlibraryserver import testing
+from yithlibraryserver.db import MongoDB
+from yithlibraryserver.pagecache import PageCache, get_page_version
+from yithlibraryserver.pagecache import invalidate_pages
+
+
+class PageCacheTests(unittest.TestCase):
+
+    def test_from_settings(self):
+        page_cache = PageCache.from_settings({})
+        self.assertEqual(page_cache.ttl, 0)
+        self.assertFalse(page_cache.enabled)
+        self.assertEqual(page_cache.session_cookie, 'yith_session')
+
+        page_cache = PageCache.from_settings({'page_cache_ttl': '300'})
+        self.assertEqual(page_cache.ttl, 300)
+        self.assertTrue(page_cache.enabled)
+
+    def test_is_cacheable(self):
+        page_cache = PageCache(60)
+
+        self.assertTrue(page_cache.is_cacheable(DummyRequest()))
+        self.assertTrue(page_cache.is_cacheable(
+            DummyRequest(params={'_LOCALE_': 'es'})))
+        self.assertFalse(page_cache.is_cacheable(
+            DummyRequest(params={'foo': 'bar'})))
+        self.assertFalse(page_cache.is_cacheable(
+            DummyRequest(post={'foo': 'bar'})))
+
+        request = DummyRequest()
+        request.cookies['auth_tkt'] = 'ticket'
+        self.assertFalse(page_cache.is_cacheable(request))
+
+        # an empty session is fine
+        request = DummyRequest()
+        request.cookies['yith_session'] = 'session'
+        self.assertTrue(page_cache.is_cacheable(request))
+
+        request.session.flash('Hello')
+        self.assertFalse(page_cache.is_cacheable(request))
+
+    def test_get_set(self):
+        page_cache = PageCache(60)
+        self.assertEqual(page_cache.get(('home', 'en')), None)
+
+        response = Response(body=b'Home page', content_type='text/html')
+        entry = page_cache.set(('home', 'en'), response)
+        self.assertEqual(entry['body'], b'Home page')
+        self.assertEqual(entry['content_type'], 'text/html')
+        self.assertEqual(page_cache.get(('home', 'en')), entry)
+        self.assertEqual(page_cache.get(('home', 'es')), None)
+
+        # expired entries are removed
+        entry['expires'] -= 61
+        self.assertEqual(page_cache.get(('home', 'en')), None)
+        self.assertEqual(page_cache.entries, {})
+
+    def test_get_set_version(self):
+        page_cache = PageCache(60)
+        response = Response(body=b'Home page', content_type='text/html')
+        entry = page_cache.set(('home', 'en'), response, 2)
+        self.assertEqual(entry['version'], 2)
+        self.assertEqual(page_cache.get(('home', 'en'), 2), entry)
+
+        # entries of other versions are removed
+        self.assertEqual(page_cache.get(('home', 'en'), 3), None)
+        self.assertEqual(page_cache.entries, {})
+
+    def test_invalidate(self):
+        page_cache = PageCache(60)
+        response = Response(body=b'Page', content_type='text/html')
+        page_cache.set(('home', 'en'), response)
+        page_cache.set(('oauth2_clients', 'en'), response)
+        page_cache.set(('oauth2_clients', 'es'), response)
+
+        page_cache.invalidate('oauth2_clients')
+        self.assertEqual(list(page_cache.entries.keys()), [('home', 'en')])
+
+        page_cache.clear()
+        self.assertEqual(page_cache.entries, {})
+
+
+class PageVersionsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MongoDB(testing.MONGO_URI).get_database()
+
+    def tearDown(self):
+        testing.clean_db(self.db)
+
+    def test_invalidate_pages(self):
+        self.assertEqual(get_page_version(self.db, 'oauth2_clients'), 0)
+
+        invalidate_pages(self.db, 'oauth2_clients')
+        self.assertEqual(get_page_version(self.db, 'oauth2_clients'), 1)
+        invalidate_pages(self.db, 'oauth2_clients')
+        self.assertEqual(get_page_version(self.db, 'oauth2_clients'), 2)
+        self.assertEqual(get_page_version(self.db, 'home'), 0)
+
+
+class CachedPagesTests(testing.TestCase):
+
+    def setUp(self):
+        super(CachedPagesTests, self).setUp()
+        self.page_cache = PageCache(60)
+        settings = self.testapp.app.registry.settings
+        settings['page_cache'] = self.page_cache
+
+    def test_anonymous_pages_are_cached(self):
+        res = self.testapp.get('/tos')
+        self.assertEqual(res.status, '200 OK')
+        etag = res.headers['ETag']
+        self.assertEqual(list(self.page_cache.entries.keys()),
+                         [('tos', 'en')])
+
+        res2 = self.testapp.get('/tos')
+        self.assertEqual(res2.body, res.body)
+        self.assertEqual(res2.headers['ETag'], etag)
+
+        res = self.testapp.get('/tos', headers={'If-None-Match': etag},
+                               status=304)
+        self.assertEqual(res.status, '304 Not Modified')
+
+        # every locale has its own entry
+        res = self.testapp.get('/tos', headers={'Accept-Language': 'es'})
+        self.assertEqual(res.status, '200 OK')
+        self.assertNotEqual(res.headers['ETag'], etag)
+        self.assertEqual(len(self.page_cache.entries), 2)
+
+    def test_logged_in_users_are_not_cached(self):
+        user_id = self.db.users.insert({
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'email': 'john@example.com',
+        })
+        self.testapp.get('/__login/' + str(user_id))
+        res = self.testapp.get('/')
+        self.assertEqual(res.status, '200 OK')
+        res.mustcontain('Get your passwords')
+        self.assertEqual(self.page_cache.entries, {})
+
+    def test_clients_are_invalidated(self):
+        res = self.testapp.get('/oauth2/clients')
+        res.mustcontain(no='Example app 1')
+
+        user_id = self.db.users.insert({
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'email': 'john@example.com',
+            'email_verified': True,
+        })
+        developer = TestApp(self.testapp.app)
+        developer.get('/__login/' + str(user_id))
+        res = developer.post('/oauth2/applications/new', {
+            'name': 'Example app 1',
+            'main_url': 'https://example.com',
+            'callback_url': 'https://example.com/callback',
+            'authorized_origins': 'https://example.com',
+            'production_ready': 'true',
+            'image_url': 'https://example.com/image.png',
+            'description': 'example description',
+            'submit': 'submit',
+        })
+        self.assertEqual(res.status, '302 Found')
+
+        res = self.testapp.get('/oauth2/clients')
+        res.mustcontain('Example app 1')
+        self.assertEqual(get_page_version(self.db, 'oauth2_clients'), 1)
+
+    def test_pages_invalidated_by_other_processes(self):
+        res = self.testapp.get('/oauth2/clients')
+        res.mustcontain(no='Example app 1')
+
+        # another process or a script removes the page
+        self.db.applications.insert({
+            'owner': 'user1',
+            'client_id': 'client1',
+            'name': 'Example app 1',
+            'main_url': 'https://example.com',
+            'callback_url': 'https://example.com/callback',
+            'authorized_origins': ['https://example.com'],
+            'production_ready': True,
+            'image_url': 'https://example.com/image.png',
+            'description': 'example description',
+        })
+        res = self.testapp.get('/oauth2/clients')
+        res.mustcontain(no='Example app 1')
+
+        invalidate_pages(self.db, 'oauth2_clients')
+        res = self.testapp.get('/oauth2/clients')
+        res.mustcontain('Example app 1')
+        self.assertEqual(
+            self.page_cache.entries[('oauth2_clients', 'en')]['version'], 1)
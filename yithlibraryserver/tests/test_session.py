@@ -0,0 +1,205 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import datetime
+import unittest
+
+from bson.tz_util import utc
+
+from pyramid.response import Response
+from pyramid.testing import DummyRequest
+
+from yithlibraryserver.db import MongoDB
+from yithlibraryserver.session import MongoSession, SessionStore
+from yithlibraryserver.testing import MONGO_URI, clean_db
+
+
+class MongoSessionTests(unittest.TestCase):
+
+    def test_changes(self):
+        session = MongoSession()
+        self.assertTrue(session.new)
+        self.assertFalse(session.dirty)
+
+        self.assertEqual(session.get('foo'), None)
+        self.assertFalse('foo' in session)
+        self.assertEqual(session.pop_flash(), [])
+        self.assertFalse(session.dirty)
+
+        session['foo'] = 'bar'
+        self.assertTrue(session.dirty)
+
+        session = MongoSession('1234', {'foo': 'bar'})
+        self.assertFalse(session.new)
+        self.assertFalse(session.dirty)
+        del session['foo']
+        self.assertTrue(session.dirty)
+
+    def test_flash(self):
+        session = MongoSession()
+        session.flash('Hello')
+        session.flash('Hello', allow_duplicate=False)
+        session.flash('Error', 'error')
+        self.assertTrue(session.dirty)
+        self.assertEqual(session.peek_flash(), ['Hello'])
+        self.assertEqual(session.pop_flash(), ['Hello'])
+        self.assertEqual(session.pop_flash(), [])
+        self.assertEqual(session.pop_flash('error'), ['Error'])
+
+    def test_csrf_token(self):
+        session = MongoSession()
+        token = session.get_csrf_token()
+        self.assertEqual(len(token), 40)
+        self.assertEqual(session.get_csrf_token(), token)
+        self.assertNotEqual(session.new_csrf_token(), token)
+
+    def test_invalidate(self):
+        session = MongoSession('1234', {'foo': 'bar'})
+        session.invalidate()
+        self.assertEqual(session, {})
+        self.assertTrue(session.invalidated)
+
+
+class SessionStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.mongodb = MongoDB(MONGO_URI)
+        self.db = self.mongodb.get_database()
+        self.store = SessionStore(self.mongodb, timeout=3600)
+
+    def tearDown(self):
+        clean_db(self.db)
+
+    def _request(self, session_id=None, headers=None):
+        request = DummyRequest(headers=headers)
+        if session_id is not None:
+            request.cookies['yith_session'] = session_id
+        request.response_callbacks = []
+        request.add_response_callback = request.response_callbacks.append
+        return request
+
+    def _finish(self, request):
+        response = Response()
+        for callback in request.response_callbacks:
+            callback(request, response)
+        return response
+
+    def test_ensure_indexes(self):
+        self.store.ensure_indexes()
+        info = self.db.sessions.index_information()
+        self.assertEqual(info['expires_1']['expireAfterSeconds'], 0)
+
+    def test_unused_sessions_are_not_stored(self):
+        request = self._request()
+        session = self.store(request)
+        self.assertEqual(session.pop_flash(), [])
+        response = self._finish(request)
+        self.assertFalse('Set-Cookie' in response.headers)
+        self.assertEqual(self.db.sessions.count(), 0)
+
+    def test_save_and_load(self):
+        request = self._request()
+        session = self.store(request)
+        session['foo'] = 'bar'
+        session.flash('Hello')
+        response = self._finish(request)
+        self.assertEqual(self.db.sessions.count(), 1)
+        session_id = session.session_id
+        self.assertTrue(response.headers['Set-Cookie'].startswith(
+            'yith_session=%s;' % session_id))
+
+        request = self._request(session_id)
+        session = self.store(request)
+        self.assertFalse(session.new)
+        self.assertEqual(session['foo'], 'bar')
+        self.assertEqual(session.pop_flash(), ['Hello'])
+        response = self._finish(request)
+        self.assertFalse('Set-Cookie' in response.headers)
+
+        document = self.db.sessions.find_one({'_id': session_id})
+        session = self.store.load(session_id)
+        self.assertEqual(session, {'foo': 'bar'})
+        self.assertEqual(session.expires, document['expires'])
+
+    def test_expired_sessions(self):
+        request = self._request()
+        session = self.store(request)
+        session['foo'] = 'bar'
+        self._finish(request)
+
+        past = datetime.datetime.now(tz=utc) - datetime.timedelta(seconds=1)
+        self.db.sessions.update({'_id': session.session_id},
+                                {'$set': {'expires': past}})
+        self.assertEqual(self.store.load(session.session_id), None)
+
+        request = self._request(session.session_id)
+        new_session = self.store(request)
+        self.assertTrue(new_session.new)
+        response = self._finish(request)
+        self.assertTrue('yith_session=;' in response.headers['Set-Cookie'])
+
+    def test_touch(self):
+        request = self._request()
+        session = self.store(request)
+        session['foo'] = 'bar'
+        self._finish(request)
+
+        # a fresh session is not written again
+        soon = datetime.datetime.now(tz=utc) + datetime.timedelta(seconds=60)
+        request = self._request(session.session_id)
+        self.store(request)
+        self._finish(request)
+        document = self.db.sessions.find_one({'_id': session.session_id})
+        self.assertTrue(document['expires'] > soon)
+
+        self.db.sessions.update({'_id': session.session_id},
+                                {'$set': {'expires': soon}})
+        request = self._request(session.session_id)
+        self.store(request)
+        self._finish(request)
+        document = self.db.sessions.find_one({'_id': session.session_id})
+        self.assertTrue(document['expires'] > soon)
+
+    def test_invalidate(self):
+        request = self._request()
+        session = self.store(request)
+        session['foo'] = 'bar'
+        self._finish(request)
+
+        request = self._request(session.session_id)
+        session = self.store(request)
+        session.invalidate()
+        response = self._finish(request)
+        self.assertEqual(self.db.sessions.count(), 0)
+        self.assertTrue('yith_session=;' in response.headers['Set-Cookie'])
+
+    def test_bearer_requests(self):
+        request = self._request(headers={'Authorization': 'Bearer 1234'})
+        session = self.store(request)
+        session['foo'] = 'bar'
+        self.assertEqual(request.response_callbacks, [])
+        self.assertEqual(self.db.sessions.count(), 0)
+
+    def test_from_settings(self):
+        store = SessionStore.from_settings(self.mongodb, {
+            'session_timeout': '60',
+            'session_secure_cookie': 'true',
+        })
+        self.assertEqual(store.timeout, 60)
+        self.assertTrue(store.secure)
@@ -0,0 +1,98 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from yithlibraryserver.db import MongoDB
+from yithlibraryserver.stats import encode_key, decode_key, diff_counters
+from yithlibraryserver.stats import get_stats, set_stats, update_stats
+from yithlibraryserver.testing import MONGO_URI, clean_db
+
+
+class KeysTests(unittest.TestCase):
+
+    def test_encode_key(self):
+        self.assertEqual(encode_key('example'), 'example')
+        self.assertEqual(encode_key('example.com'), 'example%2Ecom')
+        self.assertEqual(encode_key('$100%.com'), '%24100%25%2Ecom')
+
+    def test_decode_key(self):
+        for key in ('example', 'example.com', '$100%.com', '%2E.com'):
+            self.assertEqual(decode_key(encode_key(key)), key)
+
+    def test_diff_counters(self):
+        self.assertEqual(diff_counters({}, {}), {})
+        self.assertEqual(diff_counters({'a': 1}, {'a': 1}), {})
+        self.assertEqual(diff_counters({'a': 1, 'b': 1}, {'b': 1, 'c': 1}),
+                         {'a': -1, 'c': 1})
+
+
+class StatsTests(unittest.TestCase):
+
+    def setUp(self):
+        mdb = MongoDB(MONGO_URI)
+        self.db = mdb.get_database()
+
+    def tearDown(self):
+        clean_db(self.db)
+
+    def test_get_stats_empty(self):
+        self.assertEqual(get_stats(self.db), None)
+
+    def test_set_stats(self):
+        set_stats(self.db, {
+            'users': 2,
+            'providers.google': 1,
+            'email_providers.example%2Ecom': 2,
+        })
+        self.assertEqual(get_stats(self.db), {
+            'users': 2,
+            'providers': {'google': 1},
+            'email_providers': {'example.com': 2},
+        })
+
+    def test_update_stats(self):
+        set_stats(self.db, {})
+        update_stats(self.db, {}, {
+            'users': 1,
+            'email_providers.example%2Ecom': 1,
+        })
+        update_stats(self.db, {}, {
+            'users': 1,
+            'email_providers.example%2Ecom': 1,
+        })
+        update_stats(self.db, {
+            'users': 1,
+            'email_providers.example%2Ecom': 1,
+        }, {
+            'users': 1,
+            'email_providers.example2%2Ecom': 1,
+        })
+        self.assertEqual(get_stats(self.db), {
+            'users': 2,
+            'email_providers': {'example.com': 1, 'example2.com': 1},
+        })
+
+    def test_update_stats_not_built(self):
+        # the changes made before the first build are not the totals
+        update_stats(self.db, {}, {'users': 1})
+        self.assertEqual(get_stats(self.db), None)
+
+        set_stats(self.db, {'users': 5})
+        update_stats(self.db, {}, {'users': 1})
+        self.assertEqual(get_stats(self.db), {'users': 6})
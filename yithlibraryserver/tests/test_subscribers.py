@@ -0,0 +1,84 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+from pyramid import testing
+from pyramid.events import BeforeRender
+from pyramid.renderers import RendererHelper
+
+from yithlibraryserver.locale import DatesFormatter
+from yithlibraryserver.subscribers import add_base_templates
+from yithlibraryserver.subscribers import add_custom_functions
+
+
+class BeforeRenderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.config = testing.setUp()
+        self.config.include('pyramid_chameleon')
+        self.request = testing.DummyRequest()
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def _event(self, renderer_name):
+        return BeforeRender({
+            'request': self.request,
+            'renderer_info': RendererHelper(renderer_name),
+        })
+
+    def test_add_base_templates(self):
+        event = self._event('yithlibraryserver:templates/home.pt')
+        add_base_templates(event)
+        self.assertTrue('base' in event)
+        self.assertTrue('profile' in event)
+
+        # the templates are looked up only once
+        event2 = self._event('yithlibraryserver:templates/tos.pt')
+        add_base_templates(event2)
+        self.assertTrue(event['base'] is event2['base'])
+        self.assertTrue(event['profile'] is event2['profile'])
+
+    def test_add_base_templates_non_html(self):
+        event = self._event('json')
+        add_base_templates(event)
+        self.assertFalse('base' in event)
+        self.assertFalse('profile' in event)
+
+    def test_add_custom_functions(self):
+        event = self._event('yithlibraryserver:templates/home.pt')
+        add_custom_functions(event)
+        formatter = event['dates_formatter']
+        self.assertTrue(isinstance(formatter, DatesFormatter))
+        self.assertEqual(formatter.locale_name, 'en')
+
+        event2 = self._event('yithlibraryserver:templates/tos.pt')
+        add_custom_functions(event2)
+        self.assertTrue(formatter is event2['dates_formatter'])
+
+        self.request.locale_name = 'es'
+        event3 = self._event('yithlibraryserver:templates/tos.pt')
+        add_custom_functions(event3)
+        self.assertEqual(event3['dates_formatter'].locale_name, 'es')
+
+    def test_add_custom_functions_non_html(self):
+        event = self._event('string')
+        add_custom_functions(event)
+        self.assertFalse('dates_formatter' in event)
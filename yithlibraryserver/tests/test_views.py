@@ -147,3 +147,16 @@ class ViewTests(testing.TestCase):
     def test_credits(self):
         res = self.testapp.get('/credits')
         self.assertEqual(res.status, '200 OK')
+
+    def test_provider_unavailable(self):
+        http_client = self.testapp.app.registry.settings['http_client']
+        breaker = http_client.get_breaker('persona')
+        for i in range(breaker.failure_threshold):
+            breaker.record(0, error=True)
+
+        res = self.testapp.post('/persona/login', {
+            'assertion': 'test-assertion',
+        }, status=503)
+        self.assertEqual(res.status, '503 Service Unavailable')
+        self.assertEqual(res.headers['Retry-After'], '30')
+        res.mustcontain('Service unavailable', 'persona')
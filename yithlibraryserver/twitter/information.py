@@ -20,11 +20,10 @@
 
 import binascii
 
-import requests
-
 from pyramid.httpexceptions import HTTPUnauthorized
 
 from yithlibraryserver.compat import text_type
+from yithlibraryserver.httpclient import get_http_client
 
 
 def get_user_info(settings, user_id):
@@ -36,7 +35,9 @@ def get_user_info(settings, user_id):
     auth = 'Basic ' + text_type(binascii.b2a_base64(auth.encode('ascii'))[:-1],
                                 'ascii')
 
-    response = requests.post(
+    http_client = get_http_client(settings)
+    response = http_client.post(
+        'twitter',
         token_url,
         headers={
             'Authorization': auth.encode('ascii'),
@@ -54,7 +55,8 @@ def get_user_info(settings, user_id):
     # Call the user info rest API
     user_info_url = settings['twitter_user_info_url']
 
-    response = requests.get(
+    response = http_client.get(
+        'twitter',
         user_info_url,
         params={'user_id': user_id},
         headers={'Authorization': 'Bearer ' + access_token},
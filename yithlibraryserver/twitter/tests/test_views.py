@@ -38,7 +38,7 @@ class ViewTests(testing.TestCase):
         settings['twitter_access_token_url'] = 'https://api.twitter.com/oauth/access_token'
 
     def test_twitter_login(self):
-        with patch('requests.post') as fake:
+        with patch('requests.Session.post') as fake:
             response = fake.return_value
             response.status_code = 200
             response.text = 'oauth_callback_confirmed=true&oauth_token=123456789'
@@ -48,14 +48,14 @@ class ViewTests(testing.TestCase):
             self.assertEqual(res.location, loc)
 
         # simulate an authentication error from Twitter
-        with patch('requests.post') as fake:
+        with patch('requests.Session.post') as fake:
             response = fake.return_value
             response.status_code = 401
             res = self.testapp.get('/twitter/login', status=401)
             self.assertEqual(res.status, '401 Unauthorized')
 
         # simulate an oauth_callback_confirmed=false
-        with patch('requests.post') as fake:
+        with patch('requests.Session.post') as fake:
             response = fake.return_value
             response.status_code = 200
             response.text = 'oauth_callback_confirmed=false'
@@ -79,7 +79,7 @@ class ViewTests(testing.TestCase):
         res.mustcontain('No oauth_token was found in the session')
 
         # bad request because oauth tokens are different
-        with patch('requests.post') as fake:
+        with patch('requests.Session.post') as fake:
             response = fake.return_value
             response.status_code = 200
             response.text = 'oauth_callback_confirmed=true&oauth_token=987654321'
@@ -90,7 +90,7 @@ class ViewTests(testing.TestCase):
             res.mustcontain("OAuth tokens don't match")
 
         # good request, twitter is not happy with us
-        with patch('requests.post') as fake:
+        with patch('requests.Session.post') as fake:
             response = fake.return_value
             response.status_code = 200
             response.text = 'oauth_callback_confirmed=true&oauth_token=123456789'
@@ -104,8 +104,8 @@ class ViewTests(testing.TestCase):
             self.assertEqual(res.status, '401 Unauthorized')
             res.mustcontain('Invalid token')
 
-    @mock.patch('requests.get')
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.post')
     def test_twitter_callback_new_user(self, post_mock, get_mock):
         # good request, twitter is happy now. New user
         mock0 = mock.Mock()
@@ -139,8 +139,8 @@ class ViewTests(testing.TestCase):
         self.assertEqual(res.location, 'http://localhost/register')
 
     @freeze_time('2012-01-10 15:31:11')
-    @mock.patch('requests.get')
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.post')
     def test_twitter_callback_existing_user(self, post_mock, get_mock):
         # good request, twitter is happy now. Existing user
         user_id = self.db.users.insert({
@@ -185,8 +185,8 @@ class ViewTests(testing.TestCase):
         self.assertEqual(new_user['screen_name'], 'Johnny')
 
     @freeze_time('2012-01-10 15:31:11')
-    @mock.patch('requests.get')
-    @mock.patch('requests.post')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.post')
     def test_twitter_callback_existing_user_remember_url(self, post_mock, get_mock):
         # good request, existing user, remember next_url
         self.db.users.insert({
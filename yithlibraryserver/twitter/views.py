@@ -20,9 +20,8 @@
 
 from pyramid.httpexceptions import HTTPBadRequest, HTTPFound, HTTPUnauthorized
 
-import requests
-
 from yithlibraryserver.compat import urlparse
+from yithlibraryserver.httpclient import get_http_client
 from yithlibraryserver.twitter.authorization import auth_header
 from yithlibraryserver.twitter.information import get_user_info
 from yithlibraryserver.user.utils import split_name, register_or_update
@@ -40,8 +39,9 @@ def twitter_login(request):
 
     auth = auth_header('POST', request_token_url, params, settings)
 
-    response = requests.post(request_token_url, data='',
-                             headers={'Authorization': auth})
+    response = get_http_client(settings).post(
+        'twitter', request_token_url, data='',
+        headers={'Authorization': auth})
 
     if response.status_code != 200:
         return HTTPUnauthorized(response.text)
@@ -94,8 +94,8 @@ def twitter_callback(request):
 
     auth = auth_header('POST', access_token_url, params, settings, oauth_token)
 
-    response = requests.post(access_token_url,
-                             headers={'Authorization': auth})
+    response = get_http_client(settings).post(
+        'twitter', access_token_url, headers={'Authorization': auth})
 
     if response.status_code != 200:
         return HTTPUnauthorized(response.text)
@@ -22,6 +22,9 @@ import bson
 
 from yithlibraryserver.email import send_email_to_admins
 from yithlibraryserver.oauth2.authorization import Authorizator
+from yithlibraryserver.password.models import PasswordsManager
+from yithlibraryserver.stats import encode_key, update_stats
+from yithlibraryserver.user.analytics import USER_ATTR
 
 
 def get_available_providers():
@@ -44,12 +47,79 @@ def get_providers(user, current):
     return result
 
 
+def get_user_counters(user):
+    """Return the statistics counters this user adds to"""
+    if not user:
+        return {}
+
+    counters = {'users': 1}
+
+    if user.get('email_verified', False):
+        counters['verified'] = 1
+
+    if user.get(USER_ATTR, False):
+        counters['allow_google_analytics'] = 1
+
+    for provider in get_available_providers():
+        if user.get(get_provider_key(provider), None):
+            counters['providers.' + provider] = 1
+
+    email = user.get('email', None)
+    domain = email.split('@')[-1] if email else None
+    if domain:
+        counters['email_providers.' + encode_key(domain)] = 1
+    else:
+        counters['without_email'] = 1
+
+    if user.get('n_passwords', 0) > 0:
+        counters['with_passwords'] = 1
+
+    return counters
+
+
+def update_user_stats(db, user, changes):
+    """Update the statistics after changes were applied to user"""
+    new_user = dict(user)
+    new_user.update(changes)
+    update_stats(db, get_user_counters(user), get_user_counters(new_user))
+
+
 def get_n_passwords(db, user):
+    if 'n_passwords' in user:
+        return user['n_passwords']
+
     return db.passwords.find({
         'owner': user.get('_id', None),
     }).count()
 
 
+def get_passwords_counts(db, users):
+    """Return a dict with the number of passwords of each user keyed by _id.
+
+    Users with a maintained n_passwords counter use it. The rest are
+    counted with a single grouped query over the passwords collection.
+    """
+    counts = {}
+    missing = []
+    for user in users:
+        _id = user.get('_id', None)
+        if 'n_passwords' in user:
+            counts[_id] = user['n_passwords']
+        else:
+            counts[_id] = 0
+            missing.append(_id)
+
+    if missing:
+        result = db.passwords.aggregate([
+            {'$match': {'owner': {'$in': missing}}},
+            {'$group': {'_id': '$owner', 'count': {'$sum': 1}}},
+        ])
+        for group in result['result']:
+            counts[group['_id']] = group['count']
+
+    return counts
+
+
 def get_accounts(db, current_user, current_provider):
     email = current_user.get('email', None)
     results = db.users.find({
@@ -59,6 +129,10 @@ def get_accounts(db, current_user, current_provider):
 
     if current_user:
         results = [current_user] + list(results)
+    else:
+        results = list(results)
+
+    counts = get_passwords_counts(db, results)
 
     accounts = []
     for user in results:
@@ -67,7 +141,7 @@ def get_accounts(db, current_user, current_provider):
         accounts.append({
             'providers': providers,
             'is_current': is_current,
-            'passwords': get_n_passwords(db, user),
+            'passwords': counts[user.get('_id', None)],
             'id': str(user['_id']),
             'is_verified': user.get('email_verified', False),
         })
@@ -94,12 +168,19 @@ def merge_accounts(db, master_user, accounts):
 
 
 def merge_users(db, user1, user2):
-    # move all passwords of user2 to user1
-    db.passwords.update({'owner': user2['_id']}, {
+    # move all passwords of user2 to user1. Changing the owner does
+    # not change their size
+    passwords_manager = PasswordsManager(db)
+    size = passwords_manager.get_usage(user2)[1]
+    result = db.passwords.update({'owner': user2['_id']}, {
         '$set': {
             'owner': user1['_id'],
         },
     }, multi=True)
+    if result['n'] > 0:
+        passwords_manager.update_counter(user1, result['n'], size)
+        passwords_manager.update_counter(user2, -result['n'], -size)
+        passwords_manager.move_tags(user2, user1)
 
     # move authorized_apps from user2 to user1
     authorizator = Authorizator(db)
@@ -114,6 +195,13 @@ def merge_users(db, user1, user2):
         authorizator.store_user_authorization(scopes, credentials)
     authorizator.remove_all_user_authorizations(user2)
 
+    # move the applications of user2 to user1
+    db.applications.update({'owner': user2['_id']}, {
+        '$set': {
+            'owner': user1['_id'],
+        },
+    }, multi=True)
+
     updates = {}
     # copy the providers
     for provider in get_available_providers():
@@ -123,9 +211,12 @@ def merge_users(db, user1, user2):
             sets[key] = user2[key]
 
     db.users.update({'_id': user1['_id']}, updates)
+    update_user_stats(db, user1, updates.get('$set', {}))
 
     # remove user2
-    db.users.remove(user2['_id'])
+    removed = db.users.find_and_modify({'_id': user2['_id']}, remove=True)
+    if removed is not None:
+        update_stats(db, get_user_counters(removed), {})
 
 
 def notify_admins_of_account_removal(request, user, reason):
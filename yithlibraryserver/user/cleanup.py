@@ -0,0 +1,189 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+
+from bson.tz_util import utc
+
+from yithlibraryserver.pagecache import invalidate_pages
+from yithlibraryserver.stats import increment_stats
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_LOCK_TIMEOUT = 600  # seconds
+
+# collections with documents that belong to a user and the field
+# with the user _id
+USER_REFERENCES = (
+    ('passwords', 'owner'),
+    ('tags', 'owner'),
+    ('authorized_apps', 'user'),
+    ('authorization_codes', 'user'),
+    ('access_codes', 'user_id'),
+    ('idempotency_keys', 'user'),
+    ('applications', 'owner'),
+)
+
+# collections with documents that belong to an application and the
+# field with its client_id
+APPLICATION_REFERENCES = (
+    ('authorized_apps', 'client_id'),
+    ('authorization_codes', 'client_id'),
+    ('access_codes', 'client_id'),
+)
+
+
+def ensure_reference_indexes(db):
+    """Make the lookups of the cascading deletes use an index.
+
+    The passwords, tags and idempotency_keys already have indexes
+    that start with the user.
+    """
+    for collection, field in USER_REFERENCES + APPLICATION_REFERENCES:
+        if collection not in ('passwords', 'tags', 'idempotency_keys'):
+            db[collection].ensure_index(field)
+
+
+def remove_in_batches(collection, query, batch_size=DEFAULT_BATCH_SIZE):
+    """Remove the documents that match the query.
+
+    They are removed batch_size at a time so a user with lots of
+    documents does not block the database with a single huge
+    operation. Returns the number of documents removed.
+    """
+    removed = 0
+    while True:
+        cursor = collection.find(query, fields={'_id': True},
+                                 limit=batch_size)
+        ids = [document['_id'] for document in cursor]
+        if not ids:
+            return removed
+
+        result = collection.remove({'_id': {'$in': ids}})
+        removed += result['n']
+
+
+def delete_application_data(db, client_ids, batch_size=DEFAULT_BATCH_SIZE):
+    """Remove the authorizations and tokens of some applications.
+
+    Returns a dict with the number of documents removed from every
+    collection.
+    """
+    counts = {}
+    if client_ids:
+        for collection, field in APPLICATION_REFERENCES:
+            counts[collection] = remove_in_batches(
+                db[collection], {field: {'$in': list(client_ids)}},
+                batch_size)
+    return counts
+
+
+def delete_user_data(db, user_id, client_ids=(),
+                     batch_size=DEFAULT_BATCH_SIZE):
+    """Remove everything that belongs to a user that does not exist.
+
+    client_ids are the applications of the user that were already
+    removed. Their authorizations and tokens are removed too, even if
+    they belong to other users.
+
+    Returns a dict with the number of documents removed from every
+    collection.
+    """
+    return delete_users_data(db, [user_id], client_ids, batch_size)
+
+
+def delete_users_data(db, user_ids, client_ids=(),
+                      batch_size=DEFAULT_BATCH_SIZE):
+    """Like delete_user_data but for several users at the same time"""
+    query = {'$in': list(user_ids)}
+
+    applications = db.applications.find({'owner': query},
+                                        fields={'client_id': True})
+    client_ids = set(client_ids)
+    client_ids.update([app['client_id'] for app in applications])
+    counts = delete_application_data(db, client_ids, batch_size)
+
+    # the applications go last so their client_ids are found
+    # again if this is interrupted
+    for collection, field in USER_REFERENCES:
+        removed = remove_in_batches(db[collection], {field: query},
+                                    batch_size)
+        counts[collection] = counts.get(collection, 0) + removed
+
+    if counts['passwords'] > 0:
+        increment_stats(db, {'passwords': -counts['passwords']})
+
+    if counts['applications'] > 0:
+        invalidate_pages(db, 'oauth2_clients')
+
+    return counts
+
+
+class DeletedUsersQueue(object):
+    """Users whose data is waiting to be removed.
+
+    The users are added when their accounts are destroyed and the
+    yith_worker command removes their data in the background.
+    """
+
+    def __init__(self, db, lock_timeout=DEFAULT_LOCK_TIMEOUT):
+        self.db = db
+        self.lock_timeout = lock_timeout
+
+    def enqueue(self, user_id, client_ids=()):
+        self.db.deleted_users.insert({
+            'user_id': user_id,
+            'client_ids': list(client_ids),
+            'deleted_at': datetime.datetime.now(tz=utc),
+        })
+
+    def claim(self):
+        """Lock and return the next user whose data should be removed.
+
+        Users locked by a worker that died are claimed again after
+        lock_timeout seconds. Returns None if there is nothing to do.
+        """
+        now = datetime.datetime.now(tz=utc)
+        expired = now - datetime.timedelta(seconds=self.lock_timeout)
+        return self.db.deleted_users.find_and_modify({
+            '$or': [
+                {'locked_at': None},
+                {'locked_at': {'$lte': expired}},
+            ],
+        }, {
+            '$set': {'locked_at': now},
+        }, sort=[('deleted_at', 1)], new=True)
+
+    def done(self, document):
+        self.db.deleted_users.remove(document['_id'])
+
+
+def process_deleted_users(queue, batch_size=DEFAULT_BATCH_SIZE):
+    """Remove the data of the queued users until there are no more.
+
+    Returns the number of users processed.
+    """
+    processed = 0
+    while True:
+        document = queue.claim()
+        if document is None:
+            return processed
+
+        delete_user_data(queue.db, document['user_id'],
+                         document['client_ids'], batch_size)
+        queue.done(document)
+        processed += 1
@@ -21,6 +21,7 @@
 import uuid
 
 from yithlibraryserver.email import send_email
+from yithlibraryserver.user.accounts import update_user_stats
 
 
 class EmailVerificationCode(object):
@@ -41,14 +42,18 @@ class EmailVerificationCode(object):
         return result['n'] == 1
 
     def remove(self, db, email, verified):
-        result = db.users.update({
+        user = db.users.find_and_modify({
             'email_verification_code': self.code,
             'email': email,
         }, {
             '$unset': {'email_verification_code': 1},
             '$set': {'email_verified': verified},
         })
-        return result['n'] == 1
+        if user is None:
+            return False
+
+        update_user_stats(db, user, {'email_verified': verified})
+        return True
 
     def verify(self, db, email):
         result = db.users.find_one({
@@ -26,8 +26,11 @@ from pyramid.testing import DummyRequest
 from pyramid_mailer import get_mailer
 
 from yithlibraryserver.db import MongoDB
+from yithlibraryserver.password.models import get_password_size
 from yithlibraryserver.user.accounts import get_available_providers
 from yithlibraryserver.user.accounts import get_providers, get_n_passwords
+from yithlibraryserver.user.accounts import get_passwords_counts
+from yithlibraryserver.user.accounts import get_user_counters
 from yithlibraryserver.user.accounts import get_accounts, merge_accounts
 from yithlibraryserver.user.accounts import merge_users
 from yithlibraryserver.user.accounts import notify_admins_of_account_removal
@@ -72,6 +75,48 @@ class AccountTests(TestCase):
         self.db.passwords.insert({'password2': 'secret2', 'owner': 2})
         self.assertEqual(2, get_n_passwords(self.db, {'_id': 1}))
 
+    def test_get_user_counters(self):
+        self.assertEqual({}, get_user_counters({}))
+        self.assertEqual({'users': 1, 'without_email': 1},
+                         get_user_counters({'email': ''}))
+        self.assertEqual({
+            'users': 1,
+            'verified': 1,
+            'allow_google_analytics': 1,
+            'providers.google': 1,
+            'providers.twitter': 1,
+            'email_providers.example%2Ecom': 1,
+            'with_passwords': 1,
+        }, get_user_counters({
+            'email': 'john@example.com',
+            'email_verified': True,
+            'allow_google_analytics': True,
+            'google_id': 1,
+            'twitter_id': 2,
+            'facebook_id': None,
+            'n_passwords': 3,
+        }))
+
+    def test_n_passwords_counter(self):
+        self.db.passwords.insert({'password': 'secret', 'owner': 1})
+        self.assertEqual(5, get_n_passwords(self.db, {
+            '_id': 1,
+            'n_passwords': 5,
+        }))
+
+    def test_get_passwords_counts(self):
+        self.assertEqual({}, get_passwords_counts(self.db, []))
+
+        self.db.passwords.insert({'password': 'secret1', 'owner': 1})
+        self.db.passwords.insert({'password': 'secret2', 'owner': 1})
+        self.db.passwords.insert({'password': 'secret3', 'owner': 2})
+        self.db.passwords.insert({'password': 'secret4', 'owner': 3})
+        self.assertEqual({1: 2, 2: 7, 4: 0}, get_passwords_counts(self.db, [
+            {'_id': 1},
+            {'_id': 2, 'n_passwords': 7},
+            {'_id': 4},
+        ]))
+
     def test_get_accounts_empty_user(self):
         self.assertEqual([], get_accounts(self.db, {}, ''))
 
@@ -307,6 +352,40 @@ class MergeAccountsTests(BaseMergeTests):
         self.assertEqual(2,
                          self.db.passwords.find({'owner': master_id}).count())
 
+    def test_merge_valid_users_with_counter(self):
+        master_id, master_user = self._create_master_user()
+        self.db.users.update({'_id': master_id},
+                             {'$set': {'n_passwords': 1,
+                                       'passwords_size': 100}})
+        master_user = self.db.users.find_one({'_id': master_id})
+
+        other_id = self.db.users.insert({
+            'email': 'john@example.com',
+            'google_id': 4321,
+            'n_passwords': 2,
+        })
+        self.db.passwords.insert({
+            'owner': other_id,
+            'password2': 'secret2',
+        })
+        self.db.passwords.insert({
+            'owner': other_id,
+            'password3': 'secret3',
+        })
+        size = sum([get_password_size(p)
+                    for p in self.db.passwords.find({'owner': other_id})])
+
+        self.assertEqual(1, merge_accounts(self.db, master_user,
+                                           [str(other_id)]))
+        master_user_reloaded = self.db.users.find_one({'_id': master_id})
+        self.assertEqual(3, master_user_reloaded['n_passwords'])
+        self.assertEqual(100 + size, master_user_reloaded['passwords_size'])
+
+        stats = self.db.stats.find_one()
+        self.assertEqual(stats['users'], -1)
+        self.assertEqual(stats['with_passwords'], -1)
+        self.assertEqual(stats['passwords'], 0)
+
 
 class MergeUsersTests(BaseMergeTests):
 
@@ -341,6 +420,8 @@ class MergeUsersTests(BaseMergeTests):
             'owner': user2_id,
             'password': 'secret4',
         })
+        self.db.tags.insert({'owner': user2_id, 'tag': 'work', 'count': 2})
+        self.db.applications.insert({'owner': user2_id, 'client_id': 'd'})
         user2 = self.db.users.find_one({'_id': user2_id})
 
         merge_users(self.db, user1, user2)
@@ -348,6 +429,8 @@ class MergeUsersTests(BaseMergeTests):
             {'owner': user1_id}).count())
         self.assertEqual(0, self.db.passwords.find(
             {'owner': user2_id}).count())
+        self.assertEqual(2, self.db.tags.find_one({'owner': user1_id})['count'])
+        self.assertEqual(0, self.db.tags.find({'owner': user2_id}).count())
         self.assertEqual(None, self.db.users.find_one({'_id': user2_id}))
         user1_refreshed = self.db.users.find_one({'_id': user1_id})
         self.assertEqual(user1_refreshed, {
@@ -363,6 +446,9 @@ class MergeUsersTests(BaseMergeTests):
         auths = self.db.authorized_apps.find({'user': user2_id})
         self.assertEqual(auths.count(), 0)
 
+        app = self.db.applications.find_one({'client_id': 'd'})
+        self.assertEqual(app['owner'], user1_id)
+
 
 class AccountRemovalNotificationTests(unittest.TestCase):
 
@@ -0,0 +1,169 @@
+# Yith Library Server is a password storage server.
+# Copyright (C) 2015 Lorenzo Gil Sanchez <lorenzo.gil.sanchez@gmail.com>
+#
+# This file is part of Yith Library Server.
+#
+# Yith Library Server is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Yith Library Server is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Yith Library Server.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import unittest
+
+from bson.tz_util import utc
+from freezegun import freeze_time
+
+from yithlibraryserver.db import MongoDB
+from yithlibraryserver.pagecache import get_page_version
+from yithlibraryserver.testing import MONGO_URI, clean_db
+from yithlibraryserver.user.cleanup import DeletedUsersQueue
+from yithlibraryserver.user.cleanup import delete_user_data
+from yithlibraryserver.user.cleanup import delete_users_data
+from yithlibraryserver.user.cleanup import ensure_reference_indexes
+from yithlibraryserver.user.cleanup import process_deleted_users
+from yithlibraryserver.user.cleanup import remove_in_batches
+
+
+class CleanupTests(unittest.TestCase):
+
+    def setUp(self):
+        mdb = MongoDB(MONGO_URI)
+        self.db = mdb.get_database()
+
+    def tearDown(self):
+        clean_db(self.db)
+
+    def add_user_data(self, user_id, client_id):
+        self.db.passwords.insert({'owner': user_id, 'secret': 's1'})
+        self.db.passwords.insert({'owner': user_id, 'secret': 's2'})
+        self.db.tags.insert({'owner': user_id, 'tag': 'a', 'count': 2})
+        self.db.authorized_apps.insert({'user': user_id,
+                                        'client_id': client_id})
+        self.db.authorization_codes.insert({'user': user_id,
+                                            'client_id': client_id})
+        self.db.access_codes.insert({'user_id': user_id,
+                                     'client_id': client_id})
+        self.db.idempotency_keys.insert({'user': user_id, 'key': 'k'})
+
+    def test_ensure_reference_indexes(self):
+        ensure_reference_indexes(self.db)
+        indexes = self.db.access_codes.index_information()
+        self.assertTrue('user_id_1' in indexes)
+        self.assertTrue('client_id_1' in indexes)
+        self.assertTrue('owner_1' in self.db.applications.index_information())
+
+    def test_remove_in_batches(self):
+        for i in range(25):
+            self.db.passwords.insert({'owner': 'user1'})
+        self.db.passwords.insert({'owner': 'user2'})
+
+        removed = remove_in_batches(self.db.passwords, {'owner': 'user1'},
+                                    batch_size=10)
+        self.assertEqual(removed, 25)
+        self.assertEqual(self.db.passwords.count(), 1)
+
+        removed = remove_in_batches(self.db.passwords, {'owner': 'user1'})
+        self.assertEqual(removed, 0)
+
+    def test_delete_user_data(self):
+        self.add_user_data('user1', 'client1')
+        self.add_user_data('user2', 'client2')
+        self.db.applications.insert({'owner': 'user1',
+                                     'client_id': 'client3'})
+        # user2 authorized an application of user1
+        self.db.authorized_apps.insert({'user': 'user2',
+                                        'client_id': 'client3'})
+        # and an application already removed
+        self.db.access_codes.insert({'user_id': 'user2',
+                                     'client_id': 'client4'})
+
+        counts = delete_user_data(self.db, 'user1', ['client4'],
+                                  batch_size=1)
+        self.assertEqual(counts, {
+            'passwords': 2,
+            'tags': 1,
+            'authorized_apps': 2,
+            'authorization_codes': 1,
+            'access_codes': 2,
+            'idempotency_keys': 1,
+            'applications': 1,
+        })
+        self.assertEqual(self.db.stats.find_one()['passwords'], -2)
+
+        # only the data of user2 is left
+        self.assertEqual(self.db.passwords.count(), 2)
+        for collection in ('tags', 'authorized_apps',
+                           'authorization_codes', 'access_codes',
+                           'idempotency_keys'):
+            self.assertEqual(self.db[collection].count(), 1)
+        self.assertEqual(self.db.access_codes.find_one()['client_id'],
+                         'client2')
+        self.assertEqual(self.db.applications.count(), 0)
+
+    def test_delete_users_data(self):
+        self.add_user_data('user1', 'client1')
+        self.add_user_data('user2', 'client2')
+        self.add_user_data('user3', 'client3')
+        self.db.applications.insert({'owner': 'user2',
+                                     'client_id': 'client3'})
+
+        counts = delete_users_data(self.db, ['user1', 'user2'],
+                                   batch_size=1)
+        self.assertEqual(counts['passwords'], 4)
+        self.assertEqual(counts['applications'], 1)
+        # the authorizations of the application of user2 too
+        self.assertEqual(counts['authorized_apps'], 3)
+        self.assertEqual(self.db.passwords.distinct('owner'), ['user3'])
+        self.assertEqual(self.db.authorized_apps.count(), 0)
+        # the clients page lists the removed application
+        self.assertEqual(get_page_version(self.db, 'oauth2_clients'), 1)
+
+        # no applications were removed
+        delete_users_data(self.db, ['user3'])
+        self.assertEqual(get_page_version(self.db, 'oauth2_clients'), 1)
+
+    def test_queue(self):
+        queue = DeletedUsersQueue(self.db)
+        self.assertEqual(queue.claim(), None)
+
+        with freeze_time('2015-01-01 10:00:00'):
+            queue.enqueue('user1', ['client1'])
+        with freeze_time('2015-01-01 10:01:00'):
+            queue.enqueue('user2')
+
+        with freeze_time('2015-01-01 10:02:00'):
+            document = queue.claim()
+            self.assertEqual(document['user_id'], 'user1')
+            self.assertEqual(document['client_ids'], ['client1'])
+            self.assertEqual(document['locked_at'],
+                             datetime.datetime(2015, 1, 1, 10, 2,
+                                               tzinfo=utc))
+            self.assertEqual(queue.claim()['user_id'], 'user2')
+            self.assertEqual(queue.claim(), None)
+
+        # the users of a worker that died are claimed again
+        with freeze_time('2015-01-01 10:12:00'):
+            self.assertEqual(queue.claim()['user_id'], 'user1')
+            queue.done(document)
+            self.assertEqual(queue.claim()['user_id'], 'user2')
+
+    def test_process_deleted_users(self):
+        queue = DeletedUsersQueue(self.db)
+        self.assertEqual(process_deleted_users(queue), 0)
+
+        self.add_user_data('user1', 'client1')
+        self.add_user_data('user2', 'client2')
+        queue.enqueue('user1')
+        queue.enqueue('user2')
+        self.assertEqual(process_deleted_users(queue), 2)
+        self.assertEqual(self.db.passwords.count(), 0)
+        self.assertEqual(self.db.deleted_users.count(), 0)
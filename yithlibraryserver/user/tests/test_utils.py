@@ -67,6 +67,27 @@ class UtilsTests(unittest.TestCase):
         refreshed_user = self.db.users.find_one({'_id': user_id})
         self.assertEqual(None, refreshed_user)
         self.assertEqual(n_users - 1, self.db.users.count())
+        self.assertEqual(self.db.stats.find_one()['users'], -1)
+
+        self.assertFalse(delete_user(self.db, user))
+        self.assertEqual(self.db.stats.find_one()['users'], -1)
+
+    def test_delete_user_applications(self):
+        user_id = self.db.users.insert({'screen_name': 'John Doe'})
+        user = self.db.users.find_one({'_id': user_id})
+        self.db.applications.insert({'owner': user_id, 'client_id': '1'})
+        self.db.applications.insert({'owner': 'other', 'client_id': '2'})
+        self.db.passwords.insert({'owner': user_id, 'secret': 's3cr3t'})
+
+        self.assertTrue(delete_user(self.db, user))
+        self.assertEqual([app['client_id']
+                          for app in self.db.applications.find()], ['2'])
+
+        # the rest of the data is removed later
+        self.assertEqual(self.db.passwords.count(), 1)
+        queued = self.db.deleted_users.find_one()
+        self.assertEqual(queued['user_id'], user_id)
+        self.assertEqual(queued['client_ids'], ['1'])
 
     def test_update_user(self):
         user_id = self.db.users.insert({
@@ -92,6 +113,9 @@ class UtilsTests(unittest.TestCase):
         update_user(self.db, user, {'email': 'john@example.com'}, {})
         updated_user = self.db.users.find_one({'_id': user_id})
         self.assertEqual(updated_user['email'], 'john@example.com')
+        stats = self.db.stats.find_one()
+        self.assertEqual(stats['without_email'], -1)
+        self.assertEqual(stats['email_providers'], {'example%2Ecom': 1})
 
         # if an attribute has no value, no update happens
         update_user(self.db, user, {'first_name': ''}, {})
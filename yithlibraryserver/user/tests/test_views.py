@@ -382,6 +382,7 @@ class ViewTests(TestCase):
             'last_name': 'Doe',
             'email': '',
         })
+        self.db.applications.insert({'owner': user_id, 'client_id': '1'})
         self.testapp.get('/__login/' + str(user_id))
 
         res = self.testapp.get('/destroy')
@@ -415,6 +416,9 @@ class ViewTests(TestCase):
 
         user = self.db.users.find_one({'_id': user_id})
         self.assertEqual(None, user)
+        self.assertEqual(self.db.applications.count(), 0)
+        self.assertEqual(self.db.deleted_users.find_one()['user_id'],
+                         user_id)
 
         res.request.registry = self.testapp.app.registry
         mailer = get_mailer(res.request)
@@ -24,7 +24,11 @@ from bson.tz_util import utc
 from pyramid.httpexceptions import HTTPFound
 from pyramid.security import remember
 
+from yithlibraryserver.stats import update_stats
 from yithlibraryserver.user.accounts import get_provider_key
+from yithlibraryserver.user.accounts import get_user_counters
+from yithlibraryserver.user.accounts import update_user_stats
+from yithlibraryserver.user.cleanup import DeletedUsersQueue
 
 
 def split_name(name):
@@ -40,8 +44,25 @@ def split_name(name):
 
 
 def delete_user(db, user):
-    result = db.users.remove(user['_id'])
-    return result['n'] == 1
+    """Remove the user and its applications.
+
+    The rest of the data of the user is removed in the background by
+    the yith_worker command.
+    """
+    removed = db.users.find_and_modify({'_id': user['_id']}, remove=True)
+    if removed is None:
+        return False
+
+    update_stats(db, get_user_counters(removed), {})
+
+    applications = db.applications.find({'owner': user['_id']},
+                                        fields={'client_id': True})
+    client_ids = [app['client_id'] for app in applications]
+    if client_ids:
+        db.applications.remove({'owner': user['_id']})
+
+    DeletedUsersQueue(db).enqueue(user['_id'], client_ids)
+    return True
 
 
 def update_user(db, user, user_info, other_changes):
@@ -59,6 +80,7 @@ def update_user(db, user, user_info, other_changes):
 
     if changes:
         db.users.update({'_id': user['_id']}, {'$set': changes})
+        update_user_stats(db, user, changes)
 
 
 def user_from_provider_id(db, provider, user_id):
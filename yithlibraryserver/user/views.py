@@ -22,7 +22,7 @@ import datetime
 
 from bson.tz_util import utc
 
-from deform import Button, Form, ValidationFailure
+from deform import ValidationFailure
 
 from pyramid.httpexceptions import HTTPBadRequest, HTTPFound
 from pyramid.i18n import get_localizer
@@ -30,13 +30,18 @@ from pyramid.security import remember, forget
 from pyramid.view import view_config, view_defaults, forbidden_view_config
 
 from yithlibraryserver.compat import url_quote
+from yithlibraryserver.forms import FormFactory
 from yithlibraryserver.i18n import translation_domain
 from yithlibraryserver.i18n import TranslationString as _
 from yithlibraryserver.oauth2.decorators import protected_method
+from yithlibraryserver.pagecache import invalidate_page
 from yithlibraryserver.password.models import PasswordsManager
+from yithlibraryserver.stats import update_stats
 from yithlibraryserver.user import analytics
 from yithlibraryserver.user.accounts import get_accounts, merge_accounts
 from yithlibraryserver.user.accounts import notify_admins_of_account_removal
+from yithlibraryserver.user.accounts import get_user_counters
+from yithlibraryserver.user.accounts import update_user_stats
 from yithlibraryserver.user.email_verification import EmailVerificationCode
 from yithlibraryserver.user.schemas import UserSchema, NewUserSchema
 from yithlibraryserver.user.schemas import AccountDestroySchema
@@ -44,6 +49,25 @@ from yithlibraryserver.user.schemas import UserPreferencesSchema
 from yithlibraryserver.user.utils import delete_user
 
 
+new_user_form = FormFactory(NewUserSchema, (
+    ('submit', _('Register into Yith Library'), 'btn-primary'),
+    ('cancel', _('Cancel'), 'btn-default logout'),
+))
+
+destroy_form = FormFactory(AccountDestroySchema, (
+    ('submit', _('Yes, I am sure. Destroy my account'), 'btn-danger'),
+    ('cancel', _('Cancel'), 'btn-default'),
+))
+
+user_form = FormFactory(UserSchema, (
+    ('submit', _('Save changes'), 'btn-primary'),
+))
+
+preferences_form = FormFactory(UserPreferencesSchema, (
+    ('submit', _('Save changes'), 'btn-primary'),
+))
+
+
 @view_config(route_name='login', renderer='templates/login.pt')
 @forbidden_view_config(renderer='templates/login.pt')
 def login(request):
@@ -73,16 +97,8 @@ def register_new_user(request):
     except KeyError:
         next_url = request.route_url('oauth2_clients')
 
-    schema = NewUserSchema()
-    button1 = Button('submit', _('Register into Yith Library'))
-    button1.css_class = 'btn-primary'
-    button2 = Button('cancel', _('Cancel'))
-    button2.css_class = 'btn-default logout'
-
-    form = Form(schema, buttons=(button1, button2))
-
     if 'submit' in request.POST:
-
+        form = new_user_form()
         controls = request.POST.items()
         try:
             appstruct = form.validate(controls)
@@ -115,6 +131,8 @@ def register_new_user(request):
             'date_joined': now,
             'last_login': now,
             'send_passwords_periodically': False,
+            'n_passwords': 0,
+            'passwords_size': 0,
         }
 
         if request.google_analytics.is_in_session():
@@ -123,6 +141,7 @@ def register_new_user(request):
             request.google_analytics.clean_session()
 
         _id = request.db.users.insert(user_attrs)
+        update_stats(request.db, {}, get_user_counters(user_attrs))
 
         if not email_verified and email != '':
             evc = EmailVerificationCode()
@@ -146,7 +165,7 @@ def register_new_user(request):
         return HTTPFound(location=next_url)
 
     return {
-        'form': form.render({
+        'form': new_user_form.render(request, {
             'first_name': user_info.get('first_name', ''),
             'last_name': user_info.get('last_name', ''),
             'screen_name': user_info.get('screen_name', ''),
@@ -177,21 +196,13 @@ def logout(request):
              renderer='templates/destroy.pt',
              permission='destroy-account')
 def destroy(request):
-    schema = AccountDestroySchema()
-    button1 = Button('submit', _('Yes, I am sure. Destroy my account'))
-    button1.css_class = 'btn-danger'
-    button2 = Button('cancel', _('Cancel'))
-    button2.css_class = 'btn-default'
-
-    form = Form(schema, buttons=(button1, button2))
-
     passwords_manager = PasswordsManager(request.db)
     context = {
         'passwords': passwords_manager.retrieve(request.user).count(),
     }
 
     if 'submit' in request.POST:
-
+        form = destroy_form()
         controls = request.POST.items()
         try:
             appstruct = form.validate(controls)
@@ -203,8 +214,8 @@ def destroy(request):
         notify_admins_of_account_removal(request, request.user, reason)
 
         passwords_manager.delete(request.user)
-        # TODO: remove user's applications
         delete_user(request.db, request.user)
+        invalidate_page(request, 'oauth2_clients')
 
         request.session.flash(
             _('Your account has been removed. Have a nice day!'),
@@ -219,7 +230,7 @@ def destroy(request):
         )
         return HTTPFound(location=request.route_path('user_information'))
 
-    context['form'] = form.render()
+    context['form'] = destroy_form.render(request)
     return context
 
 
@@ -227,14 +238,8 @@ def destroy(request):
              renderer='templates/user_information.pt',
              permission='edit-profile')
 def user_information(request):
-    schema = UserSchema()
-    button1 = Button('submit', _('Save changes'))
-    button1.css_class = 'btn-primary'
-
-    form = Form(schema, buttons=(button1, ))
-
     if 'submit' in request.POST:
-
+        form = user_form()
         controls = request.POST.items()
         try:
             appstruct = form.validate(controls)
@@ -255,6 +260,7 @@ def user_information(request):
                                          {'$set': changes})
 
         if result['n'] == 1:
+            update_user_stats(request.db, request.user, changes)
             request.session.flash(
                 _('The changes were saved successfully'),
                 'success',
@@ -268,7 +274,7 @@ def user_information(request):
             return {'form': appstruct}
 
     return {
-        'form': form.render({
+        'form': user_form.render(request, {
             'first_name': request.user['first_name'],
             'last_name': request.user['last_name'],
             'screen_name': request.user['screen_name'],
@@ -284,13 +290,8 @@ def user_information(request):
              renderer='templates/preferences.pt',
              permission='edit-profile')
 def preferences(request):
-    schema = UserPreferencesSchema()
-    button1 = Button('submit', _('Save changes'))
-    button1.css_class = 'btn-primary'
-
-    form = Form(schema, buttons=(button1, ))
-
     if 'submit' in request.POST:
+        form = preferences_form()
         controls = request.POST.items()
         try:
             appstruct = form.validate(controls)
@@ -306,6 +307,7 @@ def preferences(request):
                                          {'$set': changes})
 
         if result['n'] == 1:
+            update_user_stats(request.db, request.user, changes)
             request.session.flash(
                 _('The changes were saved successfully'),
                 'success',
@@ -318,7 +320,7 @@ def preferences(request):
             )
             return {'form': appstruct}
 
-    return {'form': form.render(request.user)}
+    return {'form': preferences_form.render(request, request.user)}
 
 
 @view_config(route_name='user_identity_providers',
@@ -447,6 +449,7 @@ def google_analytics_preference(request):
         changes = request.google_analytics.get_user_attr(allow)
         request.db.users.update({'_id': request.user['_id']},
                                 {'$set': changes})
+        update_user_stats(request.db, request.user, changes)
 
     return {'allow': allow}
 
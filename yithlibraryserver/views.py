@@ -20,7 +20,7 @@
 
 import logging
 
-from deform import Button, Form, ValidationFailure
+from deform import ValidationFailure
 
 from pyramid.i18n import get_locale_name
 from pyramid.httpexceptions import HTTPFound
@@ -28,27 +28,30 @@ from pyramid.renderers import render_to_response
 from pyramid.view import view_config
 
 from yithlibraryserver.email import send_email_to_admins
+from yithlibraryserver.forms import FormFactory
+from yithlibraryserver.httpclient import ProviderUnavailable
 from yithlibraryserver.i18n import TranslationString as _
+from yithlibraryserver.pagecache import cache_page
 from yithlibraryserver.schemas import ContactSchema
 
 log = logging.getLogger(__name__)
 
+contact_form = FormFactory(ContactSchema, (
+    ('submit', _('Send message'), 'btn-primary'),
+    ('cancel', _('Cancel'), 'btn-default'),
+))
 
-@view_config(route_name='home', renderer='templates/home.pt')
+
+@view_config(route_name='home', renderer='templates/home.pt',
+             decorator=cache_page)
 def home(request):
     return {}
 
 
 @view_config(route_name='contact', renderer='templates/contact.pt')
 def contact(request):
-    button1 = Button('submit', _('Send message'))
-    button1.css_class = 'btn-primary'
-    button2 = Button('cancel', _('Cancel'))
-    button2.css_class = 'btn-default'
-
-    form = Form(ContactSchema(), buttons=(button1, button2))
-
     if 'submit' in request.POST:
+        form = contact_form()
         controls = request.POST.items()
         try:
             appstruct = form.validate(controls)
@@ -94,15 +97,16 @@ def contact(request):
         if request.user.get('email_verified', False):
             initial['email'] = request.user.get('email', '')
 
-    return {'form': form.render(initial)}
+    return {'form': contact_form.render(request, initial)}
 
 
-@view_config(route_name='tos', renderer='templates/tos.pt')
+@view_config(route_name='tos', renderer='templates/tos.pt',
+             decorator=cache_page)
 def tos(request):
     return {}
 
 
-@view_config(route_name='faq', renderer='string')
+@view_config(route_name='faq', renderer='string', decorator=cache_page)
 def faq(request):
     # We don't want to mess up the gettext .po file
     # with a lot of strings which don't belong to the
@@ -119,6 +123,15 @@ def faq(request):
     return render_to_response(template, {}, request=request)
 
 
-@view_config(route_name='credits', renderer='templates/credits.pt')
+@view_config(route_name='credits', renderer='templates/credits.pt',
+             decorator=cache_page)
 def credits(request):
     return {}
+
+
+@view_config(context=ProviderUnavailable,
+             renderer='templates/provider_unavailable.pt')
+def provider_unavailable(exc, request):
+    request.response.status = 503
+    request.response.headers['Retry-After'] = str(exc.retry_after)
+    return {'provider': exc.provider}